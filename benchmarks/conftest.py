@@ -0,0 +1,101 @@
+"""
+Shared fixtures for the celery_utils benchmark suite.
+
+The table sizes to benchmark against are taken from the ``--rows`` option
+(a comma separated list, default ``10000``), e.g.::
+
+    py.test benchmarks/ --no-cov --rows=10000,100000,1000000 --benchmark-autosave
+
+Benchmarks run against the test settings: SQLite and the in-memory
+(``memory://``) broker.
+"""
+
+import tracemalloc
+
+import pytest
+
+from celery_utils.models import FailedTask
+
+POPULATE_BATCH_SIZE = 5000
+
+
+def pytest_addoption(parser):
+    """
+    Add the ``--rows`` option.
+    """
+    parser.addoption(
+        '--rows',
+        default='10000',
+        help='Comma separated FailedTask table sizes to benchmark against (default: 10000).',
+    )
+
+
+def pytest_generate_tests(metafunc):
+    """
+    Parametrize benchmarks taking a ``rows`` argument with the requested table sizes.
+    """
+    if 'rows' in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption('rows').split(',')]
+        metafunc.parametrize('rows', sizes, ids=[f'{size}rows' for size in sizes])
+
+
+def populate(rows, task_name='benchmarks.task', **fields):
+    """
+    Bulk insert ``rows`` FailedTask records, returning their task ids.
+    """
+    task_ids = []
+    for start in range(0, rows, POPULATE_BATCH_SIZE):
+        batch = [
+            FailedTask(
+                task_name=task_name,
+                task_id=f'{task_name}-{index}',
+                args=[index],
+                kwargs={'index': index},
+                exc='ValueError()',
+                **fields
+            )
+            for index in range(start, min(start + POPULATE_BATCH_SIZE, rows))
+        ]
+        FailedTask.objects.bulk_create(batch)
+        task_ids.extend(task.task_id for task in batch)
+    return task_ids
+
+
+def record_throughput(benchmark, units, label):
+    """
+    Store ``units`` per second for the fastest round in the saved benchmark results.
+    """
+    if benchmark.stats is None:  # Running with --benchmark-disable
+        return
+    benchmark.extra_info[label] = units / benchmark.stats.stats.min
+
+
+@pytest.fixture
+def peak_memory(benchmark):
+    """
+    Run a callable once under tracemalloc and record its peak allocation.
+    """
+    def measure(func, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            result = func(*args, **kwargs)
+            benchmark.extra_info['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result
+    return measure
+
+
+@pytest.fixture
+def in_memory_broker():
+    """
+    Publish tasks to the in-memory broker instead of running them eagerly.
+
+    This isolates the cost of the code under test from the cost of running
+    the reapplied tasks themselves.
+    """
+    from test_utils.celery import app  # pylint: disable=import-outside-toplevel
+    eager = app.conf.task_always_eager
+    app.conf.task_always_eager = False
+    yield app
+    app.conf.task_always_eager = eager
@@ -0,0 +1,72 @@
+"""
+Benchmarks for encoding and decoding FailedTask arguments.
+"""
+
+import datetime
+import json
+import uuid
+
+import pytest
+
+from jsonfield.encoder import JSONEncoder
+
+from celery_utils import codecs
+
+PAYLOAD_SIZES = {'1KB': 1 << 10, '10KB': 10 << 10, '100KB': 100 << 10, '1MB': 1 << 20}
+
+
+class JsonfieldCodec:
+    """
+    The encoding FailedTask used before codecs were introduced, as a baseline.
+    """
+
+    def dumps(self, value):
+        return json.dumps(value, cls=JSONEncoder)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+CODECS = {
+    'jsonfield': JsonfieldCodec(),
+    'stdlib': codecs.StdlibJSONCodec(),
+    'orjson': codecs.OrjsonCodec(),
+}
+
+
+def make_payload(size, rich):
+    """
+    Build task kwargs whose plain JSON encoding is roughly ``size`` bytes.
+
+    Rich payloads include a datetime per item and a UUID, exercising the
+    tagged encodings (and the standard library fallback of ``OrjsonCodec``).
+    """
+    item = {'user_id': 12345, 'course': 'course-v1:edX+DemoX+Demo_Course', 'score': 0.75, 'passed': True}
+    if rich:
+        item['modified'] = datetime.datetime(2024, 3, 31, 12, 0)
+    items = max(1, size // len(json.dumps(item, cls=JSONEncoder)))
+    payload = {'items': [dict(item, user_id=index) for index in range(items)]}
+    if rich:
+        payload['request_id'] = uuid.uuid4()
+    return payload
+
+
+@pytest.mark.parametrize('rich', [False, True], ids=['plain', 'rich'])
+@pytest.mark.parametrize('size', PAYLOAD_SIZES, ids=list(PAYLOAD_SIZES))
+@pytest.mark.parametrize('codec', CODECS, ids=list(CODECS))
+def test_encode(benchmark, codec, size, rich):
+    payload = make_payload(PAYLOAD_SIZES[size], rich)
+    encoded = benchmark(CODECS[codec].dumps, payload)
+    if benchmark.stats is not None:
+        benchmark.extra_info['encoded_bytes'] = len(encoded)
+        benchmark.extra_info['mb_per_sec'] = len(encoded) / benchmark.stats.stats.min / 1e6
+
+
+@pytest.mark.parametrize('rich', [False, True], ids=['plain', 'rich'])
+@pytest.mark.parametrize('size', PAYLOAD_SIZES, ids=list(PAYLOAD_SIZES))
+@pytest.mark.parametrize('codec', CODECS, ids=list(CODECS))
+def test_decode(benchmark, codec, size, rich):
+    encoded = CODECS[codec].dumps(make_payload(PAYLOAD_SIZES[size], rich))
+    benchmark(CODECS[codec].loads, encoded)
+    if benchmark.stats is not None:
+        benchmark.extra_info['mb_per_sec'] = len(encoded) / benchmark.stats.stats.min / 1e6
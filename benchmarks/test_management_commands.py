@@ -0,0 +1,37 @@
+"""
+Benchmarks for the reapply_tasks and cleanup_resolved_tasks management commands.
+"""
+
+import pytest
+
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from celery_utils.models import FailedTask
+from test_utils import tasks
+
+from .conftest import populate, record_throughput
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('in_memory_broker')
+def test_reapply_tasks(benchmark, peak_memory, rows):
+    def setup():
+        FailedTask.objects.all().delete()
+        populate(rows, task_name=tasks.passing_task.name)
+
+    benchmark.pedantic(call_command, args=('reapply_tasks',), setup=setup, rounds=3)
+    record_throughput(benchmark, rows, 'reapplied_tasks_per_sec')
+    setup()
+    peak_memory(call_command, 'reapply_tasks')
+
+
+@pytest.mark.django_db
+def test_cleanup_resolved_tasks(benchmark, peak_memory, rows):
+    def setup():
+        populate(rows, datetime_resolved=now())
+
+    benchmark.pedantic(call_command, args=('cleanup_resolved_tasks', '--age=0'), setup=setup, rounds=3)
+    record_throughput(benchmark, rows, 'rows_deleted_per_sec')
+    setup()
+    peak_memory(call_command, 'cleanup_resolved_tasks', '--age=0')
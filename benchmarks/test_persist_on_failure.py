@@ -0,0 +1,51 @@
+"""
+Benchmarks for recording and resolving task failures.
+"""
+
+from itertools import count
+
+from billiard.einfo import ExceptionInfo
+import pytest
+
+from celery_utils.tasks import mark_resolved
+from test_utils import tasks
+
+from .conftest import populate, record_throughput
+
+FAILURES_PER_ROUND = 100
+
+
+def _exception_info():
+    try:
+        raise ValueError('Benchmark failure')
+    except ValueError as exc:
+        return exc, ExceptionInfo()
+
+
+@pytest.mark.django_db
+def test_on_failure(benchmark, peak_memory, rows):
+    populate(rows)
+    exc, einfo = _exception_info()
+    ids = count()
+
+    def persist_failures():
+        for _ in range(FAILURES_PER_ROUND):
+            tasks.fallible_task.on_failure(exc, f'new-{next(ids)}', [1, 2], {'message': 'x' * 100}, einfo)
+
+    benchmark.pedantic(persist_failures, rounds=10)
+    record_throughput(benchmark, FAILURES_PER_ROUND, 'failures_persisted_per_sec')
+    peak_memory(persist_failures)
+
+
+@pytest.mark.django_db
+def test_mark_resolved(benchmark, peak_memory, rows):
+    task_ids = iter(populate(rows))
+
+    def resolve_tasks():
+        for _ in range(FAILURES_PER_ROUND):
+            mark_resolved(next(task_ids))
+
+    rounds = max(1, min(10, rows // FAILURES_PER_ROUND - 1))
+    benchmark.pedantic(resolve_tasks, rounds=rounds)
+    record_throughput(benchmark, FAILURES_PER_ROUND, 'tasks_resolved_per_sec')
+    peak_memory(resolve_tasks)
@@ -2,17 +2,163 @@
 Admin site configuration.
 """
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import router, transaction
+from django.urls import reverse
+from django.utils.html import format_html
 
-from .models import FailedTask
+from . import tasks
+from .models import ArchivedFailedTask, BulkActionJob, FailedTask
+
+
+def _dispatch(job):
+    """
+    Dispatch the task carrying out ``job`` once the request's transaction commits.
+
+    Otherwise the worker could look the job up before it is visible, or run
+    it after the transaction creating it was rolled back.
+    """
+    transaction.on_commit(
+        lambda: tasks.run_bulk_action.delay(job.pk), using=router.db_for_write(BulkActionJob),
+    )
+
+
+def _start_bulk_action(modeladmin, request, queryset, action):
+    """
+    Record a bulk action on ``queryset`` and dispatch the task that carries it out.
+    """
+    job = BulkActionJob.for_queryset(action, queryset, requested_by=request.user.get_username())
+    _dispatch(job)
+    modeladmin.message_user(
+        request,
+        format_html(
+            'Started to {} {} failed tasks in the background. <a href="{}">Follow its progress.</a>',
+            job.get_action_display().lower(),
+            job.total,
+            reverse('admin:celery_utils_bulkactionjob_change', args=[job.pk]),
+        ),
+        messages.SUCCESS,
+    )
 
 
 @admin.register(FailedTask)
 class FailedTaskAdmin(admin.ModelAdmin):
     """
     Customized admin for the FailedTask model.
+
+    The bulk actions run in a background task (see ``BulkActionJob``), so
+    they can be applied to any number of records, including every record
+    matching the current filters.
     """
 
-    list_display = ['task_id', 'task_name', 'args', 'kwargs', 'created', 'datetime_resolved']
-    list_filter = ['task_name', 'created', 'datetime_resolved']
+    list_display = ['task_id', 'task_name', 'args', 'kwargs', 'created', 'datetime_resolved', 'datetime_quarantined']
+    list_filter = ['task_name', 'created', 'datetime_resolved', 'datetime_quarantined']
     search_fields = ['task_name', 'task_id', 'args', 'kwargs']
+    actions = ['reapply_selected', 'resolve_selected', 'delete_selected_in_background']
+
+    def get_actions(self, request):
+        """
+        Replace the stock delete action, which loads every selected record in the request.
+        """
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.action(description='Reapply selected failed tasks', permissions=['change'])
+    def reapply_selected(self, request, queryset):
+        """
+        Reapply the selected tasks in the background.
+        """
+        _start_bulk_action(self, request, queryset, BulkActionJob.REAPPLY)
+
+    @admin.action(description='Mark selected failed tasks resolved', permissions=['change'])
+    def resolve_selected(self, request, queryset):
+        """
+        Mark the selected tasks resolved in the background.
+        """
+        _start_bulk_action(self, request, queryset, BulkActionJob.RESOLVE)
+
+    @admin.action(description='Delete selected failed tasks', permissions=['delete'])
+    def delete_selected_in_background(self, request, queryset):
+        """
+        Delete the selected tasks in the background.
+        """
+        _start_bulk_action(self, request, queryset, BulkActionJob.DELETE)
+
+
+@admin.register(ArchivedFailedTask)
+class ArchivedFailedTaskAdmin(admin.ModelAdmin):
+    """
+    Customized admin for the ArchivedFailedTask model.
+    """
+
+    list_display = ['task_id', 'task_name', 'args', 'kwargs', 'created', 'datetime_resolved', 'datetime_archived']
+    list_filter = ['task_name', 'created', 'datetime_resolved', 'datetime_archived']
+    search_fields = ['task_name', 'task_id', 'args', 'kwargs']
+
+    def has_add_permission(self, request):
+        """
+        Disallow adding; archived records only come from archiving FailedTasks.
+        """
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """
+        Disallow editing; archived records are read-only.
+        """
+        return False
+
+
+@admin.register(BulkActionJob)
+class BulkActionJobAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for following the progress of bulk FailedTask actions.
+
+    Failed jobs can be resumed, carrying on after the last batch they finished.
+    """
+
+    list_display = ['id', 'action', 'status', 'progress', 'requested_by', 'created', 'datetime_completed']
+    list_filter = ['action', 'status']
+    exclude = ['selected_pks']
+    readonly_fields = ['progress']
+    actions = ['resume_failed']
+
+    @admin.action(description='Resume selected failed jobs', permissions=['resume'])
+    def resume_failed(self, request, queryset):
+        """
+        Dispatch the selected failed jobs again; jobs in any other state are left alone.
+        """
+        jobs = list(queryset.filter(status=BulkActionJob.FAILED))
+        for job in jobs:
+            job.status = BulkActionJob.PENDING
+            job.error = ''
+            job.datetime_completed = None
+            job.save(update_fields=['status', 'error', 'datetime_completed', 'modified'])
+            _dispatch(job)
+        self.message_user(request, f'Resumed {len(jobs)} failed jobs.', messages.SUCCESS)
+
+    @admin.display(description='Progress')
+    def progress(self, obj):
+        """
+        Show how many of the selected records have been handled.
+        """
+        return f'{obj.processed} / {obj.total}'
+
+    def has_add_permission(self, request):
+        """
+        Disallow adding; jobs are created by the FailedTask bulk actions.
+        """
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """
+        Disallow editing; jobs are only updated by the task running them.
+        """
+        return False
+
+    def has_resume_permission(self, request):
+        """
+        Allow resuming jobs to users who can change FailedTasks, as the jobs act on them.
+        """
+        opts = FailedTask._meta
+        return request.user.has_perm(f'{opts.app_label}.change_{opts.model_name}')
@@ -0,0 +1,85 @@
+"""
+Moving resolved FailedTask records into the ArchivedFailedTask table.
+
+Archived records are kept until the ``CELERY_UTILS_RETENTION_ARCHIVED_DAYS``
+retention policy deletes them (see ``celery_utils.retention``).
+"""
+
+import logging
+
+from django.db import connections, router, transaction
+from django.utils.timezone import now
+
+from .batching import keyset_batches
+from .models import ArchivedFailedTask, FailedTask
+
+log = logging.getLogger(__name__)
+
+# FailedTask fields copied verbatim into ArchivedFailedTask, by their names in each.
+_COPIED_FIELDS = (
+    ('id', 'failed_task_id'), ('created', 'created'), ('modified', 'modified'), ('task_name', 'task_name'),
+    ('task_id', 'task_id'), ('args', 'args'), ('kwargs', 'kwargs'), ('exc', 'exc'), ('attempts', 'attempts'),
+    ('fingerprint', 'fingerprint'), ('repeat_failures', 'repeat_failures'),
+    ('datetime_quarantined', 'datetime_quarantined'), ('trace', 'trace'), ('datetime_resolved', 'datetime_resolved'),
+)
+
+
+def archive_resolved_tasks(resolved_before=None, task_name=None, batch_size=1000, after=0):
+    """
+    Move resolved FailedTask records into ArchivedFailedTask, a batch at a time.
+
+    Only records resolved before ``resolved_before`` (if given) and named
+    ``task_name`` (if given) are moved.  Each batch is copied with a single
+    ``INSERT ... SELECT`` and deleted in the same transaction, so no row data
+    passes through Python and locks are only held for one batch.
+
+    Yields ``(last_pk, moved)`` after each batch, for checkpointing.
+    """
+    tasks = FailedTask.objects.filter(datetime_resolved__isnull=False)
+    if resolved_before is not None:
+        tasks = tasks.filter(datetime_resolved__lt=resolved_before)
+    if task_name is not None:
+        tasks = tasks.filter(task_name=task_name)
+    for batch in keyset_batches(tasks.only('pk'), batch_size, start_after=after):
+        moved = _move([task.pk for task in batch])
+        yield batch[-1].pk, moved
+
+
+def archive_task(task_id):
+    """
+    Move the resolved FailedTask records for ``task_id`` into ArchivedFailedTask.
+
+    Returns the number of records moved.
+    """
+    pks = list(
+        FailedTask.objects.using(router.db_for_write(FailedTask))
+        .filter(task_id=task_id, datetime_resolved__isnull=False)
+        .values_list('pk', flat=True)
+    )
+    return _move(pks) if pks else 0
+
+
+def _move(pks):
+    """
+    Copy the resolved FailedTask rows with the given primary keys to the archive, and delete them.
+    """
+    using = router.db_for_write(FailedTask)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    source = FailedTask._meta  # pylint: disable=protected-access
+    target = ArchivedFailedTask._meta  # pylint: disable=protected-access
+    source_columns = ', '.join(quote(source.get_field(name).column) for name, _ in _COPIED_FIELDS)
+    target_columns = ', '.join(quote(target.get_field(name).column) for _, name in _COPIED_FIELDS)
+    placeholders = ', '.join(['%s'] * len(pks))
+    sql = (
+        f'INSERT INTO {quote(target.db_table)} '
+        f'({target_columns}, {quote(target.get_field("datetime_archived").column)}) '
+        f'SELECT {source_columns}, %s FROM {quote(source.db_table)} '
+        f'WHERE {quote(source.pk.column)} IN ({placeholders}) '
+        f'AND {quote(source.get_field("datetime_resolved").column)} IS NOT NULL'
+    )
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [connection.ops.adapt_datetimefield_value(now())] + pks)
+        moved, _ = FailedTask.objects.using(using).filter(pk__in=pks, datetime_resolved__isnull=False).delete()
+    return moved
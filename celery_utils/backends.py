@@ -0,0 +1,161 @@
+"""
+A Celery result backend storing results in the Django database.
+
+Configure it as the Celery app's result backend::
+
+    CELERY_RESULT_BACKEND = 'celery_utils.backends:DatabaseBackend'
+
+Results live in the ``ResultEntry`` table, and chords are tracked with one
+``ChordCounter`` row per chord: each finishing header task increments it with
+a single atomic ``UPDATE``, and only the task that brings it to the size of
+the chord collects the header results (with batched ``IN`` queries) and
+triggers the body.  Nothing polls member results, so chords need no other
+result backend and scale to large groups.
+
+Results and counters expire after the ``result_expires`` Celery setting; the
+``celery.backend_cleanup`` task that celery beat schedules by default deletes
+expired rows through ``DatabaseBackend.cleanup``.
+"""
+
+from datetime import timedelta
+from itertools import islice
+
+from kombu.utils.encoding import bytes_to_str, ensure_bytes
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from celery import states
+from celery.backends.base import KeyValueStoreBackend
+
+from .models import ChordCounter, ResultEntry
+
+#: Maximum number of keys fetched by one query, to stay within database parameter limits.
+MGET_CHUNK_SIZE = 500
+
+
+class DatabaseBackend(KeyValueStoreBackend):
+    """
+    Result backend keeping results and chord counters in Django models.
+    """
+
+    implements_incr = True
+    supports_native_join = True
+
+    def _expires_at(self):
+        """
+        Get the expiry time for a row written now, or None if results don't expire.
+        """
+        return now() + timedelta(seconds=self.expires) if self.expires else None
+
+    def get(self, key):
+        """
+        Get the stored value for ``key``, or None.
+        """
+        value = ResultEntry.objects.filter(key=bytes_to_str(key)).values_list('value', flat=True).first()
+        return None if value is None else bytes(value)
+
+    def mget(self, keys):
+        """
+        Get the stored values for ``keys``, in order, with None for missing keys.
+        """
+        keys = [bytes_to_str(key) for key in keys]
+        found = {}
+        chunks = iter(keys)
+        while chunk := list(islice(chunks, MGET_CHUNK_SIZE)):
+            found.update(ResultEntry.objects.filter(key__in=chunk).values_list('key', 'value'))
+        return [None if found.get(key) is None else bytes(found[key]) for key in keys]
+
+    def set(self, key, value):
+        """
+        Store ``value`` for ``key``, replacing any existing value.
+        """
+        self._set_with_state(key, value, states.SUCCESS)
+
+    def _set_with_state(self, key, value, state):
+        # Update, then insert, rather than an upsert naming its conflict target, which MySQL doesn't support.
+        key = bytes_to_str(key)
+        fields = {'value': ensure_bytes(value), 'status': state, 'expires_at': self._expires_at()}
+        using = router.db_for_write(ResultEntry)
+        entries = ResultEntry.objects.using(using).filter(key=key)
+        if entries.update(**fields):
+            return
+        try:
+            with transaction.atomic(using=using):
+                ResultEntry.objects.using(using).create(key=key, **fields)
+        except IntegrityError:
+            # Inserted concurrently; the last write wins, as with the update.
+            entries.update(**fields)
+
+    def _store_result(self, task_id, result, state, traceback=None, request=None, **kwargs):
+        """
+        Store a task's result, unless it has already succeeded.
+
+        The base class reads the current result to check this before writing;
+        here the check is part of the write, saving a query per state change.
+        """
+        meta = self._get_result_meta(result=result, state=state, traceback=traceback, request=request)
+        meta['task_id'] = bytes_to_str(task_id)
+        key = bytes_to_str(self.get_key_for_task(task_id))
+        fields = {'value': ensure_bytes(self.encode(meta)), 'status': state, 'expires_at': self._expires_at()}
+        if not ResultEntry.objects.filter(key=key).exclude(status=states.SUCCESS).update(**fields):
+            # Either there is no result yet, or it is a success that must not be overwritten.
+            ResultEntry.objects.bulk_create([ResultEntry(key=key, **fields)], ignore_conflicts=True)
+        return result
+
+    def delete(self, key):
+        """
+        Delete the value or chord counter stored for ``key``.
+        """
+        key = self.key_t(key)
+        model = ChordCounter if key.startswith(self.chord_keyprefix) else ResultEntry
+        model.objects.filter(key=bytes_to_str(key)).delete()
+
+    def _apply_chord_incr(self, header_result_args, body, **kwargs):
+        """
+        Save the chord's header group, and create its counter.
+        """
+        super()._apply_chord_incr(header_result_args, body, **kwargs)
+        group_id = header_result_args[0]
+        ChordCounter.objects.bulk_create(
+            [ChordCounter(key=bytes_to_str(self.get_key_for_chord(group_id)), expires_at=self._expires_at())],
+            ignore_conflicts=True,
+        )
+
+    def incr(self, key):
+        """
+        Atomically increment the chord counter ``key``, returning its new value.
+
+        The increment and the read of the new value share a transaction, in
+        which the ``UPDATE`` holds the row's lock, so concurrent header tasks
+        each see a different count and exactly one of them sees the last.
+        """
+        key = bytes_to_str(key)
+        using = router.db_for_write(ChordCounter)
+        counters = ChordCounter.objects.using(using).filter(key=key)
+        with transaction.atomic(using=using):
+            if not counters.update(count=F('count') + 1):
+                try:
+                    with transaction.atomic(using=using):
+                        ChordCounter.objects.using(using).create(key=key, count=1, expires_at=self._expires_at())
+                    return 1
+                except IntegrityError:
+                    # Created by a concurrent header task.
+                    counters.update(count=F('count') + 1)
+            return counters.values_list('count', flat=True).get()
+
+    def expire(self, key, value):
+        """
+        Push back the expiry of the chord counter ``key`` to ``value`` seconds from now.
+        """
+        expires_at = now() + timedelta(seconds=value) if value else None
+        ChordCounter.objects.filter(key=bytes_to_str(key)).update(expires_at=expires_at)
+
+    def cleanup(self):
+        """
+        Delete expired results and chord counters.
+        """
+        cutoff = now()
+        ResultEntry.objects.filter(expires_at__lt=cutoff).delete()
+        ChordCounter.objects.filter(expires_at__lt=cutoff).delete()
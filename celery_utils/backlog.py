@@ -0,0 +1,106 @@
+"""
+Cheap per-task-name counts of unresolved FailedTask records.
+
+Counting the unresolved backlog with ``COUNT(*) ... GROUP BY task_name``
+scans the whole ``FailedTask`` table.  With the ``CELERY_UTILS_BACKLOG_COUNTERS``
+setting enabled, ``DjangoFailureStore`` instead keeps a ``FailureBacklog``
+row per task name up to date as failures are recorded and resolved, so that
+``get_backlog`` costs a primary key lookup.
+
+The counters can drift: records deleted or edited directly (e.g. by
+retention, or in the admin) are not counted, and concurrent reconciliation
+can race with failures.  Schedule the ``reconcile_failure_backlog`` task to
+recount them periodically; it also publishes each count through the metrics
+hook (see ``celery_utils.metrics``) as ``celery_utils.failed_tasks.unresolved``.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils.timezone import now
+
+from . import metrics
+from .models import FailedTask, FailureBacklog
+
+log = logging.getLogger(__name__)
+
+
+def is_enabled():
+    """
+    Whether failures and resolutions update the backlog counters.
+    """
+    return getattr(settings, 'CELERY_UTILS_BACKLOG_COUNTERS', False)
+
+
+def increment(task_name, amount=1):
+    """
+    Add ``amount`` to the unresolved count of ``task_name``.
+    """
+    counter = FailureBacklog.objects.filter(task_name=task_name)
+    if counter.update(unresolved=F('unresolved') + amount):
+        return
+    try:
+        with transaction.atomic():
+            FailureBacklog.objects.create(task_name=task_name, unresolved=amount)
+    except IntegrityError:
+        # Another worker created the counter first.
+        counter.update(unresolved=F('unresolved') + amount)
+
+
+def decrement(task_name, amount=1):
+    """
+    Subtract ``amount`` from the unresolved count of ``task_name``, stopping at zero.
+    """
+    FailureBacklog.objects.filter(task_name=task_name).update(unresolved=Greatest(F('unresolved') - amount, 0))
+
+
+def get_backlog(task_name=None):
+    """
+    Get the counted number of unresolved failures.
+
+    Returns the count for ``task_name`` if given, or else a dict mapping each
+    counted task name to its count.
+    """
+    if task_name is not None:
+        return FailureBacklog.objects.filter(task_name=task_name).values_list('unresolved', flat=True).first() or 0
+    return dict(FailureBacklog.objects.values_list('task_name', 'unresolved'))
+
+
+def reconcile():
+    """
+    Recount the unresolved failures for every task name, and publish the counts.
+
+    Returns a dict mapping each task name with unresolved failures to its count.
+    """
+    counts = dict(
+        FailedTask.objects.using(router.db_for_write(FailedTask)).filter(datetime_resolved=None)
+        .values_list('task_name')
+        .annotate(Count('pk'))
+        .order_by()
+    )
+    reconciled_at = now()
+    using = router.db_for_write(FailureBacklog)
+    # MySQL upserts on any unique key, and refuses to be told which.
+    conflict_target = (
+        {'unique_fields': ['task_name']} if connections[using].features.supports_update_conflicts_with_target else {}
+    )
+    with transaction.atomic(using=using):
+        FailureBacklog.objects.using(using).exclude(task_name__in=list(counts)).update(
+            unresolved=0, datetime_reconciled=reconciled_at,
+        )
+        FailureBacklog.objects.using(using).bulk_create(
+            [
+                FailureBacklog(task_name=task_name, unresolved=count, datetime_reconciled=reconciled_at)
+                for task_name, count in counts.items()
+            ],
+            update_conflicts=True,
+            update_fields=['unresolved', 'datetime_reconciled'],
+            **conflict_target
+        )
+    for task_name, count in get_backlog().items():
+        metrics.emit('celery_utils.failed_tasks.unresolved', count, task_name=task_name)
+    log.info(f'Reconciled unresolved failure counts for {len(counts)} task names')
+    return counts
@@ -0,0 +1,193 @@
+"""
+Task base class coalescing many small invocations into batches.
+
+A ``BatchedTask`` is submitted like any other task, one item at a time, but
+its body receives a list of ``BatchItem`` s and runs once per batch::
+
+    @app.task(base=BatchedTask)
+    def invalidate_cache(items):
+        cache.delete_many([item.kwargs['key'] for item in items])
+
+    invalidate_cache.delay(key='course-v1:edX+DemoX')
+
+Each worker process buffers the items it receives, and runs the body when
+``flush_every`` items are waiting, or ``flush_interval`` seconds after the
+first of them arrived, whichever comes first (and when the process shuts
+down).  When run eagerly, each item is run as a batch of its own straight
+away.
+
+If the body raises, each item of the batch is run again on its own, so that
+one bad item does not fail the others, and only items which still fail are
+reported through ``on_failure``.  Combined with ``PersistOnFailureTask``, for
+example::
+
+    class BatchedPersistOnFailureTask(BatchedTask, LoggedPersistOnFailureTask):
+        abstract = True
+
+every failed item is persisted as a ``FailedTask`` of its own, with the task
+id and arguments it was submitted with, so ``reapply_tasks`` retries only the
+failed items.  ``FailedTask.reapply`` marks reapplied items with the
+``celery_utils_reapplied`` header instead of linking ``mark_resolved``, and
+their records are resolved once the item has run successfully in a batch.
+
+Each batch runs through the rest of the task's ``__call__`` chain, so
+``LoggedTask`` tracing, resource tracking and watchdog cover each batch run
+(as a run of its own, outside any one item's request); buffering an item does
+not.
+
+Trade-offs: a message is acknowledged, and its result stored as a success,
+once its item is buffered rather than once it has run, so buffered items are
+lost if the worker process dies before flushing them; and task callbacks run
+when an item is buffered.
+"""
+
+from collections import namedtuple
+import logging
+import threading
+import weakref
+
+from billiard.einfo import ExceptionInfo
+
+from django.db import connections
+
+from celery import Task
+from celery.signals import worker_process_shutdown, worker_shutdown
+
+from .tasks import mark_resolved
+
+log = logging.getLogger(__name__)
+
+#: Message header marking an invocation as the reapply of a ``FailedTask``.
+REAPPLIED_HEADER = 'celery_utils_reapplied'
+
+#: One buffered invocation of a ``BatchedTask``.  ``reapplied`` is set for
+#: invocations reapplying a ``FailedTask``, which is resolved once the item
+#: has run successfully.
+BatchItem = namedtuple('BatchItem', ['task_id', 'args', 'kwargs', 'reapplied'], defaults=[False])
+
+# Every BatchedTask with a buffer, to be flushed at shutdown.
+_batched_tasks = weakref.WeakSet()
+
+
+class BatchedTask(Task):
+    """
+    Task base class running its body once per batch of buffered invocations.
+    """
+
+    abstract = True
+    # Items are submitted with their own arguments, but the body takes a list of items.
+    typing = False
+
+    #: Number of buffered items that triggers a flush.
+    flush_every = 100
+
+    #: Seconds after the first item is buffered at which the buffer is flushed anyway.
+    flush_interval = 1.0
+
+    def __call__(self, *args, **kwargs):
+        """
+        Buffer this invocation, flushing the buffer if it is full.
+
+        Eager invocations are run immediately, as a batch of one.
+        """
+        item = BatchItem(self.request.id, list(args), kwargs, self._is_reapplied())
+        if self.request.is_eager:
+            self.run_batch([item])
+            return None
+        state = self._batch_state()
+        with state.lock:
+            state.items.append(item)
+            full = len(state.items) >= self.flush_every
+            if len(state.items) == 1 and not full:
+                state.timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                state.timer.daemon = True
+                state.timer.start()
+        if full:
+            self.flush()
+        return None
+
+    def flush(self):
+        """
+        Run the body on every buffered item.
+        """
+        state = self._batch_state()
+        with state.lock:
+            items, state.items = state.items, []
+            if state.timer is not None:
+                state.timer.cancel()
+                state.timer = None
+        if items:
+            self.run_batch(items)
+
+    def _flush_from_timer(self):
+        """
+        Flush the buffer from the timer's own thread, then close that thread's database connections.
+        """
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def run_batch(self, items):
+        """
+        Run the body on ``items``, isolating and reporting any that fail.
+
+        Reapplied items are resolved once they have run successfully.
+        """
+        try:
+            super().__call__(items)
+        except Exception as exc:  # pylint: disable=broad-except
+            if len(items) > 1:
+                log.warning(f'Batch of {len(items)} {self.name} items failed with {exc!r}; running them one by one')
+                for item in items:
+                    self.run_batch([item])
+                return
+            [item] = items
+            log.exception(f'{self.name}[{item.task_id}] failed in a batch')
+            self.on_failure(exc, item.task_id, item.args, item.kwargs, ExceptionInfo())
+            return
+        for item in items:
+            if item.reapplied:
+                mark_resolved(item.task_id)
+
+    def _is_reapplied(self):
+        """
+        Whether the current invocation was submitted by ``FailedTask.reapply``.
+        """
+        if getattr(self.request, REAPPLIED_HEADER, None):
+            return True
+        return bool((getattr(self.request, 'headers', None) or {}).get(REAPPLIED_HEADER))
+
+    def _batch_state(self):
+        """
+        Get this task's buffer, creating it on first use in this process.
+        """
+        state = self.__dict__.get('_batch')
+        if state is None:
+            state = self.__dict__.setdefault('_batch', _BatchState())
+            _batched_tasks.add(self)
+        return state
+
+
+class _BatchState:
+    """
+    The items buffered for one BatchedTask, and the timer that will flush them.
+    """
+
+    def __init__(self):
+        """
+        Start with an empty buffer.
+        """
+        self.lock = threading.Lock()
+        self.items = []
+        self.timer = None
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_all(**kwargs):  # pylint: disable=unused-argument
+    """
+    Flush every BatchedTask's buffer, so that no items are dropped at shutdown.
+    """
+    for task in list(_batched_tasks):
+        task.flush()
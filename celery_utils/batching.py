@@ -0,0 +1,21 @@
+"""
+Helpers for walking large querysets in bounded chunks.
+"""
+
+
+def keyset_batches(queryset, batch_size, start_after=0):
+    """
+    Yield lists of objects from ``queryset`` in ascending primary key order.
+
+    Each batch is fetched with its own ``pk > last_seen`` query rather than
+    with ``OFFSET``, so the cost of fetching a batch does not grow as the walk
+    proceeds, and rows deleted or updated by the caller between batches do
+    not cause others to be skipped.
+    """
+    last_pk = start_after
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
@@ -0,0 +1,82 @@
+"""
+Carrying out bulk admin actions on FailedTask records in batches.
+"""
+
+import logging
+
+from .models import BulkActionJob, FailedTask
+from .storage import DjangoFailureStore
+
+log = logging.getLogger(__name__)
+
+
+def run_job(job, batch_size):
+    """
+    Apply ``job``'s action to its selection, ``batch_size`` records at a time.
+
+    Progress is saved after each batch, so a job that is interrupted can be
+    run again and will carry on where it stopped.  Selected records deleted
+    in the meantime are skipped.
+    """
+    if job.status == BulkActionJob.COMPLETED:
+        log.info(f'Not running {job} again')
+        return
+    handle_batch = _HANDLERS[job.action]
+    job.status = BulkActionJob.RUNNING
+    job.save(update_fields=['status', 'modified'])
+    seen_task_ids = set()
+    remaining = job.remaining_pks()
+    try:
+        for start in range(0, len(remaining), batch_size):
+            pks = remaining[start:start + batch_size]
+            handle_batch(list(FailedTask.objects.filter(pk__in=pks).order_by('pk')), seen_task_ids)
+            job.advance(pks[-1], len(pks))
+    except Exception as exc:
+        job.finish(BulkActionJob.FAILED, repr(exc))
+        raise
+    job.finish(BulkActionJob.COMPLETED)
+    log.info(f'Finished {job}')
+
+
+def _reapply(batch, seen_task_ids):
+    """
+    Reapply each unresolved task in ``batch`` once.
+
+    Quarantined tasks were selected deliberately, so they are released first.
+    """
+    for task in batch:
+        if task.datetime_resolved is not None or task.task_id in seen_task_ids:
+            continue
+        seen_task_ids.add(task.task_id)
+        if task.datetime_quarantined is not None:
+            task.release_quarantine()
+        task.reapply()
+
+
+def _resolve(batch, seen_task_ids):
+    """
+    Mark the unresolved tasks in ``batch`` resolved, through the failure store.
+
+    As with ``mark_resolved``, this keeps the backlog counters up to date and
+    archives the records if ``CELERY_UTILS_ARCHIVE_ON_RESOLVE`` is enabled.
+    """
+    store = DjangoFailureStore()
+    for task in batch:
+        if task.datetime_resolved is not None or task.task_id in seen_task_ids:
+            continue
+        seen_task_ids.add(task.task_id)
+        store.resolve(task.task_id)
+
+
+def _delete(batch, seen_task_ids):  # pylint: disable=unused-argument
+    """
+    Delete the tasks in ``batch``.
+    """
+    FailedTask.objects.filter(pk__in=[task.pk for task in batch]).delete()
+
+
+_HANDLERS = {
+    BulkActionJob.REAPPLY: _reapply,
+    BulkActionJob.RESOLVE: _resolve,
+    BulkActionJob.DELETE: _delete,
+}
@@ -0,0 +1,117 @@
+"""
+Task base class splitting a large iterable argument across several tasks.
+
+Set ``chunk_argument`` to the name of the argument to split::
+
+    class ChunkedPersistOnFailureTask(ChunkedTask, LoggedPersistOnFailureTask):
+        abstract = True
+        chunk_argument = 'user_ids'
+        chunk_size = 1000
+
+    @app.task(base=ChunkedPersistOnFailureTask)
+    def recalculate_grades(course_id, user_ids):
+        ...
+
+    recalculate_grades.delay(course_id, user_ids=all_200k_user_ids)
+
+When the argument holds more than ``chunk_size`` items, the submission is
+replaced by one task per chunk, with every other argument and execution
+option unchanged, which workers run in parallel.  Each chunk succeeds or
+fails on its own, so a failed chunk is persisted (by ``PersistOnFailureTask``)
+with just its own items, and reapplying it redoes only that chunk.
+
+A split submission returns a ``GroupResult`` of the chunks' results, rather
+than the ``AsyncResult`` a submission that isn't split returns.  Callbacks
+passed as ``link`` run once, after every chunk has succeeded, with the list
+of the chunks' results (they become the body of a chord, so the result
+backend must support chords); ``link_error`` callbacks run for each chunk
+that fails.
+"""
+
+import inspect
+import logging
+
+from celery import Task, chord, group
+from celery.utils import uuid
+
+log = logging.getLogger(__name__)
+
+
+class ChunkedTask(Task):
+    """
+    Task base class submitting one task per chunk of a large argument.
+    """
+
+    abstract = True
+
+    #: Name of the argument to split.  Submissions aren't split while it is None.
+    chunk_argument = None
+
+    #: Maximum number of items per chunk.
+    chunk_size = 1000
+
+    def apply_async(self, args=None, kwargs=None, task_id=None, **options):  # pylint: disable=arguments-differ
+        """
+        Submit the task, split into one task per chunk if its chunked argument is too long.
+
+        Returns a ``GroupResult`` of the chunks' results when the task was
+        split, and an ``AsyncResult`` otherwise.  Chunks submitted with an
+        explicit ``task_id`` get ids derived from it.  ``link`` and
+        ``link_error`` callbacks are attached to the chunks as a whole, as
+        described in the module documentation.
+        """
+        args, kwargs = list(args or ()), dict(kwargs or {})
+        if self.chunk_argument is None:
+            return super().apply_async(args=args, kwargs=kwargs, task_id=task_id, **options)
+        if self.chunk_argument in kwargs:
+            position = None
+            items = kwargs[self.chunk_argument]
+        else:
+            parameters = list(inspect.signature(self.run).parameters)
+            if self.chunk_argument not in parameters:
+                raise TypeError(f'Task {self.name} has no argument {self.chunk_argument!r} to split')
+            position = parameters.index(self.chunk_argument)
+            items = args[position] if position < len(args) else None
+        if items is None or len(items) <= self.chunk_size:
+            return super().apply_async(args=args, kwargs=kwargs, task_id=task_id, **options)
+        items = list(items)
+        group_id = task_id or uuid()
+        link, link_error = options.pop('link', None), options.pop('link_error', None)
+        chunks = []
+        for index, start in enumerate(range(0, len(items), self.chunk_size)):
+            chunk_args, chunk_kwargs = list(args), dict(kwargs)
+            if position is None:
+                chunk_kwargs[self.chunk_argument] = items[start:start + self.chunk_size]
+            else:
+                chunk_args[position] = items[start:start + self.chunk_size]
+            chunks.append((chunk_args, chunk_kwargs, f'{group_id}-{index}'))
+        log.info(f'Task {self.name}[{group_id}] split into {len(chunks)} chunks of up to {self.chunk_size} items')
+        if link is None and link_error is None:
+            results = []
+            for chunk_args, chunk_kwargs, chunk_id in chunks:
+                results.append(super().apply_async(args=chunk_args, kwargs=chunk_kwargs, task_id=chunk_id, **options))
+            return self.app.GroupResult(group_id, results)
+        header = group(
+            [
+                self.signature(chunk_args, chunk_kwargs, task_id=chunk_id, **options)
+                for chunk_args, chunk_kwargs, chunk_id in chunks
+            ],
+            id=group_id,
+            app=self.app,
+        )
+        for errback in _as_list(link_error):
+            header.link_error(errback)
+        if link is None:
+            return self.app.GroupResult(group_id, header.apply_async().results)
+        callbacks = _as_list(link)
+        chord(header, callbacks[0] if len(callbacks) == 1 else group(callbacks, app=self.app)).apply_async()
+        return self.app.GroupResult(group_id, [self.AsyncResult(chunk_id) for _, _, chunk_id in chunks])
+
+
+def _as_list(callbacks):
+    """
+    Get the ``link`` or ``link_error`` option value ``callbacks`` as a list.
+    """
+    if callbacks is None:
+        return []
+    return list(callbacks) if isinstance(callbacks, (list, tuple)) else [callbacks]
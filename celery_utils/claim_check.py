@@ -0,0 +1,298 @@
+"""
+Claim-check offloading of oversized task arguments.
+
+Tasks using ``ClaimCheckTask`` as a base class have their arguments written to
+a blob store at submission time whenever their encoded size exceeds
+``claim_check_threshold`` bytes.  The message then carries only a reference
+(``kwargs={'__claim_check__': '<key>'}``), which the worker replaces with the
+original arguments before the task body runs.  If the task fails,
+``PersistOnFailureTask`` records the reference rather than the arguments, and
+``FailedTask.reapply`` re-sends it unchanged.  Retries re-send the reference
+too, unless given new arguments.
+
+The blob is deleted once it can no longer be used: when the task succeeds,
+when it fails without being persisted (i.e. the task is not a
+``PersistOnFailureTask``), and when a retry replaces its arguments.  Blobs
+whose ``FailedTask`` record was resolved or deleted (by retention, archiving,
+the admin or otherwise), or left behind by a worker dying, are deleted by
+``sweep_orphans``, which the ``celery_utils.tasks.sweep_claim_checks`` task
+runs periodically.  Deleting records doesn't touch the blob store, so that
+records can still be deleted in bulk without loading them.
+
+Combine it with the other celery_utils base classes by listing it first::
+
+    class LargeArgumentsTask(ClaimCheckTask, LoggedPersistOnFailureTask):
+        claim_check_threshold = 64 * 1024
+
+The blob store is named by the ``CELERY_UTILS_CLAIM_CHECK_STORE`` setting (a
+dotted path to a ``BlobStore`` subclass), and defaults to
+``FileSystemBlobStore``, which requires the ``CELERY_UTILS_CLAIM_CHECK_DIR``
+setting.  Every process submitting or running the tasks must be able to
+reach the same store: with the filesystem store, that means a shared volume.
+"""
+
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from functools import lru_cache
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from celery import Task, states
+from celery.exceptions import Retry
+
+from .codecs import get_codec
+from .persist_on_failure import PersistOnFailureTask
+from .storage import get_failure_store
+
+log = logging.getLogger(__name__)
+
+CLAIM_CHECK_KWARG = '__claim_check__'
+
+#: Default size, in bytes of encoded arguments, above which arguments are offloaded.
+DEFAULT_THRESHOLD = 256 * 1024
+
+#: Default age past which blobs no failure record refers to are swept.
+DEFAULT_MAX_AGE = timedelta(days=7)
+
+# The key of the claim check the running task's arguments were loaded from.
+_current_key = ContextVar('celery_utils_claim_check', default=None)
+
+
+class BlobStore:
+    """
+    Interface for storage of offloaded task arguments.
+    """
+
+    def put(self, data):
+        """
+        Store ``data`` (bytes), returning a string key to retrieve it with.
+        """
+        raise NotImplementedError
+
+    def get(self, key):
+        """
+        Get the bytes stored under ``key``.
+
+        Raises ``KeyError`` if there are none.
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """
+        Remove the bytes stored under ``key``, if any.
+        """
+        raise NotImplementedError
+
+    def keys(self, stored_before):
+        """
+        Yield the keys of the blobs stored before ``stored_before``, a naive local datetime.
+        """
+        raise NotImplementedError
+
+
+class FileSystemBlobStore(BlobStore):
+    """
+    Blob store keeping one file per blob in a local (or shared) directory.
+
+    The directory is given by the ``CELERY_UTILS_CLAIM_CHECK_DIR`` setting,
+    which must be set: a default such as the system temporary directory is
+    neither shared between hosts nor kept across restarts.
+    """
+
+    @property
+    def location(self):
+        """
+        The directory blobs are stored in.
+        """
+        location = getattr(settings, 'CELERY_UTILS_CLAIM_CHECK_DIR', None)
+        if not location:
+            raise ImproperlyConfigured(
+                'FileSystemBlobStore requires the CELERY_UTILS_CLAIM_CHECK_DIR setting, '
+                'naming a directory shared by every process submitting or running claim-checked tasks'
+            )
+        return location
+
+    def put(self, data):
+        """
+        Write ``data`` to a new file, atomically, and return its name.
+        """
+        os.makedirs(self.location, exist_ok=True)
+        key = uuid.uuid4().hex
+        partial = self._path(f'{key}.partial')
+        with open(partial, 'wb') as blob:
+            blob.write(data)
+        os.replace(partial, self._path(key))
+        return key
+
+    def get(self, key):
+        """
+        Read the file stored under ``key``.
+        """
+        try:
+            with open(self._path(key), 'rb') as blob:
+                return blob.read()
+        except FileNotFoundError as exc:
+            raise KeyError(key) from exc
+
+    def delete(self, key):
+        """
+        Remove the file stored under ``key``, if it exists.
+        """
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self, stored_before):
+        """
+        Yield the names of the files last written before ``stored_before``, including abandoned partial writes.
+        """
+        cutoff = stored_before.timestamp()
+        try:
+            entries = list(os.scandir(self.location))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    yield entry.name
+            except FileNotFoundError:
+                continue
+
+    def _path(self, key):
+        if os.path.basename(key) != key:
+            raise ValueError(f'Invalid claim check key: {key!r}')
+        return os.path.join(self.location, key)
+
+
+def get_blob_store():
+    """
+    Get the blob store configured by the ``CELERY_UTILS_CLAIM_CHECK_STORE`` setting.
+    """
+    path = getattr(settings, 'CELERY_UTILS_CLAIM_CHECK_STORE', 'celery_utils.claim_check.FileSystemBlobStore')
+    return _load_store(path)
+
+
+@lru_cache(maxsize=None)
+def _load_store(path):
+    return import_string(path)()
+
+
+def _claim_check_key(args, kwargs):
+    """
+    Get the blob key if ``args`` and ``kwargs`` are a claim check reference.
+    """
+    if not args and kwargs and isinstance(kwargs, dict) and len(kwargs) == 1:
+        return kwargs.get(CLAIM_CHECK_KWARG)
+    return None
+
+
+def sweep_orphans(max_age=None, batch_size=1000):
+    """
+    Delete the blobs older than ``max_age`` that no unresolved failure record refers to.
+
+    Younger blobs are kept, as their tasks may still be waiting in a queue;
+    ``max_age`` (a ``timedelta``) defaults to the
+    ``CELERY_UTILS_CLAIM_CHECK_MAX_AGE`` setting, in seconds, or seven days.
+    Make it longer than any task could wait to run.
+
+    Returns the number of blobs deleted.
+    """
+    if max_age is None:
+        seconds = getattr(settings, 'CELERY_UTILS_CLAIM_CHECK_MAX_AGE', None)
+        max_age = DEFAULT_MAX_AGE if seconds is None else timedelta(seconds=seconds)
+    store = get_blob_store()
+    candidates = set(store.keys(datetime.now() - max_age))
+    if not candidates:
+        return 0
+    failure_store = get_failure_store()
+    for quarantined in (False, True):
+        for batch in failure_store.iter_unresolved(batch_size=batch_size, quarantined=quarantined):
+            candidates.difference_update(_claim_check_key(failure.args, failure.kwargs) for failure in batch)
+    for key in candidates:
+        store.delete(key)
+    if candidates:
+        log.info(f'Deleted {len(candidates)} orphaned claim check blobs')
+    return len(candidates)
+
+
+# pylint: disable=abstract-method
+class ClaimCheckTask(Task):
+    """
+    Task base class that moves oversized arguments out of the message.
+    """
+
+    abstract = True
+    # The arguments checked at submission are replaced with a reference, which
+    # wouldn't match the task's signature.
+    typing = False
+
+    #: Encoded size in bytes above which arguments are offloaded.  ``None``
+    #: uses the ``CELERY_UTILS_CLAIM_CHECK_THRESHOLD`` setting.
+    claim_check_threshold = None
+
+    def apply_async(self, args=None, kwargs=None, **options):  # pylint: disable=arguments-differ
+        """
+        Replace oversized arguments with a claim check reference before submitting.
+        """
+        if _claim_check_key(args, kwargs) is None:
+            threshold = self.claim_check_threshold
+            if threshold is None:
+                threshold = getattr(settings, 'CELERY_UTILS_CLAIM_CHECK_THRESHOLD', DEFAULT_THRESHOLD)
+            payload = get_codec().dumps([args or [], kwargs or {}]).encode('utf-8')
+            if len(payload) > threshold:
+                key = get_blob_store().put(payload)
+                log.info(f'Task {self.name} arguments ({len(payload)} bytes) offloaded to claim check {key}')
+                args, kwargs = (), {CLAIM_CHECK_KWARG: key}
+        return super().apply_async(args=args, kwargs=kwargs, **options)
+
+    def __call__(self, *args, **kwargs):
+        """
+        Run the task with its original arguments, fetching them from the blob store if needed.
+        """
+        key = _claim_check_key(args, kwargs)
+        if key is None:
+            return super().__call__(*args, **kwargs)
+        args, kwargs = get_codec().loads(get_blob_store().get(key).decode('utf-8'))
+        token = _current_key.set(key)
+        try:
+            return super().__call__(*args, **kwargs)
+        finally:
+            _current_key.reset(token)
+
+    def retry(self, args=None, kwargs=None, *more, **options):  # pylint: disable=keyword-arg-before-vararg
+        """
+        Retry with the claim check reference, rather than offloading the arguments again.
+
+        If the retry is given new arguments, the blob is deleted once it has been published.
+        """
+        key = _current_key.get()
+        if key is None:
+            return super().retry(args, kwargs, *more, **options)
+        if args is None and kwargs is None:
+            return super().retry((), {CLAIM_CHECK_KWARG: key}, *more, **options)
+        try:
+            retried = super().retry(args, kwargs, *more, **options)
+        except Retry:
+            get_blob_store().delete(key)
+            raise
+        if isinstance(retried, Retry):
+            get_blob_store().delete(key)
+        return retried
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        """
+        Delete the offloaded arguments once they are no longer needed.
+
+        They are kept after a failure only if a ``FailedTask`` record refers to them.
+        """
+        key = _claim_check_key(args, kwargs)
+        persisted = isinstance(self, PersistOnFailureTask)
+        if key is not None and (status == states.SUCCESS or (status == states.FAILURE and not persisted)):
+            get_blob_store().delete(key)
+        super().after_return(status, retval, task_id, args, kwargs, einfo)
@@ -0,0 +1,167 @@
+"""
+JSON codecs for storing task arguments.
+
+``FailedTask.args`` and ``FailedTask.kwargs`` are stored with the codec named
+by the ``CELERY_UTILS_JSON_CODEC`` setting (a dotted path to a codec class).
+By default, ``OrjsonCodec`` is used if the optional ``orjson`` package is
+installed, and ``StdlibJSONCodec`` otherwise.  Their output is interchangeable.
+
+Values of the types below, which JSON cannot represent, are stored as tagged
+objects (e.g. ``{"__celery_utils_type__": "uuid", "value": "..."}``) and are
+restored to the original type on load, so that ``FailedTask.reapply``
+re-sends exactly the arguments the task originally received:
+
+* ``datetime.datetime``, ``datetime.date``, ``datetime.time`` and
+  ``datetime.timedelta``
+* ``decimal.Decimal``
+* ``uuid.UUID``
+* ``bytes``
+
+Any other value that cannot be encoded is stored as its ``repr()``, rather
+than causing the failure record to be lost.
+"""
+
+import base64
+import datetime
+import decimal
+from functools import lru_cache
+import json
+import re
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+TYPE_KEY = '__celery_utils_type__'
+
+_TYPE_MARKER = TYPE_KEY.encode()
+_UUID_STRING = re.compile(rb'"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"')
+
+_ENCODERS = (
+    (datetime.datetime, 'datetime', lambda value: value.isoformat()),
+    (datetime.date, 'date', lambda value: value.isoformat()),
+    (datetime.time, 'time', lambda value: value.isoformat()),
+    (datetime.timedelta, 'timedelta', lambda value: [value.days, value.seconds, value.microseconds]),
+    (decimal.Decimal, 'decimal', str),
+    (uuid.UUID, 'uuid', str),
+    (bytes, 'bytes', lambda value: base64.b64encode(value).decode('ascii')),
+)
+
+_DECODERS = {
+    'datetime': datetime.datetime.fromisoformat,
+    'date': datetime.date.fromisoformat,
+    'time': datetime.time.fromisoformat,
+    'timedelta': lambda value: datetime.timedelta(*value),
+    'decimal': decimal.Decimal,
+    'uuid': uuid.UUID,
+    'bytes': base64.b64decode,
+    'repr': lambda value: value,
+}
+
+
+def encode_value(value):
+    """
+    Convert a value JSON cannot represent into a tagged, JSON-safe object.
+
+    Suitable as the ``default`` hook of ``json.dumps`` or ``orjson.dumps``.
+    """
+    for value_type, tag, encode in _ENCODERS:
+        if isinstance(value, value_type):
+            return {TYPE_KEY: tag, 'value': encode(value)}
+    return {TYPE_KEY: 'repr', 'value': repr(value)}
+
+
+def decode_object(obj):
+    """
+    Restore a tagged object produced by ``encode_value``; return others unchanged.
+
+    Suitable as the ``object_hook`` of ``json.loads``.
+    """
+    if len(obj) == 2 and TYPE_KEY in obj and 'value' in obj:
+        decode = _DECODERS.get(obj[TYPE_KEY])
+        if decode is not None:
+            return decode(obj['value'])
+    return obj
+
+
+class StdlibJSONCodec:
+    """
+    Codec built on the standard library ``json`` module.
+    """
+
+    def dumps(self, value):
+        """
+        Encode ``value`` as a JSON string.
+        """
+        return json.dumps(value, default=encode_value, separators=(',', ':'))
+
+    def loads(self, data):
+        """
+        Decode a JSON string produced by ``dumps``.
+        """
+        if TYPE_KEY not in data:
+            # Skip the per-object hook entirely when there is nothing to restore.
+            return json.loads(data)
+        return json.loads(data, object_hook=decode_object)
+
+
+class OrjsonCodec(StdlibJSONCodec):
+    """
+    Codec built on ``orjson``, falling back to the standard library where needed.
+
+    orjson is used for plain JSON data, where it is several times faster.
+    Anything needing a tagged encoding is handed to the standard library:
+    values orjson rejects (the tagged types other than UUID, non-string dict
+    keys, integers wider than 64 bits), output containing anything shaped like
+    a UUID (orjson always writes ``uuid.UUID`` as a plain string, which would
+    not round trip), and data containing tagged values to decode.
+    """
+
+    def dumps(self, value):
+        """
+        Encode ``value`` as a JSON string.
+        """
+        try:
+            # With no default hook, orjson stops at the first value needing a
+            # tag, which is cheaper than calling back into Python for each one.
+            data = orjson.dumps(value, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super().dumps(value)
+        if _UUID_STRING.search(data):
+            return super().dumps(value)
+        return data.decode('utf-8')
+
+    def loads(self, data):
+        """
+        Decode a JSON string produced by ``dumps``.
+        """
+        if TYPE_KEY in data:
+            # orjson has no object hook, and the standard library's is faster
+            # than walking orjson's output in Python.
+            return super().loads(data)
+        return orjson.loads(data)
+
+
+def get_codec():
+    """
+    Get the codec configured by the ``CELERY_UTILS_JSON_CODEC`` setting.
+    """
+    path = getattr(settings, 'CELERY_UTILS_JSON_CODEC', None)
+    if path is None:
+        return _default_codec()
+    return _load_codec(path)
+
+
+@lru_cache(maxsize=None)
+def _load_codec(path):
+    return import_string(path)()
+
+
+@lru_cache(maxsize=None)
+def _default_codec():
+    return StdlibJSONCodec() if orjson is None else OrjsonCodec()
@@ -0,0 +1,170 @@
+"""
+Limiting how many instances of a task run at once, across all workers.
+
+Celery's ``rate_limit`` only applies within each worker.  A
+``ConcurrencyLimitedTask`` instead takes one of ``concurrency_limit`` slots of
+a semaphore shared through the Django cache named by
+``CELERY_UTILS_SEMAPHORE_CACHE`` (default ``'default'``) before running, and
+gives it back when done.  Use a cache shared by all workers, with an atomic
+``add`` (memcached or redis).
+
+Slots are leased for ``concurrency_lease`` seconds, so a slot held by a worker
+that died is eventually freed; set it comfortably above the task's longest
+run time.  When no slot is free, the task is submitted again after a
+jittered, growing countdown (logged by ``LoggedTask.on_retry``).  These waits
+are counted in the ``celery_utils_slot_waits`` message header rather than as
+retries, so they don't use up ``max_retries``; after ``concurrency_max_waits``
+of them the task fails with ``ConcurrencyLimitExceeded``, so that
+``PersistOnFailureTask`` records it as a ``FailedTask``.  A
+``concurrency_limit`` of None leaves the task unlimited::
+
+    class LimitedTask(ConcurrencyLimitedTask, LoggedPersistOnFailureTask):
+        abstract = True
+        concurrency_limit = 4
+"""
+
+import logging
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+
+from celery import Task
+from celery.exceptions import Reject, Retry
+from celery.utils import uuid
+
+from .retry_policy import bounded_exponential_jitter
+
+log = logging.getLogger(__name__)
+
+#: Message header counting how many times a run has waited for a slot.
+SLOT_WAITS_HEADER = 'celery_utils_slot_waits'
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """
+    Raised when a task could not get a concurrency slot within ``concurrency_max_waits`` waits.
+    """
+
+
+class CacheSemaphore:
+    """
+    A counting semaphore of leased slots, stored in the Django cache.
+
+    Each slot is a cache key, taken with an atomic ``add`` and expiring after
+    the lease.
+    """
+
+    def __init__(self, name, limit, lease):
+        """
+        Create a semaphore of ``limit`` slots, each held for at most ``lease`` seconds.
+        """
+        self.name = name
+        self.limit = limit
+        self.lease = lease
+
+    @property
+    def cache(self):
+        """
+        The cache holding the slots.
+        """
+        return caches[getattr(settings, 'CELERY_UTILS_SEMAPHORE_CACHE', 'default')]
+
+    def _slot_key(self, index):
+        return f'celery_utils:semaphore:{self.name}:{index}'
+
+    def acquire(self):
+        """
+        Take a free slot, returning a token for ``release``, or None if every slot is taken.
+        """
+        token = uuid()
+        # Start at a random slot, so that callers don't all contend for the first.
+        first = random.randrange(self.limit)
+        for offset in range(self.limit):
+            key = self._slot_key((first + offset) % self.limit)
+            if self.cache.add(key, token, timeout=self.lease):
+                return (key, token)
+        return None
+
+    def release(self, held):
+        """
+        Give back the slot taken by ``acquire``, unless its lease has already passed to someone else.
+        """
+        key, token = held
+        if self.cache.get(key) == token:
+            self.cache.delete(key)
+
+
+class ConcurrencyLimitedTask(Task):
+    """
+    Task base class running at most ``concurrency_limit`` instances at once.
+    """
+
+    abstract = True
+
+    #: Maximum number of instances running at once, or None for no limit.
+    concurrency_limit = None
+
+    #: Seconds after which a slot is freed even if the task holding it never finished.
+    concurrency_lease = 300
+
+    #: Name of the semaphore to use; tasks sharing a name share its slots.
+    #: Defaults to the task's name.
+    concurrency_key = None
+
+    #: Smallest number of seconds to wait before trying again when no slot is
+    #: free; the wait grows with each try (see ``retry_policy.bounded_exponential_jitter``).
+    concurrency_retry_delay = 5
+
+    #: Number of times to wait for a slot before failing, or None to wait indefinitely.
+    concurrency_max_waits = 10
+
+    @property
+    def semaphore(self):
+        """
+        The semaphore limiting this task.
+        """
+        return CacheSemaphore(self.concurrency_key or self.name, self.concurrency_limit, self.concurrency_lease)
+
+    def __call__(self, *args, **kwargs):
+        """
+        Run the task once a slot is free, or try again later.
+        """
+        if self.concurrency_limit is None:
+            return super().__call__(*args, **kwargs)
+        semaphore = self.semaphore
+        held = semaphore.acquire()
+        if held is None:
+            raise self._wait_for_slot(
+                ConcurrencyLimitExceeded(f'All {semaphore.limit} {semaphore.name} slots are taken'),
+            )
+        try:
+            return super().__call__(*args, **kwargs)
+        finally:
+            semaphore.release(held)
+
+    def _slot_waits(self):
+        waits = getattr(self.request, SLOT_WAITS_HEADER, None)
+        if waits is None:
+            waits = (self.request.headers or {}).get(SLOT_WAITS_HEADER, 0)
+        return waits
+
+    def _wait_for_slot(self, exc):
+        """
+        Submit the current run again after a countdown, or raise ``exc`` if it has waited often enough.
+
+        Like ``retry``, but leaving ``request.retries`` alone.
+        """
+        waits = self._slot_waits()
+        if self.concurrency_max_waits is not None and waits >= self.concurrency_max_waits:
+            raise exc
+        countdown = bounded_exponential_jitter(waits, self.concurrency_retry_delay, self.concurrency_lease)
+        log.info(f'{self.name}[{self.request.id}] is at its concurrency limit; trying again in {countdown:.1f}s')
+        headers = dict(self.request.headers or {}, **{SLOT_WAITS_HEADER: waits + 1})
+        signature = self.signature_from_request(countdown=countdown, headers=headers)
+        if not self.request.is_eager:
+            try:
+                signature.apply_async()
+            except Exception as publish_exc:
+                raise Reject(publish_exc, requeue=False) from publish_exc
+        return Retry(exc=exc, when=countdown, is_eager=self.request.is_eager, sig=signature)
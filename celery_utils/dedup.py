@@ -0,0 +1,152 @@
+"""
+Deduplication of identical task submissions within a short window.
+
+Used by ``LoggedTask`` when its ``dedup_window`` attribute is set.  A
+submission's identity is a hash of the task name and its arguments.  The
+first submission within the window claims the identity in the Django cache
+named by ``CELERY_UTILS_DEDUP_CACHE`` (default ``'default'``), along with the
+id of the task it publishes; later identical submissions get that id back
+instead of publishing.  A small in-process LRU tier of recent identities
+(``CELERY_UTILS_DEDUP_LRU_SIZE`` entries, default 1024) answers repeats from
+the same process without a cache round trip.
+
+Suppressed submissions are logged in aggregate, at most once a minute per
+task, and counted through the metrics hook as
+``celery_utils.dedup.suppressed``.  Counts still pending when the window
+passes are reported by the next submission of any deduplicated task, and at
+worker shutdown.
+
+If publishing a submission fails, ``release`` gives up its claim, so that
+identical submissions are not suppressed in favour of a task never sent.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from celery.signals import worker_process_shutdown, worker_shutdown
+from celery.utils import uuid
+
+from . import metrics
+from .codecs import encode_value
+
+log = logging.getLogger(__name__)
+
+#: Seconds between aggregate log messages about suppressed duplicates of a task.
+LOG_INTERVAL = 60
+
+_lock = threading.Lock()
+_recent = OrderedDict()  # identity -> (task id, expiry as time.monotonic())
+_suppressed = {}  # task name -> (count since last logged, time.monotonic() last logged)
+
+
+def submission_key(task_name, args, kwargs):
+    """
+    Get the cache key identifying a submission of ``task_name`` with ``args`` and ``kwargs``.
+    """
+    payload = json.dumps([task_name, args or [], kwargs or {}], sort_keys=True, default=encode_value)
+    return f'celery_utils:dedup:{hashlib.sha256(payload.encode()).hexdigest()}'
+
+
+def claim(task_name, args, kwargs, window):
+    """
+    Claim the identity of a submission for ``window`` seconds.
+
+    Returns ``(task_id, duplicate)``: the id to publish the submission
+    under and False, or the id of the identical submission already made in
+    the window and True.
+    """
+    key = submission_key(task_name, args, kwargs)
+    now = time.monotonic()
+    with _lock:
+        _report_suppressed(now)
+        recent = _recent.get(key)
+        if recent is not None and recent[1] > now:
+            _recent.move_to_end(key)
+            _record_suppressed(task_name, now)
+            return recent[0], True
+    task_id = uuid()
+    cache = caches[getattr(settings, 'CELERY_UTILS_DEDUP_CACHE', 'default')]
+    duplicate = not cache.add(key, task_id, timeout=window)
+    if duplicate:
+        existing = cache.get(key)
+        if existing is None:
+            # Expired between the add and the get; treat as new.
+            duplicate = False
+        else:
+            task_id = existing
+    with _lock:
+        _recent[key] = (task_id, now + window)
+        _recent.move_to_end(key)
+        while len(_recent) > getattr(settings, 'CELERY_UTILS_DEDUP_LRU_SIZE', 1024):
+            _recent.popitem(last=False)
+        if duplicate:
+            _record_suppressed(task_name, now)
+    return task_id, duplicate
+
+
+def release(task_name, args, kwargs, task_id):
+    """
+    Give up the claim made by ``claim`` for ``task_id``, e.g. because it could not be published.
+
+    The shared claim is only deleted if it still names ``task_id``; there is
+    a small window in which a claim replacing it after expiry could be
+    deleted too, which at worst lets one duplicate through.
+    """
+    key = submission_key(task_name, args, kwargs)
+    with _lock:
+        recent = _recent.get(key)
+        if recent is not None and recent[0] == task_id:
+            del _recent[key]
+    cache = caches[getattr(settings, 'CELERY_UTILS_DEDUP_CACHE', 'default')]
+    if cache.get(key) == task_id:
+        cache.delete(key)
+
+
+def _record_suppressed(task_name, now):
+    """
+    Count a suppressed duplicate of ``task_name``, logging the count once per ``LOG_INTERVAL``.
+
+    Must be called with ``_lock`` held.
+    """
+    count, last_logged = _suppressed.get(task_name, (0, None))
+    _suppressed[task_name] = (count + 1, last_logged)
+    _report_suppressed(now)
+
+
+def _report_suppressed(now, force=False):
+    """
+    Log and publish the pending suppressed counts of tasks not reported within ``LOG_INTERVAL``.
+
+    Every pending count is reported if ``force`` is set.  Must be called with ``_lock`` held.
+    """
+    for task_name, (count, last_logged) in list(_suppressed.items()):
+        if count and (force or last_logged is None or now - last_logged >= LOG_INTERVAL):
+            log.info(f'Suppressed {count} duplicate submissions of {task_name}')
+            metrics.emit('celery_utils.dedup.suppressed', count, task_name=task_name)
+            _suppressed[task_name] = (0, now)
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_suppressed(**kwargs):  # pylint: disable=unused-argument
+    """
+    Report every pending suppressed count, so that none are dropped at shutdown.
+    """
+    with _lock:
+        _report_suppressed(time.monotonic(), force=True)
+
+
+def clear():
+    """
+    Forget the in-process tier of recent submissions and the suppressed counts.
+    """
+    with _lock:
+        _recent.clear()
+        _suppressed.clear()
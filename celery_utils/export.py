@@ -0,0 +1,120 @@
+"""
+Streaming FailedTask records to and from newline-delimited JSON.
+
+Each line holds one record, encoded with the configured task argument codec
+(see ``celery_utils.codecs``), so datetimes and other tagged argument values
+survive the round trip.  Primary keys are not exported: imported records are
+given new ones, so exports can be loaded into a database that already has
+records of its own.  Reapply claims are not exported either, as they only
+mean something to the processes of the exporting deployment.
+"""
+
+from collections import Counter
+import gzip
+from itertools import islice
+import logging
+
+from django.db import router
+from django.utils.timezone import now
+
+from . import backlog
+from .batching import keyset_batches
+from .codecs import get_codec
+from .models import FailedTask, reapply_backoff
+
+log = logging.getLogger(__name__)
+
+# FailedTask fields written to, and read back from, each line.
+EXPORTED_FIELDS = (
+    'task_name', 'task_id', 'args', 'kwargs', 'exc', 'created', 'modified', 'datetime_resolved', 'attempts',
+    'fingerprint', 'repeat_failures', 'datetime_quarantined', 'trace', 'next_attempt_at',
+)
+
+
+def open_ndjson(path, mode):
+    """
+    Open ``path`` for reading or writing NDJSON, gzip-compressed if it ends with ``.gz``.
+
+    ``mode`` is ``'r'`` or ``'w'``; the file is opened in text mode.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')  # pylint: disable=consider-using-with
+
+
+def export_failed_tasks(queryset, stream, batch_size=1000):
+    """
+    Write the FailedTask records in ``queryset`` to the text ``stream``, one JSON object per line.
+
+    Records are fetched in primary key order, ``batch_size`` at a time, so
+    memory use does not grow with the number of records exported.
+
+    Returns the number of records written.
+    """
+    codec = get_codec()
+    exported = 0
+    for batch in keyset_batches(queryset.only(*EXPORTED_FIELDS), batch_size):
+        stream.writelines(
+            codec.dumps({name: getattr(task, name) for name in EXPORTED_FIELDS}) + '\n' for task in batch
+        )
+        exported += len(batch)
+    return exported
+
+
+def import_failed_tasks(stream, batch_size=1000):
+    """
+    Create FailedTask records from the lines of an export read from the text ``stream``.
+
+    Records are inserted with one ``bulk_create`` per ``batch_size`` lines.
+    Blank lines are skipped.
+
+    An unresolved record is skipped if its task already has an unresolved
+    record, in the database or earlier in the export, so that importing an
+    export twice does not reapply its tasks twice.  Imported unresolved
+    records are added to the backlog counters, if enabled.
+
+    Returns the number of records created.
+    """
+    codec = get_codec()
+    lines = (line for line in stream if line.strip())
+    imported = skipped = 0
+    while True:
+        batch = [_build_task(codec.loads(line)) for line in islice(lines, batch_size)]
+        if not batch:
+            break
+        unresolved_task_ids = set(
+            FailedTask.objects.using(router.db_for_write(FailedTask)).filter(
+                task_id__in={task.task_id for task in batch if task.datetime_resolved is None},
+                datetime_resolved=None,
+            ).values_list('task_id', flat=True)
+        )
+        new = []
+        for task in batch:
+            if task.datetime_resolved is None:
+                if task.task_id in unresolved_task_ids:
+                    skipped += 1
+                    continue
+                unresolved_task_ids.add(task.task_id)
+            new.append(task)
+        FailedTask.objects.bulk_create(new)
+        if backlog.is_enabled():
+            for task_name, count in Counter(task.task_name for task in new if task.datetime_resolved is None).items():
+                backlog.increment(task_name, count)
+        imported += len(new)
+        log.info(f'Imported {imported} failed task records')
+    if skipped:
+        log.info(f'Skipped {skipped} unresolved failed task records already recorded as failed')
+    return imported
+
+
+def _build_task(record):
+    """
+    Make an unsaved FailedTask from one decoded export line.
+
+    Unresolved records from exports without ``next_attempt_at`` are given
+    the backoff due after their number of reapply attempts.
+    """
+    task = FailedTask(**{name: record[name] for name in EXPORTED_FIELDS if name in record})
+    if task.datetime_resolved is None and task.next_attempt_at is None:
+        task.next_attempt_at = now() + reapply_backoff(task.attempts)
+    return task
@@ -0,0 +1,48 @@
+"""
+Model fields for celery_utils.
+"""
+
+import warnings
+
+from jsonfield import JSONField
+from jsonfield.fields import INVALID_JSON_WARNING
+from jsonfield.json import JSONString
+
+from .codecs import get_codec
+
+
+class CodecJSONField(JSONField):
+    """
+    JSONField that reads and writes the database through ``codecs.get_codec()``.
+
+    Forms and admin widgets keep using ``jsonfield``'s plain JSON handling.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        """
+        Convert the stored JSON string to a Python value.
+        """
+        if value is None:
+            return None
+        try:
+            return get_codec().loads(value)
+        except ValueError:
+            warnings.warn(INVALID_JSON_WARNING.format(self, value), RuntimeWarning)
+            return JSONString(value)
+
+    def get_prep_value(self, value):
+        """
+        Convert a Python value to the stored JSON string.
+        """
+        if self.null and value is None:
+            return None
+        if isinstance(value, JSONString):
+            # Text that could not be decoded when loaded is written back untouched.
+            return str(value)
+        return get_codec().dumps(value)
+
+    def value_to_string(self, obj):
+        """
+        Serialize the field's value on ``obj``, e.g. for ``dumpdata``.
+        """
+        return get_codec().dumps(self.value_from_object(obj))
@@ -0,0 +1,159 @@
+"""
+Query-count and latency instrumentation for celery_utils database operations.
+
+Enable with the ``CELERY_UTILS_INSTRUMENTATION`` setting.  While enabled,
+every query issued inside an ``instrumented(operation)`` block:
+
+* is tagged with a leading ``/* celery_utils:<operation> */`` SQL comment, so
+  it can be attributed in the database's own slow-query and activity logs;
+* is counted and timed against the innermost enclosing operation.
+
+At the end of each block the totals are sent to the metrics hook (see
+``celery_utils.metrics``) and added to running aggregates kept in the cache
+named by ``CELERY_UTILS_STATS_CACHE`` (default ``'default'``), which the
+``celery_utils_stats`` management command reports.  A shared cache backend
+(memcached, redis) aggregates across all worker processes.
+"""
+
+from contextlib import ExitStack, contextmanager
+import threading
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from . import metrics
+
+#: Operations instrumented by celery_utils, in the order they are reported.
+OPERATIONS = (
+    'on_failure',
+    'mark_resolved',
+    'reapply',
+    'reapply_tasks',
+    'cleanup_resolved_tasks',
+    'archive_resolved_tasks',
+    'export_failed_tasks',
+    'import_failed_tasks',
+)
+
+#: Aggregates kept per operation.  Times are stored in microseconds.
+FIELDS = ('calls', 'queries', 'query_time_us', 'wall_time_us')
+
+_local = threading.local()
+
+
+def is_enabled():
+    """
+    Whether instrumentation is turned on.
+    """
+    return getattr(settings, 'CELERY_UTILS_INSTRUMENTATION', False)
+
+
+class _Measurement:
+    """
+    Query totals for one execution of an instrumented operation.
+    """
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.queries = 0
+        self.query_time = 0.0
+
+
+class _QueryTagger:
+    """
+    Database execute wrapper attributing queries to the innermost operation.
+    """
+
+    def __call__(self, execute, sql, params, many, context):
+        if not _local.stack:
+            return execute(sql, params, many, context)
+        measurement = _local.stack[-1]
+        sql = f'/* celery_utils:{measurement.operation} */ {sql}'
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            measurement.query_time += perf_counter() - start
+            measurement.queries += 1
+
+
+@contextmanager
+def instrumented(operation):
+    """
+    Attribute database queries issued within the block to ``operation``.
+
+    Blocks may be nested (a reapply running eagerly may trigger
+    ``on_failure``, for instance); each query is only counted against the
+    innermost operation, while wall time is inclusive.
+    """
+    if not is_enabled():
+        yield
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    measurement = _Measurement(operation)
+    start = perf_counter()
+    try:
+        with ExitStack() as wrappers:
+            if not stack:
+                tagger = _QueryTagger()
+                for connection in connections.all():
+                    wrappers.enter_context(connection.execute_wrapper(tagger))
+            stack.append(measurement)
+            try:
+                yield
+            finally:
+                stack.pop()
+    finally:
+        _record(measurement, perf_counter() - start)
+
+
+def _record(measurement, wall_time):
+    """
+    Publish a finished measurement to the metrics hook and the shared aggregates.
+    """
+    operation = measurement.operation
+    metrics.emit('celery_utils.db.queries', measurement.queries, operation=operation)
+    metrics.emit('celery_utils.db.query_time', measurement.query_time, operation=operation)
+    metrics.emit('celery_utils.operation.duration', wall_time, operation=operation)
+    cache = _stats_cache()
+    for field, delta in zip(FIELDS, (
+            1, measurement.queries, int(measurement.query_time * 1e6), int(wall_time * 1e6)
+    )):
+        key = _stats_key(operation, field)
+        if not cache.add(key, delta, timeout=None):
+            try:
+                cache.incr(key, delta)
+            except ValueError:  # Evicted between add and incr
+                cache.set(key, delta, timeout=None)
+
+
+def get_stats(operations=OPERATIONS):
+    """
+    Get the aggregated stats for each of ``operations``.
+
+    Returns a dict mapping operation name to a dict of ``FIELDS`` values.
+    """
+    values = _stats_cache().get_many([_stats_key(op, field) for op in operations for field in FIELDS])
+    return {
+        op: {field: values.get(_stats_key(op, field), 0) for field in FIELDS}
+        for op in operations
+    }
+
+
+def reset_stats(operations=OPERATIONS):
+    """
+    Clear the aggregated stats for each of ``operations``.
+    """
+    _stats_cache().delete_many([_stats_key(op, field) for op in operations for field in FIELDS])
+
+
+def _stats_cache():
+    return caches[getattr(settings, 'CELERY_UTILS_STATS_CACHE', 'default')]
+
+
+def _stats_key(operation, field):
+    return f'celery_utils:stats:{operation}:{field}'
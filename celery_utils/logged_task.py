@@ -2,10 +2,17 @@
 Improved logging for celery tasks.
 """
 
+from contextlib import ExitStack
+from functools import wraps
+import inspect
 import logging
 
+from django.conf import settings
+
 from celery import Task
 
+from . import dedup, resources, tracing, watchdog
+
 log = logging.getLogger(__name__)
 
 
@@ -13,15 +20,80 @@ log = logging.getLogger(__name__)
 class LoggedTask(Task):
     """
     Task base class that emits a log statement when it gets submitted.
+
+    Set ``dedup_window`` to drop identical submissions made within that many
+    seconds of each other (see ``celery_utils.dedup``), and
+    ``track_resources`` to measure the memory and CPU time of each run (see
+    ``celery_utils.resources``).  Set ``watchdog_threshold`` to log where
+    runs lasting longer than it are stuck (see ``celery_utils.watchdog``).
+
+    With the ``CELERY_UTILS_TRACING`` setting enabled, submissions carry a
+    trace context, and runs are exported as spans (see ``celery_utils.tracing``).
+
+    Only tasks with one of these measurements enabled have their ``run``
+    wrapped in it, when they are bound to their app; the settings enabling
+    them are read then.  Other tasks are run by Celery directly.
     """
 
     abstract = True
 
+    #: Seconds within which an identical submission returns the earlier
+    #: submission's result instead of publishing.  ``None`` disables this.
+    dedup_window = None
+
+    #: Whether to measure and report the resources used by each run.
+    track_resources = False
+
+    #: Seconds after which a run's stack is logged, or ``watchdog.LEARNED``.
+    #: ``None`` disables the watchdog, unless the task's name has a threshold
+    #: in the ``CELERY_UTILS_WATCHDOG_THRESHOLDS`` setting.
+    watchdog_threshold = None
+
+    @classmethod
+    def on_bound(cls, app):
+        """
+        Wrap the task's ``run`` in the measurements it has enabled, or unwrap it if it has none.
+        """
+        super().on_bound(app)
+        run = cls.__dict__.get('run')
+        if run is None:
+            return
+        run = getattr(run, 'uninstrumented', run)
+        cls.run = _instrumented(run) if cls._is_instrumented() else run
+
+    @classmethod
+    def _is_instrumented(cls):
+        return (
+            cls.track_resources or cls.watchdog_threshold is not None or tracing.is_enabled()
+            or getattr(settings, 'CELERY_UTILS_WATCHDOG_THRESHOLDS', {}).get(cls.name) is not None
+        )
+
     def apply_async(self, args=None, kwargs=None, **options):  # pylint: disable=arguments-differ
         """
         Emit a log statement when the task is submitted.
+
+        With ``dedup_window`` set, a submission identical to one made within
+        the window is not published; the earlier submission's ``AsyncResult``
+        is returned instead.  If publishing fails, the submission's claim on
+        the window is released before the error is raised.  Submissions with an explicit ``task_id`` (such
+        as reapplied failures) are always published.
+
+        With tracing enabled, a trace context is added to the message headers.
         """
-        result = super().apply_async(args=args, kwargs=kwargs, **options)
+        claimed = None
+        if self.dedup_window and options.get('task_id') is None:
+            task_id, duplicate = dedup.claim(self.name, args, kwargs, self.dedup_window)
+            if duplicate:
+                return self.AsyncResult(task_id)
+            options['task_id'] = claimed = task_id
+        if tracing.is_enabled():
+            options['headers'] = tracing.inject(options.get('headers'))
+        try:
+            result = super().apply_async(args=args, kwargs=kwargs, **options)
+        except Exception:
+            if claimed is not None:
+                dedup.release(self.name, args, kwargs, claimed)
+            raise
         log.info('Task {}[{}] submitted with arguments {}, {}'.format(  # pylint: disable=consider-using-f-string
             self.name,
             result.id,
@@ -51,3 +123,32 @@ class LoggedTask(Task):
             )
         )
         super().on_failure(exc, task_id, args, kwargs, einfo)
+
+
+def _instrumented(run):
+    """
+    Wrap ``run``, a task's ``run`` function or staticmethod, to measure, watch and trace it as configured.
+    """
+    function = getattr(run, '__func__', run)
+
+    @wraps(function)
+    def instrumented_run(self, *args, **kwargs):
+        threshold = watchdog.threshold_for(self)
+        with ExitStack() as stack:
+            if tracing.is_enabled():
+                stack.enter_context(tracing.span(self))
+            if self.track_resources:
+                stack.enter_context(resources.tracked(self))
+            if threshold is not None:
+                stack.enter_context(watchdog.watching(self, threshold))
+            return run.__get__(self, type(self))(*args, **kwargs)
+
+    instrumented_run.uninstrumented = run
+    if isinstance(run, staticmethod):
+        # Bound to the task, the wrapper's signature loses its first parameter;
+        # give it the task's to lose, so that ``task.run`` keeps the function's.
+        signature = inspect.signature(function)
+        instrumented_run.__signature__ = signature.replace(parameters=[
+            inspect.Parameter('task', inspect.Parameter.POSITIONAL_ONLY), *signature.parameters.values(),
+        ])
+    return instrumented_run
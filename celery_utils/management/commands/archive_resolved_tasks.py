@@ -0,0 +1,82 @@
+"""
+Command to move resolved FailedTask records into the archive table.
+"""
+
+from datetime import timedelta
+import logging
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from ...archive import archive_resolved_tasks
+from ...instrumentation import instrumented
+from ...models import CommandCheckpoint, FailedTask
+from ...routers import read_from
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Move resolved FailedTask records into the ArchivedFailedTask table.
+    """
+    help = dedent(__doc__).strip()
+
+    def add_arguments(self, parser):
+        """
+        Add arguments to the command parser.
+
+        Uses argparse syntax.  See documentation at
+        https://docs.python.org/3/library/argparse.html.
+        """
+        parser.add_argument(
+            '--task-name', '-t',
+            default=None,
+            help="Restrict archiving to tasks matching the named task.",
+        )
+        parser.add_argument(
+            '--age', '-a',
+            type=int,
+            default=0,
+            help="Only archive tasks that have been resolved for at least the specified number of days (default: 0)",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of records to move and checkpoint at a time (default: 1000).',
+        )
+        parser.add_argument(
+            '--database',
+            default=None,
+            help=(
+                'Database alias to send read-only queries to, such as a replica '
+                '(requires celery_utils.routers.CeleryUtilsRouter).'
+            ),
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            default=False,
+            help='Continue the last interrupted run with the same arguments instead of starting over.',
+        )
+
+    @instrumented('archive_resolved_tasks')
+    def handle(self, *args, **options):
+        resolved_before = now() - timedelta(days=options['age'])
+        checkpoint = CommandCheckpoint.for_run(
+            'archive_resolved_tasks',
+            {'task_name': options['task_name'], 'age': options['age']},
+            resume=options['resume'],
+        )
+        tasks = FailedTask.objects.filter(datetime_resolved__lt=resolved_before, pk__gt=checkpoint.last_pk)
+        if options['task_name'] is not None:
+            tasks = tasks.filter(task_name=options['task_name'])
+        with read_from(options['database']):
+            log.info('Archiving {} tasks'.format(tasks.count()))  # pylint: disable=consider-using-f-string
+        for last_pk, moved in archive_resolved_tasks(
+                resolved_before, options['task_name'], options['batch_size'], checkpoint.last_pk
+        ):
+            checkpoint.advance(last_pk, moved)
+        checkpoint.complete()
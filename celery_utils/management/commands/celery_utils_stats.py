@@ -0,0 +1,65 @@
+"""
+Report database usage of celery_utils operations.
+"""
+
+import logging
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand
+
+from ...instrumentation import OPERATIONS, get_stats, is_enabled, reset_stats
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Report query counts and latency recorded for celery_utils operations.
+
+    Stats are only collected while the CELERY_UTILS_INSTRUMENTATION setting is
+    enabled.
+    """
+    help = dedent(__doc__).strip()
+
+    def add_arguments(self, parser):
+        """
+        Add arguments to the command parser.
+
+        Uses argparse syntax.  See documentation at
+        https://docs.python.org/3/library/argparse.html.
+        """
+        parser.add_argument(
+            '--operation', '-o',
+            action='append',
+            choices=OPERATIONS,
+            default=None,
+            help='Restrict the report to the given operation.  May be repeated.',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            default=False,
+            help='Clear the recorded stats after reporting them.',
+        )
+
+    def handle(self, *args, **options):
+        if not is_enabled():
+            log.warning('CELERY_UTILS_INSTRUMENTATION is not enabled; no new stats are being recorded.')
+        operations = options['operation'] or OPERATIONS
+        stats = get_stats(operations)
+        self.stdout.write(
+            f"{'operation':<24} {'calls':>10} {'queries':>10} {'queries/call':>12} "
+            f"{'query ms':>12} {'ms/call':>10} {'wall ms/call':>12}"
+        )
+        for operation in operations:
+            op_stats = stats[operation]
+            calls = op_stats['calls']
+            query_ms = op_stats['query_time_us'] / 1000
+            self.stdout.write(
+                f"{operation:<24} {calls:>10} {op_stats['queries']:>10} "
+                f"{op_stats['queries'] / calls if calls else 0:>12.1f} "
+                f"{query_ms:>12.1f} {query_ms / calls if calls else 0:>10.2f} "
+                f"{op_stats['wall_time_us'] / 1000 / calls if calls else 0:>12.2f}"
+            )
+        if options['reset']:
+            reset_stats(operations)
@@ -9,7 +9,10 @@ from textwrap import dedent
 from django.core.management.base import BaseCommand
 from django.utils.timezone import now
 
-from ...models import FailedTask
+from ...instrumentation import instrumented
+from ...models import CommandCheckpoint
+from ...routers import read_from
+from ...storage import get_failure_store
 
 log = logging.getLogger(__name__)
 
@@ -44,17 +47,55 @@ class Command(BaseCommand):
             default=30,
             help="Only delete tasks that have been resolved for at least the specified number of days (default: 30)",
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of records to delete and checkpoint at a time (default: 1000).',
+        )
+        parser.add_argument(
+            '--database',
+            default=None,
+            help=(
+                'Database alias to send read-only queries to, such as a replica '
+                '(requires celery_utils.routers.CeleryUtilsRouter).'
+            ),
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            default=False,
+            help='Continue the last interrupted run with the same arguments instead of starting over.',
+        )
 
+    @instrumented('cleanup_resolved_tasks')
     def handle(self, *args, **options):
-        tasks = FailedTask.objects.filter(datetime_resolved__lt=now() - timedelta(days=options['age']))
-        if options['task_name'] is not None:
-            tasks = tasks.filter(task_name=options['task_name'])
-        log.info('Cleaning up {} tasks'.format(tasks.count()))  # pylint: disable=consider-using-f-string
+        store = get_failure_store()
+        resolved_before = now() - timedelta(days=options['age'])
         if options['dry_run']:
-            log.info("Tasks to clean up:\n{}".format(  # pylint: disable=consider-using-f-string
-                '\n '.join('{!r}, resolved {}'.format(  # pylint: disable=consider-using-f-string
-                    task, task.datetime_resolved) for task in tasks
-                           )
+            with read_from(options['database']):
+                log.info('Cleaning up {} tasks'.format(  # pylint: disable=consider-using-f-string
+                    store.count_resolved(resolved_before, options['task_name'])
+                ))
+                log.info("Tasks to clean up:\n{}".format(  # pylint: disable=consider-using-f-string
+                    '\n '.join('{!r}, resolved {}'.format(  # pylint: disable=consider-using-f-string
+                        task, task.datetime_resolved)
+                        for batch in store.iter_resolved(resolved_before, options['task_name'])
+                        for task in batch
+                    )
+                ))
+            return
+        checkpoint = CommandCheckpoint.for_run(
+            'cleanup_resolved_tasks',
+            {'task_name': options['task_name'], 'age': options['age'], 'store': store.identity},
+            resume=options['resume'],
+        )
+        with read_from(options['database']):
+            log.info('Cleaning up {} tasks'.format(  # pylint: disable=consider-using-f-string
+                store.count_resolved(resolved_before, options['task_name'], after=checkpoint.last_pk)
             ))
-        else:
-            tasks.delete()
+        for last_pk, deleted in store.purge(
+                resolved_before, options['task_name'], checkpoint.last_pk, options['batch_size']
+        ):
+            checkpoint.advance(last_pk, deleted)
+        checkpoint.complete()
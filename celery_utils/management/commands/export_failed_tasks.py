@@ -0,0 +1,108 @@
+"""
+Command to export FailedTask records as newline-delimited JSON.
+"""
+
+from argparse import ArgumentTypeError
+from datetime import datetime
+import logging
+from textwrap import dedent
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import is_naive, make_aware
+
+from ...export import export_failed_tasks, open_ndjson
+from ...instrumentation import instrumented
+from ...models import FailedTask
+from ...routers import read_from
+
+log = logging.getLogger(__name__)
+
+
+def parse_datetime(value):
+    """
+    Parse an ISO 8601 date or datetime argument, in the current time zone if none is given.
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise ArgumentTypeError(f'{value!r} is not an ISO 8601 date or datetime') from exc
+    return make_aware(parsed) if settings.USE_TZ and is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    """
+    Export FailedTask records as newline-delimited JSON, one record per line.
+
+    The output is gzip-compressed if the path ends with ``.gz``; a path of
+    ``-`` writes to standard output.  Load it with ``import_failed_tasks``.
+    """
+    help = dedent(__doc__).strip()
+
+    def add_arguments(self, parser):
+        """
+        Add arguments to the command parser.
+
+        Uses argparse syntax.  See documentation at
+        https://docs.python.org/3/library/argparse.html.
+        """
+        parser.add_argument(
+            'path',
+            help='File to write the export to.',
+        )
+        parser.add_argument(
+            '--task-name', '-t',
+            default=None,
+            help="Restrict the export to tasks matching the named task.",
+        )
+        parser.add_argument(
+            '--since',
+            type=parse_datetime,
+            default=None,
+            help='Only export tasks that failed at or after this ISO 8601 date or datetime.',
+        )
+        parser.add_argument(
+            '--until',
+            type=parse_datetime,
+            default=None,
+            help='Only export tasks that failed before this ISO 8601 date or datetime.',
+        )
+        parser.add_argument(
+            '--state',
+            choices=('all', 'resolved', 'unresolved'),
+            default='all',
+            help='Only export resolved or unresolved tasks (default: all).',
+        )
+        parser.add_argument(
+            '--database',
+            default=None,
+            help=(
+                'Database alias to send read-only queries to, such as a replica '
+                '(requires celery_utils.routers.CeleryUtilsRouter).'
+            ),
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of records to fetch at a time (default: 1000).',
+        )
+
+    @instrumented('export_failed_tasks')
+    def handle(self, *args, **options):
+        tasks = FailedTask.objects.all()
+        if options['task_name'] is not None:
+            tasks = tasks.filter(task_name=options['task_name'])
+        if options['since'] is not None:
+            tasks = tasks.filter(created__gte=options['since'])
+        if options['until'] is not None:
+            tasks = tasks.filter(created__lt=options['until'])
+        if options['state'] != 'all':
+            tasks = tasks.filter(datetime_resolved__isnull=options['state'] == 'unresolved')
+        with read_from(options['database']):
+            if options['path'] == '-':
+                exported = export_failed_tasks(tasks, self.stdout, options['batch_size'])
+            else:
+                with open_ndjson(options['path'], 'w') as stream:
+                    exported = export_failed_tasks(tasks, stream, options['batch_size'])
+        log.info(f'Exported {exported} failed task records')
@@ -0,0 +1,53 @@
+"""
+Command to import FailedTask records from newline-delimited JSON.
+"""
+
+import logging
+import sys
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand
+
+from ...export import import_failed_tasks, open_ndjson
+from ...instrumentation import instrumented
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Import FailedTask records written by ``export_failed_tasks``.
+
+    The input is read as gzip if the path ends with ``.gz``; a path of ``-``
+    reads from standard input.  Imported records are given new primary keys;
+    unresolved records for tasks that already have an unresolved record are
+    skipped.
+    """
+    help = dedent(__doc__).strip()
+
+    def add_arguments(self, parser):
+        """
+        Add arguments to the command parser.
+
+        Uses argparse syntax.  See documentation at
+        https://docs.python.org/3/library/argparse.html.
+        """
+        parser.add_argument(
+            'path',
+            help='File to read the export from.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of records to insert at a time (default: 1000).',
+        )
+
+    @instrumented('import_failed_tasks')
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            imported = import_failed_tasks(sys.stdin, options['batch_size'])
+        else:
+            with open_ndjson(options['path'], 'r') as stream:
+                imported = import_failed_tasks(stream, options['batch_size'])
+        log.info(f'Imported {imported} failed task records in total')
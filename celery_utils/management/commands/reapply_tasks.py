@@ -2,12 +2,16 @@
 Reset persistent grades for learners.
 """
 
+from datetime import timedelta
 import logging
 from textwrap import dedent
 
 from django.core.management.base import BaseCommand
 
-from ...models import FailedTask
+from ...instrumentation import instrumented
+from ...models import CommandCheckpoint
+from ...routers import read_from
+from ...storage import get_failure_store
 
 log = logging.getLogger(__name__)
 
@@ -15,6 +19,9 @@ log = logging.getLogger(__name__)
 class Command(BaseCommand):
     """
     Reapply tasks that failed previously.
+
+    Quarantined tasks (see ``FailedTask.reapply``) are skipped, unless
+    ``--quarantined`` is given, in which case only they are reapplied.
     """
     help = dedent(__doc__).strip()
 
@@ -31,16 +38,73 @@ class Command(BaseCommand):
             default=None,
             help='Restrict reapplied tasks to those matching the given task-name.'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of records to load and checkpoint at a time (default: 1000).',
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=None,
+            help=(
+                'Seconds after which a claim taken by another (possibly crashed) reapply run may be taken over '
+                '(default: the CELERY_UTILS_REAPPLY_LEASE setting, or one hour).'
+            ),
+        )
+        parser.add_argument(
+            '--database',
+            default=None,
+            help=(
+                'Database alias to send read-only queries to, such as a replica '
+                '(requires celery_utils.routers.CeleryUtilsRouter).'
+            ),
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            default=False,
+            help='Continue the last interrupted run with the same arguments instead of starting over.',
+        )
+        parser.add_argument(
+            '--quarantined',
+            action='store_true',
+            default=False,
+            help='Release quarantined tasks and reapply them, instead of reapplying the tasks not quarantined.',
+        )
 
+    @instrumented('reapply_tasks')
     def handle(self, *args, **options):
-        tasks = FailedTask.objects.filter(datetime_resolved=None)
-        if options['task_name'] is not None:
-            tasks = tasks.filter(task_name=options['task_name'])
-        log.info('Reapplying {} tasks'.format(tasks.count()))  # pylint: disable=consider-using-f-string
-        log.debug('Reapplied tasks: {}'.format(list(tasks)))  # pylint: disable=consider-using-f-string
+        store = get_failure_store()
+        checkpoint = CommandCheckpoint.for_run(
+            'reapply_tasks',
+            {'task_name': options['task_name'], 'quarantined': options['quarantined'], 'store': store.identity},
+            resume=options['resume'],
+        )
+        with read_from(options['database']):
+            log.info('Reapplying {} tasks'.format(  # pylint: disable=consider-using-f-string
+                store.count_unresolved(
+                    options['task_name'], after=checkpoint.last_pk, quarantined=options['quarantined'],
+                )
+            ))
+            if not options['quarantined']:
+                quarantined = store.count_unresolved(options['task_name'], quarantined=True)
+                if quarantined:
+                    log.info(f'Skipping {quarantined} quarantined tasks; reapply them with --quarantined')
+        lease = None if options['lease'] is None else timedelta(seconds=options['lease'])
         seen_tasks = set()
-        for task in tasks:
-            if task.task_id in seen_tasks:
-                continue
-            seen_tasks.add(task.task_id)
-            task.reapply()
+        batches = store.iter_unresolved(
+            options['task_name'], checkpoint.last_pk, options['batch_size'], quarantined=options['quarantined'],
+        )
+        for batch in batches:
+            log.debug('Reapplied tasks: {}'.format(batch))  # pylint: disable=consider-using-f-string
+            for task in batch:
+                if task.task_id in seen_tasks:
+                    continue
+                seen_tasks.add(task.task_id)
+                if options['quarantined']:
+                    task.release_quarantine()
+                task.reapply(lease=lease)
+            checkpoint.advance(batch[-1].pk, len(batch))
+        checkpoint.complete()
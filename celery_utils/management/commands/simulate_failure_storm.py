@@ -0,0 +1,216 @@
+"""
+Command to measure how fast failures can be persisted, for capacity planning.
+"""
+
+from contextlib import ExitStack
+import itertools
+import logging
+import statistics
+from textwrap import dedent
+import threading
+from time import perf_counter, sleep
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from celery import shared_task
+
+from ... import backlog
+from ...models import FailedTask
+from ...persist_on_failure import LoggedPersistOnFailureTask
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class StormFailure(Exception):
+    """
+    The exception raised by every simulated failure.
+    """
+
+
+class _QueryCounter:
+    """
+    Database execute wrapper counting the queries it sees.
+    """
+
+    def __init__(self):
+        """
+        Start counting from zero.
+        """
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class StormTask(LoggedPersistOnFailureTask):  # pylint: disable=abstract-method
+    """
+    Task base class timing and counting the queries of each ``on_failure``.
+
+    The measurement of the latest failure in the current thread is left in
+    ``_local.measurement`` as ``(seconds, queries)``.
+    """
+
+    abstract = True
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        """
+        Persist the failure as usual, measuring how long it takes.
+        """
+        counter = _QueryCounter()
+        start = perf_counter()
+        with ExitStack() as wrappers:
+            for conn in connections.all():
+                wrappers.enter_context(conn.execute_wrapper(counter))
+            super().on_failure(exc, task_id, args, kwargs, einfo)
+        _local.measurement = (perf_counter() - start, counter.queries)
+
+
+@shared_task(base=StormTask)
+def storm_failure(payload):
+    """
+    Fail, with ``payload`` as the argument to be persisted.
+    """
+    raise StormFailure(f'Simulated failure with a {len(payload)} character payload')
+
+
+def percentile(sorted_values, fraction):
+    """
+    Get the value ``fraction`` of the way through ``sorted_values`` (nearest rank).
+    """
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Command(BaseCommand):
+    """
+    Simulate a storm of failing tasks, and report how quickly their failures are persisted.
+
+    Failures are raised by a LoggedPersistOnFailureTask run eagerly in this
+    process (no broker or worker is involved), from ``--concurrency``
+    threads, each with its own database connection.  The records created are
+    deleted afterwards, and taken off the backlog counters, unless ``--keep``
+    is given.
+
+    Run it against a database configured like production, never against
+    production itself.
+    """
+    help = dedent(__doc__).strip()
+
+    def add_arguments(self, parser):
+        """
+        Add arguments to the command parser.
+
+        Uses argparse syntax.  See documentation at
+        https://docs.python.org/3/library/argparse.html.
+        """
+        parser.add_argument(
+            '--count', '-n',
+            type=int,
+            default=1000,
+            help='Number of failures to simulate (default: 1000).',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Target failures per second across all threads (default: 0, as fast as possible).',
+        )
+        parser.add_argument(
+            '--concurrency', '-c',
+            type=int,
+            default=1,
+            help='Number of threads raising failures at once (default: 1).',
+        )
+        parser.add_argument(
+            '--payload-size',
+            type=int,
+            default=1024,
+            help='Size in characters of the argument persisted with each failure (default: 1024).',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            default=False,
+            help='Keep the FailedTask records created, rather than deleting them afterwards.',
+        )
+
+    def handle(self, *args, **options):
+        if options['count'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--count and --concurrency must be at least 1')
+        payload = 'x' * options['payload_size']
+        rate = options['rate']
+        sequence = itertools.count()
+        sequence_lock = threading.Lock()
+        measurements = []
+        unpersisted = []
+
+        def fail_repeatedly():
+            while True:
+                with sequence_lock:
+                    index = next(sequence)
+                if index >= options['count']:
+                    return
+                if rate:
+                    delay = start + index / rate - perf_counter()
+                    if delay > 0:
+                        sleep(delay)
+                _local.measurement = None
+                task_id = str(uuid4())
+                try:
+                    storm_failure.apply((payload,), task_id=task_id)
+                except Exception:  # pylint: disable=broad-except
+                    log.exception(f'Simulated failure {task_id} could not be persisted')
+                if _local.measurement is None:
+                    unpersisted.append(task_id)
+                else:
+                    measurements.append(_local.measurement)
+
+        def run_in_thread():
+            try:
+                fail_repeatedly()
+            finally:
+                connection.close()
+
+        start = perf_counter()
+        if options['concurrency'] == 1:
+            fail_repeatedly()
+        else:
+            threads = [threading.Thread(target=run_in_thread) for _ in range(options['concurrency'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = perf_counter() - start
+
+        self._report(options, measurements, len(unpersisted), elapsed)
+        if not options['keep']:
+            records = FailedTask.objects.filter(task_name=storm_failure.name)
+            unresolved = records.filter(datetime_resolved=None).count()
+            deleted, _ = records.delete()
+            if backlog.is_enabled():
+                backlog.decrement(storm_failure.name, unresolved)
+            log.info(f'Deleted {deleted} simulated failure records')
+
+    def _report(self, options, measurements, errors, elapsed):
+        """
+        Write the latency, throughput and query count summary.
+        """
+        latencies = sorted(seconds * 1000 for seconds, _ in measurements)
+        queries = sum(count for _, count in measurements)
+        self.stdout.write(
+            f"failures: {options['count']}  concurrency: {options['concurrency']}  "
+            f"target rate: {options['rate'] or 'unlimited'}/s  payload: {options['payload_size']} characters"
+        )
+        self.stdout.write(f'persisted: {len(measurements)}  errors: {errors}  elapsed: {elapsed:.2f}s')
+        self.stdout.write(f'throughput: {len(measurements) / elapsed if elapsed else 0:.1f} failures/s')
+        if latencies:
+            self.stdout.write(
+                f'on_failure latency ms: mean {statistics.mean(latencies):.2f}  '
+                f'p50 {percentile(latencies, 0.5):.2f}  p90 {percentile(latencies, 0.9):.2f}  '
+                f'p99 {percentile(latencies, 0.99):.2f}  max {latencies[-1]:.2f}'
+            )
+            self.stdout.write(f'queries: {queries} total, {queries / len(measurements):.1f} per failure')
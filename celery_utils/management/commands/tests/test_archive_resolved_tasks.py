@@ -0,0 +1,58 @@
+"""
+Test management command to archive resolved tasks.
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from .... import models
+
+DAY = timedelta(days=1)
+
+
+@pytest.fixture
+def failed_tasks():
+    """
+    Create FailedTask records:
+        * 'old' and 'other', resolved 10 days ago, for tasks named 'task' and 'other'
+        * 'new', resolved just now
+        * 'unresolved'
+    """
+    return [
+        models.FailedTask.objects.create(task_name='task', datetime_resolved=now() - 10 * DAY, task_id='old'),
+        models.FailedTask.objects.create(task_name='task', datetime_resolved=now(), task_id='new'),
+        models.FailedTask.objects.create(task_name='task', datetime_resolved=None, task_id='unresolved'),
+        models.FailedTask.objects.create(task_name='other', datetime_resolved=now() - 10 * DAY, task_id='other'),
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('args', 'archived_task_ids'),
+    [
+        ([], {'old', 'new', 'other'}),
+        (['--age=5'], {'old', 'other'}),
+        (['--task-name=task', '--batch-size=1'], {'old', 'new'}),
+    ],
+)
+@pytest.mark.usefixtures('failed_tasks')
+def test_call_command(args, archived_task_ids):
+    call_command('archive_resolved_tasks', *args)
+    assert set(models.ArchivedFailedTask.objects.values_list('task_id', flat=True)) == archived_task_ids
+    assert not set(models.FailedTask.objects.values_list('task_id', flat=True)) & archived_task_ids
+    assert models.FailedTask.objects.filter(task_id='unresolved').exists()
+
+
+@pytest.mark.django_db
+def test_resume(failed_tasks):
+    models.CommandCheckpoint.objects.create(
+        command='archive_resolved_tasks',
+        parameters={'task_name': None, 'age': 0},
+        last_pk=failed_tasks[1].pk,
+    )
+    call_command('archive_resolved_tasks', '--resume')
+    assert set(models.ArchivedFailedTask.objects.values_list('task_id', flat=True)) == {'other'}
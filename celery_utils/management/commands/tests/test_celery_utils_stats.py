@@ -0,0 +1,33 @@
+"""
+Test management command to report celery_utils query stats.
+"""
+
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+
+from ....instrumentation import OPERATIONS, get_stats, instrumented, reset_stats
+from ....models import FailedTask
+
+
+@pytest.mark.django_db
+def test_call_command(settings):
+    settings.CELERY_UTILS_INSTRUMENTATION = True
+    reset_stats()
+    with instrumented('reapply_tasks'):
+        FailedTask.objects.count()
+        FailedTask.objects.count()
+    out = StringIO()
+    call_command('celery_utils_stats', '--operation=reapply_tasks', '--reset', stdout=out)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 2
+    assert lines[1].split()[:4] == ['reapply_tasks', '1', '2', '2.0']
+    assert get_stats()['reapply_tasks']['calls'] == 0
+
+
+def test_call_command_reports_every_operation():
+    out = StringIO()
+    call_command('celery_utils_stats', stdout=out)
+    assert len(out.getvalue().splitlines()) == len(OPERATIONS) + 1
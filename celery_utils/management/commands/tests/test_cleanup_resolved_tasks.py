@@ -10,6 +10,7 @@ from django.core.management import call_command
 from django.utils.timezone import now
 
 from .... import models
+from ....storage import DjangoFailureStore
 
 DAY = timedelta(days=1)
 MONTH_AGO = now() - (30 * DAY)
@@ -66,3 +67,29 @@ def test_call_command(args, remaining_task_ids):
     call_command('cleanup_resolved_tasks', *args)
     results = set(models.FailedTask.objects.values_list('task_id', flat=True))
     assert remaining_task_ids == results
+
+
+@pytest.mark.django_db
+def test_resume_skips_finished_work(failed_tasks):
+    models.CommandCheckpoint.objects.create(
+        command='cleanup_resolved_tasks',
+        parameters={'task_name': None, 'age': 30, 'store': DjangoFailureStore().identity},
+        last_pk=failed_tasks[0].pk,
+        processed=1,
+    )
+    call_command('cleanup_resolved_tasks', '--resume', '--batch-size=1')
+    results = set(models.FailedTask.objects.values_list('task_id', flat=True))
+    assert results == {'old', 'new', 'unresolved'}
+    checkpoint = models.CommandCheckpoint.objects.get()
+    assert checkpoint.processed == 2
+    assert checkpoint.datetime_completed is not None
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('failed_tasks')
+def test_completed_run_is_not_resumed():
+    call_command('cleanup_resolved_tasks', '--age=0')
+    models.FailedTask.objects.create(task_name='task', datetime_resolved=MONTH_AGO, task_id='later')
+    call_command('cleanup_resolved_tasks', '--age=0', '--resume')
+    assert set(models.FailedTask.objects.values_list('task_id', flat=True)) == {'unresolved'}
+    assert models.CommandCheckpoint.objects.count() == 2
@@ -0,0 +1,75 @@
+"""
+Test management command to export failed tasks.
+"""
+
+from datetime import timedelta
+import gzip
+from io import StringIO
+import json
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.timezone import now
+
+from .... import models
+
+DAY = timedelta(days=1)
+
+
+@pytest.fixture
+def failed_tasks():
+    """
+    Create FailedTask records:
+        * 'old', failed 10 days ago and resolved
+        * 'new', failed just now, unresolved
+        * 'other', a failure of a task named 'other'
+    """
+    old = models.FailedTask.objects.create(task_name='task', task_id='old', datetime_resolved=now())
+    models.FailedTask.objects.filter(pk=old.pk).update(created=now() - 10 * DAY)
+    return [
+        old,
+        models.FailedTask.objects.create(task_name='task', task_id='new', args=[1], kwargs={'when': now()}),
+        models.FailedTask.objects.create(task_name='other', task_id='other'),
+    ]
+
+
+def exported_task_ids(*args):
+    stdout = StringIO()
+    call_command('export_failed_tasks', '-', *args, stdout=stdout)
+    return [json.loads(line)['task_id'] for line in stdout.getvalue().splitlines()]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ('args', 'task_ids'),
+    [
+        ([], ['old', 'new', 'other']),
+        (['--batch-size=1'], ['old', 'new', 'other']),
+        (['--task-name=task'], ['old', 'new']),
+        (['--state=resolved'], ['old']),
+        (['--state=unresolved'], ['new', 'other']),
+        ([f'--since={(now() - DAY).date().isoformat()}'], ['new', 'other']),
+        ([f'--until={(now() - DAY).isoformat()}'], ['old']),
+    ],
+)
+@pytest.mark.usefixtures('failed_tasks')
+def test_filters(args, task_ids):
+    assert exported_task_ids(*args) == task_ids
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('failed_tasks')
+def test_gzip(tmp_path):
+    path = tmp_path / 'failed_tasks.ndjson.gz'
+    call_command('export_failed_tasks', str(path))
+    with gzip.open(path, 'rt') as stream:
+        records = [json.loads(line) for line in stream]
+    assert [record['task_id'] for record in records] == ['old', 'new', 'other']
+    assert 'id' not in records[0]
+
+
+def test_invalid_date():
+    with pytest.raises(CommandError):
+        call_command('export_failed_tasks', '-', '--since=yesterday')
@@ -0,0 +1,89 @@
+"""
+Test management command to import failed tasks.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from uuid import uuid4
+
+import pytest
+
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from .... import backlog, models
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('filename', ['failed_tasks.ndjson', 'failed_tasks.ndjson.gz'])
+def test_round_trip(tmp_path, filename):
+    path = str(tmp_path / filename)
+    kwargs = {'when': now(), 'amount': Decimal('1.10'), 'uuid': uuid4()}
+    original = models.FailedTask.objects.create(
+        task_name='task', task_id='one', args=[b'\x00'], kwargs=kwargs, exc='ValueError()',
+        datetime_resolved=now(), attempts=3,
+    )
+    models.FailedTask.objects.filter(pk=original.pk).update(created=now() - timedelta(days=2))
+    original.refresh_from_db()
+    models.FailedTask.objects.create(task_name='task', task_id='two')
+    call_command('export_failed_tasks', path)
+    models.FailedTask.objects.all().delete()
+
+    call_command('import_failed_tasks', path, '--batch-size=1')
+    imported = models.FailedTask.objects.order_by('pk')
+    assert [task.task_id for task in imported] == ['one', 'two']
+    copy = imported[0]
+    for field in ('task_name', 'args', 'kwargs', 'exc', 'created', 'modified', 'datetime_resolved', 'attempts'):
+        assert getattr(copy, field) == getattr(original, field)
+    assert copy.pk != original.pk
+
+
+@pytest.mark.django_db
+def test_stdin(monkeypatch):
+    models.FailedTask.objects.create(task_name='task', task_id='one', datetime_resolved=now())
+    stdout = StringIO()
+    call_command('export_failed_tasks', '-', stdout=stdout)
+    monkeypatch.setattr('sys.stdin', StringIO(stdout.getvalue() + '\n'))
+    call_command('import_failed_tasks', '-')
+    assert list(models.FailedTask.objects.values_list('task_id', flat=True)) == ['one', 'one']
+
+
+@pytest.mark.django_db
+def test_unresolved_duplicates_skipped(tmp_path, settings):
+    settings.CELERY_UTILS_BACKLOG_COUNTERS = True
+    path = str(tmp_path / 'failed_tasks.ndjson')
+    models.FailedTask.objects.create(task_name='task', task_id='one')
+    models.FailedTask.objects.create(task_name='task', task_id='two')
+    models.FailedTask.objects.create(task_name='task', task_id='two')
+    call_command('export_failed_tasks', path)
+    models.FailedTask.objects.filter(task_id='two').delete()
+
+    call_command('import_failed_tasks', path, '--batch-size=2')
+    assert sorted(models.FailedTask.objects.values_list('task_id', flat=True)) == ['one', 'two']
+    assert backlog.get_backlog('task') == 1
+
+
+@pytest.mark.django_db
+def test_reapply_schedule(tmp_path):
+    path = str(tmp_path / 'failed_tasks.ndjson')
+    due = now() + timedelta(hours=1)
+    models.FailedTask.objects.create(
+        task_name='task', task_id='one', attempts=2, next_attempt_at=due, reapplied_at=now(),
+    )
+    call_command('export_failed_tasks', path)
+    models.FailedTask.objects.all().delete()
+
+    call_command('import_failed_tasks', path)
+    imported = models.FailedTask.objects.get()
+    assert (imported.attempts, imported.next_attempt_at, imported.reapplied_at) == (2, due, None)
+
+
+@pytest.mark.django_db
+def test_reapply_schedule_for_older_exports(monkeypatch):
+    line = '{"task_name": "task", "task_id": "one", "args": [], "kwargs": {}, "exc": "", "attempts": 1}\n'
+    before = now()
+    monkeypatch.setattr('sys.stdin', StringIO(line))
+    call_command('import_failed_tasks', '-')
+    imported = models.FailedTask.objects.get()
+    assert imported.next_attempt_at >= before + models.reapply_backoff(1)
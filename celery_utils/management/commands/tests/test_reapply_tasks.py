@@ -13,6 +13,7 @@ from django.core.management import call_command
 from test_utils import tasks
 
 from .... import models
+from ....storage import DjangoFailureStore
 
 
 @pytest.fixture
@@ -91,6 +92,60 @@ def test_duplicate_tasks():
         assert_resolved(task_object)
 
 
+@pytest.mark.django_db
+def test_skips_tasks_claimed_by_concurrent_run(failed_tasks):
+    failed_tasks[1].claim()
+    call_command('reapply_tasks')
+    assert_unresolved(models.FailedTask.objects.get(task_id='will_succeed'))
+    assert_resolved(models.FailedTask.objects.get(task_id='other_task'))
+    call_command('reapply_tasks', '--lease=0')
+    assert_resolved(models.FailedTask.objects.get(task_id='will_succeed'))
+
+
+@pytest.mark.django_db
+def test_resume_skips_finished_work(failed_tasks):
+    models.CommandCheckpoint.objects.create(
+        command='reapply_tasks',
+        parameters={'task_name': None, 'quarantined': False, 'store': DjangoFailureStore().identity},
+        last_pk=failed_tasks[1].pk,
+        processed=2,
+    )
+    call_command('reapply_tasks', '--resume', '--batch-size=1')
+    assert_unresolved(models.FailedTask.objects.get(task_id='fail_again'))
+    assert_unresolved(models.FailedTask.objects.get(task_id='will_succeed'))
+    assert_resolved(models.FailedTask.objects.get(task_id='other_task'))
+    checkpoint = models.CommandCheckpoint.objects.get()
+    assert checkpoint.last_pk == failed_tasks[2].pk
+    assert checkpoint.processed == 3
+    assert checkpoint.datetime_completed is not None
+
+
+@pytest.mark.django_db
+def test_resume_ignores_other_parameters(failed_tasks):
+    models.CommandCheckpoint.objects.create(
+        command='reapply_tasks',
+        parameters={'task_name': 'other'},
+        last_pk=failed_tasks[2].pk,
+    )
+    call_command('reapply_tasks', '--resume')
+    assert_resolved(models.FailedTask.objects.get(task_id='will_succeed'))
+    assert_resolved(models.FailedTask.objects.get(task_id='other_task'))
+    assert models.CommandCheckpoint.objects.filter(datetime_completed__isnull=False).count() == 1
+
+
+@pytest.mark.django_db
+def test_quarantined_tasks_reapplied_separately(failed_tasks):
+    failed_tasks[1].quarantine()
+    call_command('reapply_tasks')
+    assert_unresolved(models.FailedTask.objects.get(task_id='will_succeed'))
+    assert_resolved(models.FailedTask.objects.get(task_id='other_task'))
+    call_command('reapply_tasks', '--quarantined')
+    will_succeed = models.FailedTask.objects.get(task_id='will_succeed')
+    assert_resolved(will_succeed)
+    assert will_succeed.datetime_quarantined is None
+    assert_unresolved(models.FailedTask.objects.get(task_id='fail_again'))
+
+
 def assert_resolved(task_object):
     """
     Raises an assertion error if the task failed to complete successfully
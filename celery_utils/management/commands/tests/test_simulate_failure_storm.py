@@ -0,0 +1,64 @@
+"""
+Test management command to simulate a failure storm.
+"""
+
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from .... import backlog, models
+from ..simulate_failure_storm import percentile, storm_failure
+
+
+def simulate(*args):
+    stdout = StringIO()
+    call_command('simulate_failure_storm', *args, stdout=stdout)
+    return stdout.getvalue()
+
+
+@pytest.mark.django_db
+def test_reports_and_cleans_up():
+    output = simulate('--count=5', '--payload-size=10')
+    assert 'persisted: 5  errors: 0' in output
+    assert 'on_failure latency ms: mean' in output
+    assert 'queries: 10 total, 2.0 per failure' in output
+    assert not models.FailedTask.objects.exists()
+
+
+@pytest.mark.django_db
+def test_backlog_counters(settings):
+    settings.CELERY_UTILS_BACKLOG_COUNTERS = True
+    simulate('--count=3', '--payload-size=10')
+    assert backlog.get_backlog(storm_failure.name) == 0
+    simulate('--count=3', '--payload-size=10', '--keep')
+    assert backlog.get_backlog(storm_failure.name) == 3
+
+
+@pytest.mark.django_db
+def test_keep():
+    simulate('--count=3', '--payload-size=10', '--keep', '--rate=1000')
+    tasks = models.FailedTask.objects.filter(task_name=storm_failure.name)
+    assert tasks.count() == 3
+    assert tasks.first().args == ['x' * 10]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrency():
+    # Relies on the test database being a file (see test_settings): in-memory
+    # SQLite fails concurrent writes instead of making them wait.
+    output = simulate('--count=6', '--concurrency=2', '--keep')
+    assert 'persisted: 6  errors: 0' in output
+    assert models.FailedTask.objects.count() == 6
+
+
+def test_invalid_arguments():
+    with pytest.raises(CommandError):
+        simulate('--count=0')
+
+
+def test_percentile():
+    assert percentile([1, 2, 3, 4], 0.5) == 3
+    assert percentile([1, 2, 3, 4], 0.99) == 4
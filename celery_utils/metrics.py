@@ -0,0 +1,41 @@
+"""
+Pluggable hook for publishing celery_utils metrics.
+
+Point the ``CELERY_UTILS_METRICS_HOOK`` setting at a callable (by dotted
+path) accepting ``(name, value, tags)`` to forward celery_utils metrics to
+statsd, Datadog, New Relic, etc.  For example::
+
+    def send_to_statsd(name, value, tags):
+        statsd.gauge(name, value, tags=[f'{key}:{val}' for key, val in tags.items()])
+
+When the setting is unset, metrics are discarded.
+"""
+
+from functools import lru_cache
+import logging
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+log = logging.getLogger(__name__)
+
+
+def emit(name, value, **tags):
+    """
+    Send a single metric to the configured hook, if any.
+
+    Errors raised by the hook are logged rather than propagated: losing a
+    metric should never fail the operation being measured.
+    """
+    path = getattr(settings, 'CELERY_UTILS_METRICS_HOOK', None)
+    if not path:
+        return
+    try:
+        _load_hook(path)(name, value, tags)
+    except Exception:  # pylint: disable=broad-except
+        log.exception(f'Metrics hook {path} failed to record {name}')
+
+
+@lru_cache(maxsize=None)
+def _load_hook(path):
+    return import_string(path)
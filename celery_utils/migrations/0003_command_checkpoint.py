@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+import jsonfield.fields
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0002_chordable_django_backend'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('command', models.CharField(db_index=True, max_length=255)),
+                ('parameters', jsonfield.fields.JSONField(blank=True, default=dict)),
+                ('last_pk', models.BigIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('datetime_completed', models.DateTimeField(blank=True, default=None, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
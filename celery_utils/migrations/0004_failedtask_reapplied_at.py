@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0003_command_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failedtask',
+            name='reapplied_at',
+            field=models.DateTimeField(blank=True, db_index=True, default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0004_failedtask_reapplied_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failedtask',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='failedtask',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='failedtask',
+            index=models.Index(fields=['datetime_resolved', 'next_attempt_at'], name='celery_utils_next_attempt_idx'),
+        ),
+    ]
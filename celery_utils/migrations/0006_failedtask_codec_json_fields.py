@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:46
+
+from django.db import migrations
+
+import celery_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0005_failedtask_reapply_backoff'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='failedtask',
+            name='args',
+            field=celery_utils.fields.CodecJSONField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='failedtask',
+            name='kwargs',
+            field=celery_utils.fields.CodecJSONField(blank=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:52
+
+from django.db import migrations, models
+import django.utils.timezone
+
+import jsonfield.fields
+
+import celery_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0006_failedtask_codec_json_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedFailedTask',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('failed_task_id', models.BigIntegerField(db_index=True)),
+                ('created', models.DateTimeField()),
+                ('modified', models.DateTimeField()),
+                ('task_name', models.CharField(max_length=255)),
+                ('task_id', models.CharField(db_index=True, max_length=255)),
+                ('args', celery_utils.fields.CodecJSONField(blank=True)),
+                ('kwargs', celery_utils.fields.CodecJSONField(blank=True)),
+                ('exc', models.CharField(max_length=255)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('fingerprint', models.CharField(blank=True, default='', max_length=40)),
+                ('repeat_failures', models.PositiveIntegerField(default=0)),
+                ('datetime_quarantined', models.DateTimeField(blank=True, default=None, null=True)),
+                ('trace', jsonfield.fields.JSONField(blank=True, default=None, null=True)),
+                ('datetime_resolved', models.DateTimeField(db_index=True)),
+                ('datetime_archived', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
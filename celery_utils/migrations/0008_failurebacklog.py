@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0007_archivedfailedtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailureBacklog',
+            fields=[
+                ('task_name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('unresolved', models.IntegerField(default=0)),
+                ('datetime_reconciled', models.DateTimeField(blank=True, default=None, null=True)),
+            ],
+        ),
+    ]
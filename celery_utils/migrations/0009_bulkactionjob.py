@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+import jsonfield.fields
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0008_failurebacklog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkActionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('action', models.CharField(choices=[('reapply', 'Reapply'), ('resolve', 'Mark resolved'), ('delete', 'Delete')], max_length=32)),
+                ('selected_pks', jsonfield.fields.JSONField(default=list)),
+                ('requested_by', models.CharField(blank=True, max_length=150)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=32)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('last_pk', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('datetime_completed', models.DateTimeField(blank=True, default=None, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
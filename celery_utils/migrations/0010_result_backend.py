@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0009_bulkactionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChordCounter',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, default=None, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResultEntry',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('value', models.BinaryField()),
+                ('status', models.CharField(max_length=50)),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, default=None, null=True)),
+            ],
+        ),
+    ]
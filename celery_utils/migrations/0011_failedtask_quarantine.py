@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0010_result_backend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failedtask',
+            name='datetime_quarantined',
+            field=models.DateTimeField(blank=True, db_index=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='failedtask',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='failedtask',
+            name='repeat_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
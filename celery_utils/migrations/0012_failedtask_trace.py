@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:18
+
+from django.db import migrations
+
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('celery_utils', '0011_failedtask_quarantine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failedtask',
+            name='trace',
+            field=jsonfield.fields.JSONField(blank=True, default=None, null=True),
+        ),
+    ]
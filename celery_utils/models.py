@@ -2,18 +2,81 @@
 Database models for celery_utils.
 """
 
+from datetime import timedelta
+import hashlib
 import logging
 
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q
+from django.utils.timezone import now
 
 from celery import current_app
 from jsonfield import JSONField
 from model_utils.models import TimeStampedModel
 
-from celery_utils import tasks
+from celery_utils import tasks, tracing
+from celery_utils.batched import REAPPLIED_HEADER, BatchedTask
+from celery_utils.fields import CodecJSONField
+from celery_utils.instrumentation import instrumented
 
 log = logging.getLogger(__name__)
 
+DEFAULT_REAPPLY_LEASE = timedelta(hours=1)
+DEFAULT_REAPPLY_BACKOFF = timedelta(minutes=1)
+DEFAULT_REAPPLY_MAX_BACKOFF = timedelta(days=1)
+DEFAULT_QUARANTINE_THRESHOLD = 3
+
+
+def reapply_lease():
+    """
+    How long a claim taken by ``FailedTask.reapply`` is honoured.
+
+    Configurable with the ``CELERY_UTILS_REAPPLY_LEASE`` setting, in seconds.
+    A claim older than this is assumed to belong to a run that crashed, and
+    may be taken over.
+    """
+    seconds = getattr(settings, 'CELERY_UTILS_REAPPLY_LEASE', None)
+    return DEFAULT_REAPPLY_LEASE if seconds is None else timedelta(seconds=seconds)
+
+
+def reapply_backoff(attempts):
+    """
+    How long to wait before reapplying a task that has been reapplied ``attempts`` times.
+
+    The delay doubles with every attempt, starting from the
+    ``CELERY_UTILS_REAPPLY_BACKOFF`` setting (in seconds, default one minute)
+    and capped at ``CELERY_UTILS_REAPPLY_MAX_BACKOFF`` (default one day).
+    """
+    base = getattr(settings, 'CELERY_UTILS_REAPPLY_BACKOFF', None)
+    base = DEFAULT_REAPPLY_BACKOFF if base is None else timedelta(seconds=base)
+    cap = getattr(settings, 'CELERY_UTILS_REAPPLY_MAX_BACKOFF', None)
+    cap = DEFAULT_REAPPLY_MAX_BACKOFF if cap is None else timedelta(seconds=cap)
+    # Compare exponents rather than delays, so huge attempt counts can't overflow timedelta.
+    if attempts >= 32 or base * 2 ** attempts > cap:
+        return cap
+    return base * 2 ** attempts
+
+
+def quarantine_threshold():
+    """
+    How many reapplies of a task may fail identically before it is quarantined.
+
+    Configurable with the ``CELERY_UTILS_QUARANTINE_THRESHOLD`` setting;
+    set it to 0 to never quarantine tasks.
+    """
+    return getattr(settings, 'CELERY_UTILS_QUARANTINE_THRESHOLD', DEFAULT_QUARANTINE_THRESHOLD)
+
+
+def failure_fingerprint(exc):
+    """
+    Identify the kind of failure ``exc`` represents, by its class and message.
+    """
+    exc_type = type(exc)
+    return hashlib.sha1(
+        f'{exc_type.__module__}.{exc_type.__qualname__}: {exc}'.encode('utf-8', 'backslashreplace')
+    ).hexdigest()
+
 
 class FailedTask(TimeStampedModel):
     """
@@ -29,10 +92,20 @@ class FailedTask(TimeStampedModel):
 
     task_name = models.CharField(max_length=255)
     task_id = models.CharField(max_length=255, db_index=True)
-    args = JSONField(blank=True)
-    kwargs = JSONField(blank=True)
+    args = CodecJSONField(blank=True)
+    kwargs = CodecJSONField(blank=True)
     exc = models.CharField(max_length=255)
     datetime_resolved = models.DateTimeField(blank=True, null=True, default=None, db_index=True)
+    reapplied_at = models.DateTimeField(blank=True, null=True, default=None, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(blank=True, null=True, default=None)
+    # See failure_fingerprint.
+    fingerprint = models.CharField(max_length=40, blank=True, default='')
+    # Reapplies in a row that failed again with the same fingerprint.
+    repeat_failures = models.PositiveIntegerField(default=0)
+    datetime_quarantined = models.DateTimeField(blank=True, null=True, default=None, db_index=True)
+    # The trace context of the failed run; see celery_utils.tracing.
+    trace = JSONField(blank=True, null=True, default=None)
 
     class Meta:
         """
@@ -42,23 +115,363 @@ class FailedTask(TimeStampedModel):
         index_together = [
             ('task_name', 'exc'),
         ]
+        indexes = [
+            # Serves the periodic reapply_failed_tasks scan for due, unresolved failures.
+            models.Index(fields=['datetime_resolved', 'next_attempt_at'], name='celery_utils_next_attempt_idx'),
+        ]
+
+    def claim(self, lease=None):
+        """
+        Atomically take ownership of reapplying this task.
+
+        All unresolved records sharing this task_id are stamped with the
+        current time in a single conditional UPDATE, which only matches rows
+        that are unclaimed or whose claim is older than ``lease`` (a
+        timedelta, defaulting to ``reapply_lease()``).  Concurrent callers
+        therefore partition the work between them instead of both publishing
+        the same task.
+
+        Taking the claim counts as a reapply attempt: ``attempts`` is
+        incremented and ``next_attempt_at`` pushed back by ``reapply_backoff``.
+
+        Returns True if the claim was taken.
+        """
+        claimed_at = now()
+        lease = reapply_lease() if lease is None else lease
+        next_attempt_at = claimed_at + reapply_backoff(self.attempts + 1)
+        claimed = FailedTask.objects.filter(
+            Q(reapplied_at=None) | Q(reapplied_at__lt=claimed_at - lease),
+            task_id=self.task_id,
+            datetime_resolved=None,
+        ).update(reapplied_at=claimed_at, attempts=F('attempts') + 1, next_attempt_at=next_attempt_at)
+        if claimed:
+            self.reapplied_at = claimed_at
+            self.attempts += 1
+            self.next_attempt_at = next_attempt_at
+        return bool(claimed)
+
+    def release(self):
+        """
+        Give up a claim taken by ``claim``, so the task may be reapplied again.
+        """
+        FailedTask.objects.filter(task_id=self.task_id, datetime_resolved=None).update(reapplied_at=None)
+        self.reapplied_at = None
+
+    def quarantine(self):
+        """
+        Quarantine this task, so that it is no longer reapplied until released.
+        """
+        self.datetime_quarantined = now()
+        FailedTask.objects.filter(task_id=self.task_id, datetime_resolved=None).update(
+            datetime_quarantined=self.datetime_quarantined,
+        )
 
-    def reapply(self):
+    def release_quarantine(self):
+        """
+        Take this task out of quarantine, giving it a fresh count of repeated failures.
+        """
+        FailedTask.objects.filter(task_id=self.task_id, datetime_resolved=None).update(
+            datetime_quarantined=None, repeat_failures=0,
+        )
+        self.datetime_quarantined = None
+        self.repeat_failures = 0
+
+    @instrumented('reapply')
+    def reapply(self, lease=None):
         """
         Enqueue new celery task with the same arguments as the failed task.
+
+        The task is claimed first (see ``claim``); if another process already
+        holds an unexpired claim on it, nothing is published.
+
+        Quarantined tasks are not published.  A task whose reapplies have
+        failed the same way ``quarantine_threshold()`` times in a row is
+        quarantined instead of being published again; call
+        ``release_quarantine`` first to reapply it anyway.
+
+        With tracing enabled, the new run is submitted as a child of the
+        failed run's span, in the same trace.
+
+        The record is resolved by a ``mark_resolved`` callback once the new
+        run succeeds.  ``BatchedTask`` runs succeed as soon as the item is
+        buffered, so those resolve the record themselves once the item has
+        actually run (see ``celery_utils.batched``).
+
+        Returns True if the task was published.
         """
         if self.datetime_resolved is not None:
             raise TypeError(f'Cannot reapply a resolved task: {self}')
-        log.info('Reapplying failed task: {}'.format(self))  # pylint: disable=consider-using-f-string
+        if self.datetime_quarantined is not None:
+            log.info(f'Skipping quarantined failed task: {self}')
+            return False
+        threshold = quarantine_threshold()
+        if threshold and self.repeat_failures >= threshold:
+            log.warning(f'Quarantining failed task after {self.repeat_failures} identical failures: {self}')
+            self.quarantine()
+            return False
+        # Look the task up first, so that an unregistered one leaves the record unclaimed.
         original_task = current_app.tasks[self.task_name]
-        original_task.apply_async(
-            self.args,
-            self.kwargs,
-            task_id=self.task_id,
-            link=tasks.mark_resolved.si(self.task_id)
-        )
+        if not self.claim(lease):
+            log.info(f'Skipping failed task claimed by another reapply: {self}')
+            return False
+        log.info('Reapplying failed task: {}'.format(self))  # pylint: disable=consider-using-f-string
+        headers = {}
+        if tracing.is_enabled():
+            headers[tracing.HEADER] = tracing.new_context(self.trace)
+        options = {}
+        if isinstance(original_task, BatchedTask):
+            headers[REAPPLIED_HEADER] = True
+        else:
+            options['link'] = tasks.mark_resolved.si(self.task_id)
+        if headers:
+            options['headers'] = headers
+        try:
+            original_task.apply_async(
+                self.args,
+                self.kwargs,
+                task_id=self.task_id,
+                **options
+            )
+        except Exception:
+            self.release()
+            raise
+        return True
 
     def __str__(self):
         return f"FailedTask: {self.task_name}, " \
                f"args={self.args}, kwargs={self.kwargs} " \
                f"({'not resolved' if self.datetime_resolved is None else 'resolved'})"
+
+
+class ArchivedFailedTask(models.Model):
+    """
+    A resolved FailedTask, moved out of the FailedTask table by ``archive.archive_resolved_tasks``.
+
+    Keeping only unresolved failures in FailedTask keeps the table and its
+    indexes small for ``on_failure`` and ``reapply_tasks``.
+
+    .. pii::
+       Stores arbitrary task parameters, which theoretically could include
+       email addresses, although as of May 2020 does not seem to.
+       Old tasks can be manually deleted in the Django administration UI.
+    .. pii_retirement: local_api
+    .. pii_types: other
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    # The id the record had in FailedTask.  Not unique: databases may reuse
+    # the ids of deleted rows.
+    failed_task_id = models.BigIntegerField(db_index=True)
+    created = models.DateTimeField()
+    modified = models.DateTimeField()
+    task_name = models.CharField(max_length=255)
+    task_id = models.CharField(max_length=255, db_index=True)
+    args = CodecJSONField(blank=True)
+    kwargs = CodecJSONField(blank=True)
+    exc = models.CharField(max_length=255)
+    attempts = models.PositiveIntegerField(default=0)
+    fingerprint = models.CharField(max_length=40, blank=True, default='')
+    repeat_failures = models.PositiveIntegerField(default=0)
+    datetime_quarantined = models.DateTimeField(blank=True, null=True, default=None)
+    trace = JSONField(blank=True, null=True, default=None)
+    datetime_resolved = models.DateTimeField(db_index=True)
+    datetime_archived = models.DateTimeField(default=now, db_index=True)
+
+    def __str__(self):
+        return f"ArchivedFailedTask: {self.task_name}, " \
+               f"args={self.args}, kwargs={self.kwargs} (resolved)"
+
+
+class CommandCheckpoint(TimeStampedModel):
+    """
+    Progress record for a resumable management command run.
+
+    Long-running maintenance commands walk their rows in primary key order and
+    advance this record after each batch, so an interrupted run can be
+    restarted with ``--resume`` without redoing finished work.  Checkpoints of
+    completed runs are deleted by the retention policies (see
+    ``celery_utils.retention``).
+
+    .. no_pii:
+    """
+
+    command = models.CharField(max_length=255, db_index=True)
+    parameters = JSONField(blank=True, default=dict)
+    last_pk = models.BigIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    datetime_completed = models.DateTimeField(blank=True, null=True, default=None)
+
+    @classmethod
+    def for_run(cls, command, parameters, resume=False):
+        """
+        Get the checkpoint to use for a run of ``command`` with ``parameters``.
+
+        When ``resume`` is set, the most recent unfinished checkpoint recorded
+        with identical parameters is returned, if there is one.  Otherwise a
+        fresh checkpoint is created.
+        """
+        if resume:
+            candidates = cls.objects.filter(command=command, datetime_completed=None).order_by('-pk')
+            for checkpoint in candidates:
+                if checkpoint.parameters == parameters:
+                    log.info(
+                        f'Resuming {command} after pk {checkpoint.last_pk} ({checkpoint.processed} already processed)'
+                    )
+                    return checkpoint
+            log.info(f'No unfinished {command} run to resume; starting from the beginning')
+        return cls.objects.create(command=command, parameters=parameters)
+
+    def advance(self, last_pk, count):
+        """
+        Record that every row up to and including ``last_pk`` has been handled.
+        """
+        self.last_pk = last_pk
+        self.processed += count
+        self.save(update_fields=['last_pk', 'processed', 'modified'])
+
+    def complete(self):
+        """
+        Mark the run as finished, so that it will not be resumed.
+        """
+        self.datetime_completed = now()
+        self.save(update_fields=['datetime_completed', 'modified'])
+
+    def __str__(self):
+        return f"CommandCheckpoint: {self.command}, parameters={self.parameters}, " \
+               f"last_pk={self.last_pk}, processed={self.processed} " \
+               f"({'running' if self.datetime_completed is None else 'completed'})"
+
+
+class FailureBacklog(models.Model):
+    """
+    Incrementally maintained count of unresolved FailedTasks for one task name.
+
+    See ``celery_utils.backlog``.
+
+    .. no_pii:
+    """
+
+    task_name = models.CharField(max_length=255, primary_key=True)
+    unresolved = models.IntegerField(default=0)
+    datetime_reconciled = models.DateTimeField(blank=True, null=True, default=None)
+
+    def __str__(self):
+        return f"FailureBacklog: {self.task_name}, unresolved={self.unresolved}"
+
+
+class BulkActionJob(TimeStampedModel):
+    """
+    A bulk admin action on FailedTasks, carried out by a background task.
+
+    The selection is stored as the sorted primary keys of the selected
+    records, so that it stays valid across deploys while the job is queued.
+    ``run_bulk_action`` walks the selection in primary key order, recording
+    its progress here after each batch.  A failed job can be resumed from the
+    admin, and carries on after the last batch it finished.
+
+    .. no_pii:
+    """
+
+    REAPPLY = 'reapply'
+    RESOLVE = 'resolve'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (REAPPLY, 'Reapply'),
+        (RESOLVE, 'Mark resolved'),
+        (DELETE, 'Delete'),
+    ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    action = models.CharField(max_length=32, choices=ACTION_CHOICES)
+    selected_pks = JSONField(default=list)
+    requested_by = models.CharField(max_length=150, blank=True)
+    status = models.CharField(max_length=32, choices=STATUS_CHOICES, default=PENDING)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    last_pk = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    datetime_completed = models.DateTimeField(blank=True, null=True, default=None)
+
+    @classmethod
+    def for_queryset(cls, action, queryset, requested_by=''):
+        """
+        Create a job to apply ``action`` to the FailedTasks selected by ``queryset``.
+        """
+        selected_pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        return cls.objects.create(
+            action=action,
+            selected_pks=selected_pks,
+            requested_by=requested_by,
+            total=len(selected_pks),
+        )
+
+    def remaining_pks(self):
+        """
+        Get the selected primary keys not handled yet, in order.
+        """
+        return [pk for pk in self.selected_pks if pk > self.last_pk]
+
+    def advance(self, last_pk, count):
+        """
+        Record that every selected row up to and including ``last_pk`` has been handled.
+        """
+        self.last_pk = last_pk
+        self.processed += count
+        self.save(update_fields=['last_pk', 'processed', 'modified'])
+
+    def finish(self, status, error=''):
+        """
+        Record that the job has stopped with ``status``.
+        """
+        self.status = status
+        self.error = error
+        self.datetime_completed = now()
+        self.save(update_fields=['status', 'error', 'datetime_completed', 'modified'])
+
+    def __str__(self):
+        return f"BulkActionJob: {self.action}, {self.processed}/{self.total} ({self.status})"
+
+
+class ResultEntry(models.Model):
+    """
+    A task or group result stored by ``celery_utils.backends.DatabaseBackend``.
+
+    .. pii::
+       Stores arbitrary task results, which could include personal data
+       returned by tasks.  Entries are deleted once they expire.
+    .. pii_retirement: local_api
+    .. pii_types: other
+    """
+
+    key = models.CharField(max_length=255, primary_key=True)
+    value = models.BinaryField()
+    status = models.CharField(max_length=50)
+    expires_at = models.DateTimeField(blank=True, null=True, default=None, db_index=True)
+
+    def __str__(self):
+        return f"ResultEntry: {self.key} ({self.status})"
+
+
+class ChordCounter(models.Model):
+    """
+    Count of the finished header tasks of one chord, for ``DatabaseBackend``.
+
+    .. no_pii:
+    """
+
+    key = models.CharField(max_length=255, primary_key=True)
+    count = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(blank=True, null=True, default=None, db_index=True)
+
+    def __str__(self):
+        return f"ChordCounter: {self.key}, count={self.count}"
@@ -6,8 +6,10 @@ Celery utility code for persistent tasks.
 
 from celery import Task
 
+from . import tracing
+from .instrumentation import instrumented
 from .logged_task import LoggedTask
-from .models import FailedTask
+from .storage import get_failure_store
 
 
 class PersistOnFailureTask(Task):
@@ -20,17 +22,12 @@ class PersistOnFailureTask(Task):
 
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         """
-        If the task fails, persist a record of the task.
+        If the task fails, persist a record of the task in the configured failure store.
+
+        The run's trace context, if any, is recorded with it.
         """
-        if not FailedTask.objects.filter(task_id=task_id, datetime_resolved=None).exists():
-            FailedTask.objects.create(
-                task_name=_truncate_to_field(FailedTask, 'task_name', self.name),
-                task_id=task_id,  # Fixed length UUID: No need to truncate
-                args=args,
-                kwargs=kwargs,
-                # TODO: Remove ".replace(',', ''))" when python 3.5 support is dropped
-                exc=_truncate_to_field(FailedTask, 'exc', repr(exc).replace(',', '')),
-            )
+        with instrumented('on_failure'):
+            get_failure_store().record(self.name, task_id, args, kwargs, exc, trace=tracing.context_of(self.request))
         super().on_failure(exc, task_id, args, kwargs, einfo)
 
 
@@ -40,22 +37,3 @@ class LoggedPersistOnFailureTask(PersistOnFailureTask, LoggedTask):
     """
 
     abstract = True
-
-
-def _truncate_to_field(model, field_name, value):
-    """
-    Shorten data to fit in the specified model field.
-
-    If the data were too big for the field, it would cause a failure to
-    insert, so we shorten it, truncating in the middle (because
-    valuable information often shows up at the end.
-    """
-    field = model._meta.get_field(field_name)  # pylint: disable=protected-access
-    if len(value) > field.max_length:
-        midpoint = field.max_length // 2
-        len_after_midpoint = field.max_length - midpoint
-        first = value[:midpoint]
-        sep = '...'
-        last = value[len(value) - len_after_midpoint + len(sep):]
-        value = sep.join([first, last])
-    return value
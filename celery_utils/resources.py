@@ -0,0 +1,145 @@
+"""
+Measuring the memory and CPU time used by each run of a task.
+
+Set ``track_resources = True`` on a ``LoggedTask`` subclass to measure every
+run of its tasks:
+
+* the change in the worker process's resident set size (RSS),
+* the CPU time used by the process, and the wall-clock time taken, and
+* for a sample of runs (``CELERY_UTILS_TRACEMALLOC_SAMPLE_RATE``, default
+  0.01), the peak memory allocated by Python code, traced with
+  ``tracemalloc``, which is too slow to leave on for every run.
+
+Each measurement is published through the ``CELERY_UTILS_METRICS_HOOK``
+callable as ``celery_utils.task.rss_delta``, ``celery_utils.task.cpu_time``,
+``celery_utils.task.wall_time`` and ``celery_utils.task.peak_memory``, tagged
+with the task name.  Runs exceeding ``CELERY_UTILS_RSS_DELTA_THRESHOLD``
+(bytes, default 50 MiB), ``CELERY_UTILS_PEAK_MEMORY_THRESHOLD`` (bytes,
+default 200 MiB) or ``CELERY_UTILS_CPU_TIME_THRESHOLD`` (seconds, default 60)
+are logged as warnings; set a threshold to None to disable it.
+
+If ``CELERY_UTILS_RECYCLE_RSS_THRESHOLD`` (bytes) is set, a run that grows the
+RSS by at least that much calls the ``CELERY_UTILS_RECYCLE_HOOK`` callable
+(by dotted path, accepting ``(task, usage)``), ``request_recycle`` by
+default, so that the memory is given back before it accumulates.
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+import logging
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+from billiard.process import current_process
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+MEBIBYTE = 1024 * 1024
+
+#: The resources used by one run of a task.  ``peak_memory`` is None when
+#: the run was not sampled for tracing.
+ResourceUsage = namedtuple('ResourceUsage', ['rss_delta', 'peak_memory', 'cpu_time', 'wall_time'])
+
+
+def current_rss():
+    """
+    Get the resident set size of this process, in bytes.
+
+    Falls back to the peak resident set size where ``/proc`` is unavailable.
+    """
+    try:
+        with open('/proc/self/statm', encoding='ascii') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in bytes on macOS, and in kibibytes elsewhere.
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+@contextmanager
+def tracked(task):
+    """
+    Measure the resources used by the enclosed run of ``task``, then report them.
+    """
+    sample_rate = getattr(settings, 'CELERY_UTILS_TRACEMALLOC_SAMPLE_RATE', 0.01)
+    # Don't take over tracing started by someone else.
+    traced = not tracemalloc.is_tracing() and random.random() < sample_rate
+    if traced:
+        tracemalloc.start()
+    rss, cpu, wall = current_rss(), time.process_time(), time.monotonic()
+    try:
+        yield
+    finally:
+        peak_memory = None
+        if traced:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        report(task, ResourceUsage(
+            current_rss() - rss, peak_memory, time.process_time() - cpu, time.monotonic() - wall,
+        ))
+
+
+def report(task, usage):
+    """
+    Publish ``usage`` as metrics, warn about excessive usage, and recycle the process if needed.
+    """
+    for name, value in usage._asdict().items():
+        if value is not None:
+            metrics.emit(f'celery_utils.task.{name}', value, task_name=task.name)
+    excessive = [
+        description.format(value / MEBIBYTE if unit == 'MiB' else value)
+        for description, unit, value, setting, default in (
+            ('RSS grew by {:.1f} MiB', 'MiB', usage.rss_delta, 'CELERY_UTILS_RSS_DELTA_THRESHOLD', 50 * MEBIBYTE),
+            (
+                'peak traced memory {:.1f} MiB', 'MiB', usage.peak_memory,
+                'CELERY_UTILS_PEAK_MEMORY_THRESHOLD', 200 * MEBIBYTE,
+            ),
+            ('used {:.1f}s of CPU time', 's', usage.cpu_time, 'CELERY_UTILS_CPU_TIME_THRESHOLD', 60),
+        )
+        if _exceeds(value, getattr(settings, setting, default))
+    ]
+    if excessive:
+        log.warning(f'{task.name}[{task.request.id}] {", ".join(excessive)}')
+    recycle_threshold = getattr(settings, 'CELERY_UTILS_RECYCLE_RSS_THRESHOLD', None)
+    if _exceeds(usage.rss_delta, recycle_threshold):
+        hook = getattr(settings, 'CELERY_UTILS_RECYCLE_HOOK', 'celery_utils.resources.request_recycle')
+        import_string(hook)(task, usage)
+
+
+def _exceeds(value, threshold):
+    return value is not None and threshold is not None and value >= threshold
+
+
+def request_recycle(task, usage):
+    """
+    Ask the prefork pool to replace this worker process once the current task has finished.
+
+    The process exits cleanly before taking another task, and the pool starts
+    a fresh one in its place.  This relies on the pool's per-process shutdown
+    flag, which only exists when the ``worker_pool_restarts`` Celery setting
+    is enabled; elsewhere a warning is logged instead.
+
+    Returns True if the recycle was requested.
+    """
+    shutdown = getattr(getattr(current_process(), '_target', None), '_shutdown', None)
+    if shutdown is None:
+        log.warning(
+            f'{task.name}[{task.request.id}] grew RSS by {usage.rss_delta / MEBIBYTE:.1f} MiB, but this process '
+            f'cannot be recycled (is it a prefork pool worker, with worker_pool_restarts enabled?)'
+        )
+        return False
+    log.warning(
+        f'{task.name}[{task.request.id}] grew RSS by {usage.rss_delta / MEBIBYTE:.1f} MiB; '
+        f'recycling worker process {os.getpid()}'
+    )
+    shutdown.set()
+    return True
@@ -0,0 +1,131 @@
+"""
+Retention policies for FailedTask, ArchivedFailedTask and CommandCheckpoint records, enforced within a bounded budget.
+
+The policies are configured with these settings, with ages in days:
+
+* ``CELERY_UTILS_RETENTION_RESOLVED_DAYS`` (default 30): how long resolved
+  records are kept.  ``None`` keeps them forever.
+* ``CELERY_UTILS_RETENTION_RESOLVED_DAYS_BY_TASK`` (default ``{}``): a dict
+  mapping task names to how long their resolved records are kept, overriding
+  ``CELERY_UTILS_RETENTION_RESOLVED_DAYS``.
+* ``CELERY_UTILS_RETENTION_UNRESOLVED_DAYS`` (default ``None``): how long
+  unresolved records are kept.
+* ``CELERY_UTILS_RETENTION_UNRESOLVED_MAX_COUNT`` (default ``None``): how
+  many unresolved records are kept; the oldest beyond this are deleted.
+* ``CELERY_UTILS_RETENTION_ARCHIVED_DAYS`` (default ``None``): how long
+  archived records are kept after being archived.
+* ``CELERY_UTILS_RETENTION_CHECKPOINT_DAYS`` (default 7): how long the
+  checkpoints of completed management command runs are kept.
+"""
+
+from datetime import timedelta
+import logging
+import time
+
+from django.conf import settings
+from django.db import router
+from django.utils.timezone import now
+
+from .models import ArchivedFailedTask, CommandCheckpoint, FailedTask
+
+log = logging.getLogger(__name__)
+
+
+class RetentionBudget:
+    """
+    The rows and wall-clock time one enforcement run may spend deleting.
+    """
+
+    def __init__(self, max_rows, max_seconds):
+        """
+        Allow up to ``max_rows`` deletions, for up to ``max_seconds`` from now.
+        """
+        self.rows = max_rows
+        self.deadline = time.monotonic() + max_seconds
+
+    @property
+    def exhausted(self):
+        """
+        Whether the budget has run out of rows or time.
+        """
+        return self.rows <= 0 or time.monotonic() >= self.deadline
+
+    def spend(self, rows):
+        """
+        Record the deletion of ``rows`` rows.
+        """
+        self.rows -= rows
+
+
+def enforce_retention(max_rows, max_seconds, batch_size):
+    """
+    Delete the records that the configured retention policies no longer keep.
+
+    Records are deleted ``batch_size`` at a time, each batch in its own short
+    query, and the run stops once ``max_rows`` records have been deleted or
+    ``max_seconds`` have passed (checked between batches).  Whatever is left
+    over is picked up by the next run.
+
+    Returns the number of records deleted.
+    """
+    budget = RetentionBudget(max_rows, max_seconds)
+    deleted = 0
+    for expired in _expired_querysets():
+        deleted += _delete(expired, budget, batch_size)
+    max_count = getattr(settings, 'CELERY_UTILS_RETENTION_UNRESOLVED_MAX_COUNT', None)
+    if max_count is not None and not budget.exhausted:
+        unresolved = FailedTask.objects.using(router.db_for_write(FailedTask)).filter(datetime_resolved=None)
+        excess = unresolved.count() - max_count
+        if excess > 0:
+            deleted += _delete(unresolved, budget, batch_size, limit=excess)
+    log.info(f'Retention deleted {deleted} records')
+    return deleted
+
+
+def _expired_querysets():
+    """
+    Yield querysets of the records that have outlived their maximum age.
+    """
+    resolved = FailedTask.objects.filter(datetime_resolved__isnull=False)
+    by_task = getattr(settings, 'CELERY_UTILS_RETENTION_RESOLVED_DAYS_BY_TASK', {})
+    for task_name, days in by_task.items():
+        if days is not None:
+            yield resolved.filter(task_name=task_name, datetime_resolved__lt=now() - timedelta(days=days))
+    days = getattr(settings, 'CELERY_UTILS_RETENTION_RESOLVED_DAYS', 30)
+    if days is not None:
+        yield resolved.exclude(task_name__in=list(by_task)).filter(datetime_resolved__lt=now() - timedelta(days=days))
+    days = getattr(settings, 'CELERY_UTILS_RETENTION_UNRESOLVED_DAYS', None)
+    if days is not None:
+        yield FailedTask.objects.filter(datetime_resolved=None, created__lt=now() - timedelta(days=days))
+    days = getattr(settings, 'CELERY_UTILS_RETENTION_ARCHIVED_DAYS', None)
+    if days is not None:
+        yield ArchivedFailedTask.objects.filter(datetime_archived__lt=now() - timedelta(days=days))
+    days = getattr(settings, 'CELERY_UTILS_RETENTION_CHECKPOINT_DAYS', 7)
+    if days is not None:
+        yield CommandCheckpoint.objects.filter(datetime_completed__lt=now() - timedelta(days=days))
+
+
+def _delete(queryset, budget, batch_size, limit=None):
+    """
+    Delete the oldest records in ``queryset`` in batches.
+
+    Stops when the queryset is empty, ``limit`` records have been deleted,
+    ``budget`` runs out, or a batch deletes nothing.  Records are selected
+    on the database they are deleted from, not a replica that may lag.
+    """
+    queryset = queryset.using(router.db_for_write(queryset.model))
+    deleted = 0
+    while not budget.exhausted and (limit is None or deleted < limit):
+        size = min(batch_size, budget.rows)
+        if limit is not None:
+            size = min(size, limit - deleted)
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:size])
+        if not pks:
+            break
+        # Re-apply the filter, in case a record changed since it was selected.
+        count, _ = queryset.filter(pk__in=pks).delete()
+        budget.spend(count)
+        deleted += count
+        if not count or len(pks) < size:
+            break
+    return deleted
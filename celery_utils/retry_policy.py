@@ -0,0 +1,176 @@
+"""
+Retry backoff and budgets, to keep retries from piling onto a struggling dependency.
+
+``RetryPolicyTask`` changes what ``Task.retry`` does (including retries made
+through ``autoretry_for``):
+
+* Without an explicit ``countdown`` or ``eta``, the retry waits for a
+  jittered exponential backoff (see ``bounded_exponential_jitter``), so that
+  tasks which failed together do not retry in lockstep.
+* Each task name has a retry budget: within ``retry_budget_window`` seconds,
+  it may retry ``retry_budget_ratio`` times as often as it has succeeded, or
+  ``retry_budget_minimum`` times, whichever is more.  Successes and retries
+  are counted in the Django cache named by ``CELERY_UTILS_RETRY_BUDGET_CACHE``
+  (default ``'default'``), shared by all workers.  Once the budget is spent,
+  ``retry`` fails the task instead, so that ``PersistOnFailureTask`` records
+  it for a later reapply rather than adding to the load on whatever is
+  failing.  A task that has already used up ``max_retries`` fails as usual,
+  without spending any of the budget.
+
+Combine it with the other base classes, for example::
+
+    class ResilientTask(RetryPolicyTask, LoggedPersistOnFailureTask):
+        abstract = True
+        retry_backoff_base = 2
+"""
+
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from celery import Task
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+
+class RetryBudgetExhausted(Exception):
+    """
+    Raised instead of retrying when a task name's retry budget is spent.
+    """
+
+
+def bounded_exponential_jitter(retries, base, cap):
+    """
+    Get a random delay, in seconds, before retry number ``retries`` (from 0).
+
+    The delay is drawn uniformly between ``base`` and ``base * 3 ** retries``,
+    capped at ``cap``.  It depends only on the retry count, so no state needs
+    to be carried between retries.
+    """
+    ceiling = min(cap, base * 3 ** retries)
+    return random.uniform(min(base, ceiling), ceiling)
+
+
+class RetryBudget:
+    """
+    Counts of the recent successes and retries of one task name, in the shared cache.
+
+    Counts are kept in fixed windows of ``window`` seconds; the current and
+    previous windows are considered together, to smooth the boundary.
+    """
+
+    def __init__(self, task_name, ratio, minimum, window):
+        """
+        Create the budget for ``task_name``.
+        """
+        self.task_name = task_name
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+
+    @property
+    def cache(self):
+        """
+        The cache holding the counts.
+        """
+        return caches[getattr(settings, 'CELERY_UTILS_RETRY_BUDGET_CACHE', 'default')]
+
+    def _key(self, kind, bucket):
+        return f'celery_utils:retry_budget:{self.task_name}:{kind}:{bucket}'
+
+    def _increment(self, kind):
+        key = self._key(kind, int(time.time() // self.window))
+        if not self.cache.add(key, 1, timeout=self.window * 2):
+            try:
+                self.cache.incr(key)
+            except ValueError:  # Expired between add and incr
+                self.cache.add(key, 1, timeout=self.window * 2)
+
+    def _recent(self, kind):
+        bucket = int(time.time() // self.window)
+        counts = self.cache.get_many([self._key(kind, bucket), self._key(kind, bucket - 1)])
+        return sum(counts.values())
+
+    def record_success(self):
+        """
+        Count a success of the task.
+        """
+        self._increment('successes')
+
+    def try_spend(self):
+        """
+        Count a retry and return True if the budget allows one; otherwise return False.
+        """
+        allowed = max(self.minimum, self.ratio * self._recent('successes'))
+        if self._recent('retries') >= allowed:
+            return False
+        self._increment('retries')
+        return True
+
+
+class RetryPolicyTask(Task):
+    """
+    Task base class adding jittered backoff and a shared retry budget to ``retry``.
+    """
+
+    abstract = True
+
+    #: Smallest backoff delay, in seconds.
+    retry_backoff_base = 1
+
+    #: Largest backoff delay, in seconds.
+    retry_backoff_cap = 600
+
+    #: Retries allowed per success within the budget window.
+    retry_budget_ratio = 0.1
+
+    #: Retries always allowed within the budget window, however few successes there were.
+    retry_budget_minimum = 10
+
+    #: Length of the budget window, in seconds.
+    retry_budget_window = 60
+
+    @property
+    def retry_budget(self):
+        """
+        The retry budget shared by every instance of this task.
+        """
+        return RetryBudget(self.name, self.retry_budget_ratio, self.retry_budget_minimum, self.retry_budget_window)
+
+    def retry(self, args=None, kwargs=None, exc=None, throw=True, eta=None, countdown=None, max_retries=None,
+              **options):
+        """
+        Retry the task after a jittered backoff, or fail it if the retry budget is spent.
+
+        The budget is only spent on retries ``max_retries`` allows.  When it is
+        exhausted, the exception is raised, or returned if ``throw`` is False.
+        """
+        limit = self.max_retries if max_retries is None else max_retries
+        within_limit = limit is None or self.request.retries < limit
+        if within_limit and not self.retry_budget.try_spend():
+            log.warning(f'{self.name}[{self.request.id}] retry budget exhausted; failing instead of retrying')
+            metrics.emit('celery_utils.retry_budget.exhausted', 1, task_name=self.name)
+            exc = exc or RetryBudgetExhausted(f'Retry budget of {self.name} exhausted')
+            if not throw:
+                return exc
+            raise exc
+        if countdown is None and eta is None:
+            countdown = bounded_exponential_jitter(
+                self.request.retries, self.retry_backoff_base, self.retry_backoff_cap,
+            )
+        return super().retry(
+            args=args, kwargs=kwargs, exc=exc, throw=throw, eta=eta, countdown=countdown, max_retries=max_retries,
+            **options
+        )
+
+    def on_success(self, retval, task_id, args, kwargs):
+        """
+        Count the success towards the retry budget.
+        """
+        self.retry_budget.record_success()
+        super().on_success(retval, task_id, args, kwargs)
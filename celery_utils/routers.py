@@ -0,0 +1,79 @@
+"""
+Database router sending celery_utils' read-only queries to a replica.
+
+Add the router to the ``DATABASE_ROUTERS`` setting, ahead of any routers that
+would otherwise claim celery_utils' models::
+
+    DATABASE_ROUTERS = ['celery_utils.routers.CeleryUtilsRouter', ...]
+
+Reads of failure records (``FailedTask``, ``ArchivedFailedTask`` and
+``FailureBacklog``) then go to the database alias named by the
+``CELERY_UTILS_READ_DATABASE`` setting, e.g. for admin browsing and
+reporting.  Writes, such as recording and resolving failures, deletes and
+reapply claims, are left to the default routing (the primary).  Management
+commands' ``--database`` option sends their read-only queries to another
+alias for the duration of the command with ``read_from``.
+
+Reads that decide what to write (e.g. which records to archive as they are
+resolved, or delete under a retention policy) are pinned to the write database, so that replication lag cannot
+make them miss records.
+"""
+
+from contextlib import contextmanager
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router
+
+_REPLICATED_MODELS = {'failedtask', 'archivedfailedtask', 'failurebacklog'}
+
+_override = threading.local()
+
+
+class CeleryUtilsRouter:
+    """
+    Route reads of celery_utils' failure records to the configured replica.
+    """
+
+    def db_for_read(self, model, **hints):  # pylint: disable=unused-argument
+        """
+        Name the replica alias for reads of failure records, if one is configured.
+        """
+        if model._meta.app_label != 'celery_utils' or model._meta.model_name not in _REPLICATED_MODELS:
+            return None
+        alias = getattr(_override, 'alias', None)
+        if alias is None:
+            alias = getattr(settings, 'CELERY_UTILS_READ_DATABASE', None)
+        return alias
+
+
+def is_installed():
+    """
+    Whether ``CeleryUtilsRouter`` is among the configured ``DATABASE_ROUTERS``.
+    """
+    return any(isinstance(installed, CeleryUtilsRouter) for installed in router.routers)
+
+
+@contextmanager
+def read_from(alias):
+    """
+    Send reads of failure records to the database ``alias`` within the block.
+
+    Does nothing if ``alias`` is None.  Raises ``ImproperlyConfigured`` if an
+    alias is given but ``CeleryUtilsRouter`` is not installed, since the
+    reads would otherwise silently go to the default database.
+    """
+    if alias is None:
+        yield
+        return
+    if not is_installed():
+        raise ImproperlyConfigured(
+            f'Reading from database {alias!r} requires celery_utils.routers.CeleryUtilsRouter in DATABASE_ROUTERS'
+        )
+    previous = getattr(_override, 'alias', None)
+    _override.alias = alias
+    try:
+        yield
+    finally:
+        _override.alias = previous
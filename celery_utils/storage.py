@@ -0,0 +1,494 @@
+"""
+Storage backends for failed-task records.
+
+``PersistOnFailureTask``, ``mark_resolved`` and the ``reapply_tasks`` and
+``cleanup_resolved_tasks`` management commands keep their records in the
+store named by the ``CELERY_UTILS_FAILURE_STORE`` setting (a dotted path to a
+``FailureStore`` subclass):
+
+* ``DjangoFailureStore`` (the default) keeps them in the ``FailedTask``
+  model.  The Django admin, automatic reapply (``reapply_failed_tasks``),
+  quarantine and the other model-based features only see records in this store.
+* ``SQLiteFailureStore`` keeps them in a local SQLite file in WAL mode, so
+  that services with high failure rates can record failures without writing
+  to the primary database.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router
+from django.db.models import Case, F, Value, When
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from celery import current_app
+
+from . import backlog
+from .archive import archive_task
+from .batching import keyset_batches
+from .codecs import get_codec
+from .models import FailedTask, failure_fingerprint, reapply_backoff
+
+log = logging.getLogger(__name__)
+
+
+class FailureStore:
+    """
+    Interface for storing records of failed tasks.
+
+    Records returned by a store have at least ``pk``, ``task_name``,
+    ``task_id``, ``args``, ``kwargs``, ``exc`` and ``datetime_resolved``
+    attributes, and a ``reapply(lease=None)`` method.  Primary keys increase
+    monotonically, so that callers can checkpoint their progress through a
+    store by the last primary key handled.
+    """
+
+    @property
+    def identity(self):
+        """
+        A JSON-serializable description of the records this store holds, whose primary keys checkpoints refer to.
+        """
+        return {'class': f'{type(self).__module__}.{type(self).__qualname__}'}
+
+    def record(self, task_name, task_id, args, kwargs, exc, trace=None):
+        """
+        Record that the task ``task_id`` failed with the exception ``exc``.
+
+        ``trace`` is the failed run's trace context (see ``celery_utils.tracing``), if any.
+        """
+        raise NotImplementedError
+
+    def resolve(self, task_id):
+        """
+        Mark every unresolved record for ``task_id`` as resolved.
+        """
+        raise NotImplementedError
+
+    def count_unresolved(self, task_name=None, after=0, quarantined=False):
+        """
+        Count unresolved records with a primary key greater than ``after``.
+
+        Quarantined records are counted instead of the others if ``quarantined`` is set.
+        """
+        raise NotImplementedError
+
+    def iter_unresolved(self, task_name=None, after=0, batch_size=1000, quarantined=False):
+        """
+        Yield lists of unresolved records in primary key order, starting after ``after``.
+
+        Quarantined records are yielded instead of the others if ``quarantined`` is set.
+        """
+        raise NotImplementedError
+
+    def count_resolved(self, resolved_before, task_name=None, after=0):
+        """
+        Count records resolved before ``resolved_before`` with a primary key greater than ``after``.
+        """
+        raise NotImplementedError
+
+    def iter_resolved(self, resolved_before, task_name=None, after=0, batch_size=1000):
+        """
+        Yield lists of records resolved before ``resolved_before``, in primary key order.
+        """
+        raise NotImplementedError
+
+    def purge(self, resolved_before, task_name=None, after=0, batch_size=1000):
+        """
+        Delete records resolved before ``resolved_before``, a batch at a time.
+
+        Yields ``(last_pk, deleted)`` after each batch.
+        """
+        raise NotImplementedError
+
+
+class DjangoFailureStore(FailureStore):
+    """
+    Failure store backed by the ``FailedTask`` model.
+    """
+
+    def record(self, task_name, task_id, args, kwargs, exc, trace=None):
+        """
+        Create a ``FailedTask``, unless the task is already recorded as failed.
+
+        If it is (i.e. this was a reapply), the existing record is kept and
+        its reapply claim is released instead, and its count of repeated
+        failures is incremented if it failed the same way as last time (see
+        ``models.failure_fingerprint``), or reset otherwise, and it keeps the
+        trace context of the original failure.  New records are added to the
+        backlog counters, if enabled.
+        """
+        fingerprint = failure_fingerprint(exc)
+        # repeat_failures comes first: MySQL evaluates assignments in order, against the updated values.
+        repeated = FailedTask.objects.filter(task_id=task_id, datetime_resolved=None).update(
+            reapplied_at=None,
+            repeat_failures=Case(
+                When(fingerprint=fingerprint, then=F('repeat_failures') + 1), default=Value(0),
+            ),
+            fingerprint=fingerprint,
+        )
+        if not repeated:
+            task_name = _truncate_to_field(FailedTask, 'task_name', task_name)
+            FailedTask.objects.create(
+                task_name=task_name,
+                task_id=task_id,  # Fixed length UUID: No need to truncate
+                args=args,
+                kwargs=kwargs,
+                # TODO: Remove ".replace(',', ''))" when python 3.5 support is dropped
+                exc=_truncate_to_field(FailedTask, 'exc', repr(exc).replace(',', '')),
+                fingerprint=fingerprint,
+                trace=trace,
+                next_attempt_at=now() + reapply_backoff(0),
+            )
+            if backlog.is_enabled():
+                backlog.increment(task_name)
+
+    def resolve(self, task_id):
+        """
+        Stamp the unresolved ``FailedTask`` records for ``task_id`` as resolved.
+
+        With the ``CELERY_UTILS_ARCHIVE_ON_RESOLVE`` setting enabled, they are
+        then moved straight to the ``ArchivedFailedTask`` table.  They are
+        taken off the backlog counters, if enabled.
+        """
+        unresolved = FailedTask.objects.using(router.db_for_write(FailedTask)).filter(
+            task_id=task_id, datetime_resolved=None,
+        )
+        task_names = list(unresolved.values_list('task_name', flat=True)) if backlog.is_enabled() else []
+        resolved = unresolved.update(datetime_resolved=now())
+        if task_names and resolved:
+            if len(set(task_names)) == 1:
+                # The usual case; trust the update's count over the earlier read.
+                backlog.decrement(task_names[0], resolved)
+            else:
+                for task_name in task_names:
+                    backlog.decrement(task_name)
+        if getattr(settings, 'CELERY_UTILS_ARCHIVE_ON_RESOLVE', False):
+            archive_task(task_id)
+
+    def count_unresolved(self, task_name=None, after=0, quarantined=False):
+        """
+        Count unresolved ``FailedTask`` records.
+        """
+        return self._unresolved(task_name, quarantined).filter(pk__gt=after).count()
+
+    def iter_unresolved(self, task_name=None, after=0, batch_size=1000, quarantined=False):
+        """
+        Yield batches of unresolved ``FailedTask`` records.
+        """
+        return keyset_batches(self._unresolved(task_name, quarantined), batch_size, start_after=after)
+
+    def count_resolved(self, resolved_before, task_name=None, after=0):
+        """
+        Count ``FailedTask`` records resolved before ``resolved_before``.
+        """
+        return self._resolved(resolved_before, task_name).filter(pk__gt=after).count()
+
+    def iter_resolved(self, resolved_before, task_name=None, after=0, batch_size=1000):
+        """
+        Yield batches of ``FailedTask`` records resolved before ``resolved_before``.
+        """
+        return keyset_batches(self._resolved(resolved_before, task_name), batch_size, start_after=after)
+
+    def purge(self, resolved_before, task_name=None, after=0, batch_size=1000):
+        """
+        Delete ``FailedTask`` records resolved before ``resolved_before``, a batch at a time.
+        """
+        tasks = self._resolved(resolved_before, task_name).only('pk')
+        for batch in keyset_batches(tasks, batch_size, start_after=after):
+            FailedTask.objects.filter(pk__in=[task.pk for task in batch]).delete()
+            yield batch[-1].pk, len(batch)
+
+    @staticmethod
+    def _unresolved(task_name, quarantined=False):
+        tasks = FailedTask.objects.filter(datetime_resolved=None, datetime_quarantined__isnull=not quarantined)
+        if task_name is not None:
+            tasks = tasks.filter(task_name=task_name)
+        return tasks
+
+    @staticmethod
+    def _resolved(resolved_before, task_name):
+        tasks = FailedTask.objects.filter(datetime_resolved__lt=resolved_before)
+        if task_name is not None:
+            tasks = tasks.filter(task_name=task_name)
+        return tasks
+
+
+class StoredFailure:
+    """
+    A failed task recorded by ``SQLiteFailureStore``.
+    """
+
+    def __init__(self, store, pk, task_name, task_id, args, kwargs, exc, created, datetime_resolved):
+        """
+        Wrap a row read from ``store``.
+        """
+        self.store = store
+        self.pk = pk  # pylint: disable=invalid-name
+        self.task_name = task_name
+        self.task_id = task_id
+        self.args = args
+        self.kwargs = kwargs
+        self.exc = exc
+        self.created = created
+        self.datetime_resolved = datetime_resolved
+
+    def reapply(self, lease=None):  # pylint: disable=unused-argument
+        """
+        Enqueue new celery task with the same arguments as the failed task.
+
+        The record is resolved as soon as the task is published, in the same
+        conditional UPDATE that stops concurrent reapplies from publishing it
+        too: the reapplied task may run on a host with a different store, so
+        its outcome can't be reported back here.  If it fails again, it is
+        recorded afresh wherever it ran.  ``lease`` is accepted for
+        compatibility with ``FailedTask.reapply``, and ignored.
+
+        Returns True if the task was published.
+        """
+        if self.datetime_resolved is not None:
+            raise TypeError(f'Cannot reapply a resolved task: {self}')
+        resolved_at = self.store.claim(self.task_id)
+        if resolved_at is None:
+            log.info(f'Skipping failed task claimed by another reapply: {self}')
+            return False
+        log.info(f'Reapplying failed task: {self}')
+        try:
+            current_app.tasks[self.task_name].apply_async(self.args, self.kwargs, task_id=self.task_id)
+        except Exception:
+            self.store.unclaim(self.task_id, resolved_at)
+            raise
+        return True
+
+    def __str__(self):
+        return f"StoredFailure: {self.task_name}, " \
+               f"args={self.args}, kwargs={self.kwargs} " \
+               f"({'not resolved' if self.datetime_resolved is None else 'resolved'})"
+
+
+class SQLiteFailureStore(FailureStore):
+    """
+    Failure store keeping records in a local SQLite database in WAL mode.
+
+    The database file is given by the ``CELERY_UTILS_FAILURE_STORE_PATH``
+    setting, which must be set, to a path on persistent storage: a default in
+    the system temporary directory could be wiped on reboot, losing the
+    records.  Each host keeps its own file, so run the management commands on
+    every host that records failures.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS failed_task ('
+        ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+        ' task_name TEXT NOT NULL,'
+        ' task_id TEXT NOT NULL,'
+        ' args TEXT NOT NULL,'
+        ' kwargs TEXT NOT NULL,'
+        ' exc TEXT NOT NULL,'
+        ' created REAL NOT NULL,'
+        ' datetime_resolved REAL'
+        ')',
+        'CREATE INDEX IF NOT EXISTS failed_task_task_id ON failed_task (task_id, datetime_resolved)',
+        'CREATE INDEX IF NOT EXISTS failed_task_resolved ON failed_task (datetime_resolved)',
+    )
+    COLUMNS = 'id, task_name, task_id, args, kwargs, exc, created, datetime_resolved'
+
+    def __init__(self):
+        """
+        Set up per-thread connection tracking; connections are opened lazily.
+        """
+        self._local = threading.local()
+
+    @property
+    def path(self):
+        """
+        The SQLite database file.
+        """
+        path = getattr(settings, 'CELERY_UTILS_FAILURE_STORE_PATH', None)
+        if not path:
+            raise ImproperlyConfigured(
+                'SQLiteFailureStore requires the CELERY_UTILS_FAILURE_STORE_PATH setting, '
+                'naming a database file on persistent storage'
+            )
+        return path
+
+    @property
+    def identity(self):
+        """
+        Describe the store by its file and host, as each host keeps its own records.
+        """
+        return dict(super().identity, path=os.path.abspath(self.path), hostname=socket.gethostname())
+
+    def connection(self):
+        """
+        Get this thread's connection to the database, creating the schema if needed.
+        """
+        key = (os.getpid(), self.path)
+        if getattr(self._local, 'key', None) != key:
+            # Connections can't be shared with forked children or other threads.
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            self._local.connection, self._local.key = connection, key
+        return self._local.connection
+
+    def record(self, task_name, task_id, args, kwargs, exc, trace=None):
+        """
+        Insert a record, unless the task is already recorded as failed.
+
+        Trace contexts are not kept by this store.
+        """
+        codec = get_codec()
+        self.connection().execute(
+            f'INSERT INTO failed_task ({self.COLUMNS}) '
+            'SELECT NULL, ?, ?, ?, ?, ?, ?, NULL '
+            'WHERE NOT EXISTS (SELECT 1 FROM failed_task WHERE task_id = ? AND datetime_resolved IS NULL)',
+            (task_name, task_id, codec.dumps(args), codec.dumps(kwargs), repr(exc), time.time(), task_id),
+        )
+
+    def resolve(self, task_id):
+        """
+        Mark the unresolved records for ``task_id`` as resolved.
+        """
+        self.claim(task_id)
+
+    def claim(self, task_id):
+        """
+        Resolve the unresolved records for ``task_id``.
+
+        Returns the resolution timestamp, or None if there were no unresolved records.
+        """
+        resolved_at = time.time()
+        cursor = self.connection().execute(
+            'UPDATE failed_task SET datetime_resolved = ? WHERE task_id = ? AND datetime_resolved IS NULL',
+            (resolved_at, task_id),
+        )
+        return resolved_at if cursor.rowcount else None
+
+    def unclaim(self, task_id, resolved_at):
+        """
+        Undo a ``claim`` that returned ``resolved_at``, e.g. if the task could not be published.
+        """
+        self.connection().execute(
+            'UPDATE failed_task SET datetime_resolved = NULL WHERE task_id = ? AND datetime_resolved = ?',
+            (task_id, resolved_at),
+        )
+
+    def count_unresolved(self, task_name=None, after=0, quarantined=False):
+        """
+        Count unresolved records.
+
+        This store never quarantines records, so there are none to count if ``quarantined`` is set.
+        """
+        if quarantined:
+            return 0
+        where, params = self._where('datetime_resolved IS NULL', (), task_name, after)
+        return self.connection().execute(f'SELECT COUNT(*) FROM failed_task WHERE {where}', params).fetchone()[0]
+
+    def iter_unresolved(self, task_name=None, after=0, batch_size=1000, quarantined=False):
+        """
+        Yield batches of unresolved records (never quarantined ones, as this store doesn't quarantine).
+        """
+        if quarantined:
+            return iter(())
+        return self._batches('datetime_resolved IS NULL', (), task_name, after, batch_size)
+
+    def count_resolved(self, resolved_before, task_name=None, after=0):
+        """
+        Count records resolved before ``resolved_before``.
+        """
+        where, params = self._where('datetime_resolved < ?', (resolved_before.timestamp(),), task_name, after)
+        return self.connection().execute(f'SELECT COUNT(*) FROM failed_task WHERE {where}', params).fetchone()[0]
+
+    def iter_resolved(self, resolved_before, task_name=None, after=0, batch_size=1000):
+        """
+        Yield batches of records resolved before ``resolved_before``.
+        """
+        return self._batches('datetime_resolved < ?', (resolved_before.timestamp(),), task_name, after, batch_size)
+
+    def purge(self, resolved_before, task_name=None, after=0, batch_size=1000):
+        """
+        Delete records resolved before ``resolved_before``, a batch at a time.
+        """
+        connection = self.connection()
+        while True:
+            where, params = self._where('datetime_resolved < ?', (resolved_before.timestamp(),), task_name, after)
+            ids = [row[0] for row in connection.execute(
+                f'SELECT id FROM failed_task WHERE {where} ORDER BY id LIMIT ?', params + (batch_size,)
+            )]
+            if not ids:
+                return
+            connection.execute(f'DELETE FROM failed_task WHERE id IN ({",".join("?" * len(ids))})', ids)
+            after = ids[-1]
+            yield after, len(ids)
+
+    @staticmethod
+    def _where(condition, params, task_name, after):
+        clauses, params = [condition, 'id > ?'], params + (after,)
+        if task_name is not None:
+            clauses.append('task_name = ?')
+            params += (task_name,)
+        return ' AND '.join(clauses), params
+
+    def _batches(self, condition, params, task_name, after, batch_size):
+        codec = get_codec()
+        connection = self.connection()
+        while True:
+            where, query_params = self._where(condition, params, task_name, after)
+            rows = connection.execute(
+                f'SELECT {self.COLUMNS} FROM failed_task WHERE {where} ORDER BY id LIMIT ?',
+                query_params + (batch_size,),
+            ).fetchall()
+            if not rows:
+                return
+            yield [
+                StoredFailure(
+                    self, pk, name, task_id, codec.loads(args), codec.loads(kwargs), exc,
+                    datetime.fromtimestamp(created),
+                    None if resolved is None else datetime.fromtimestamp(resolved),
+                )
+                for pk, name, task_id, args, kwargs, exc, created, resolved in rows
+            ]
+            after = rows[-1][0]
+
+
+def get_failure_store():
+    """
+    Get the failure store configured by the ``CELERY_UTILS_FAILURE_STORE`` setting.
+    """
+    path = getattr(settings, 'CELERY_UTILS_FAILURE_STORE', 'celery_utils.storage.DjangoFailureStore')
+    return _load_store(path)
+
+
+@lru_cache(maxsize=None)
+def _load_store(path):
+    return import_string(path)()
+
+
+def _truncate_to_field(model, field_name, value):
+    """
+    Shorten data to fit in the specified model field.
+
+    If the data were too big for the field, it would cause a failure to
+    insert, so we shorten it, truncating in the middle (because
+    valuable information often shows up at the end.
+    """
+    field = model._meta.get_field(field_name)  # pylint: disable=protected-access
+    if len(value) > field.max_length:
+        midpoint = field.max_length // 2
+        len_after_midpoint = field.max_length - midpoint
+        first = value[:midpoint]
+        sep = '...'
+        last = value[len(value) - len_after_midpoint + len(sep):]
+        value = sep.join([first, last])
+    return value
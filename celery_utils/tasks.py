@@ -2,18 +2,160 @@
 Celery tasks that support the utils in this module.
 """
 
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
 from django.utils.timezone import now
 
 from celery import shared_task
 
+from .instrumentation import instrumented
+
 
 @shared_task
 def mark_resolved(task_id):
     """
-    Mark the specified task as resolved in the FailedTask table.
+    Mark the specified task as resolved in the configured failure store.
 
     If more than one record exists with the specified task id, they will all be
     marked resolved.
     """
+    from .storage import get_failure_store  # pylint: disable=import-outside-toplevel
+    with instrumented('mark_resolved'):
+        get_failure_store().resolve(task_id)
+
+
+@shared_task
+def reapply_failed_tasks(batch_size=None, max_attempts=None):
+    """
+    Reapply unresolved failed tasks whose backoff period has elapsed.
+
+    This is meant to be run periodically by celery beat, for example::
+
+        CELERY_BEAT_SCHEDULE = {
+            'reapply-failed-tasks': {
+                'task': 'celery_utils.tasks.reapply_failed_tasks',
+                'schedule': 60,
+            },
+        }
+
+    Each run reapplies at most ``batch_size`` records (default: the
+    ``CELERY_UTILS_AUTO_REAPPLY_BATCH_SIZE`` setting, or 100).  Every reapply
+    doubles the wait before the record is eligible again (see
+    ``models.reapply_backoff``), and records that have already been
+    reapplied ``max_attempts`` times (default:
+    ``CELERY_UTILS_AUTO_REAPPLY_MAX_ATTEMPTS``, or 5) are left for an
+    operator to deal with.  Quarantined records are skipped.
+
+    Returns the number of tasks reapplied.
+    """
     from . import models  # pylint: disable=import-outside-toplevel
-    models.FailedTask.objects.filter(task_id=task_id, datetime_resolved=None).update(datetime_resolved=now())
+    if batch_size is None:
+        batch_size = getattr(settings, 'CELERY_UTILS_AUTO_REAPPLY_BATCH_SIZE', 100)
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'CELERY_UTILS_AUTO_REAPPLY_MAX_ATTEMPTS', 5)
+    due = models.FailedTask.objects.filter(
+        Q(next_attempt_at=None) | Q(next_attempt_at__lte=now()),
+        datetime_resolved=None,
+        datetime_quarantined=None,
+        attempts__lt=max_attempts,
+    ).order_by('next_attempt_at')[:batch_size]
+    seen_tasks = set()
+    reapplied = 0
+    for task in due:
+        if task.task_id in seen_tasks:
+            continue
+        seen_tasks.add(task.task_id)
+        if task.reapply():
+            reapplied += 1
+    return reapplied
+
+
+@shared_task
+def archive_resolved_tasks(batch_size=1000, max_batches=None):
+    """
+    Move resolved FailedTask records into the ArchivedFailedTask table.
+
+    Meant to be run periodically by celery beat, to keep the FailedTask table
+    down to unresolved failures.  At most ``max_batches`` batches of
+    ``batch_size`` records are moved per run, if given.
+
+    Returns the number of records moved.
+    """
+    from .archive import archive_resolved_tasks as archive  # pylint: disable=import-outside-toplevel
+    moved = 0
+    for batch_number, (_, batch_moved) in enumerate(archive(batch_size=batch_size), start=1):
+        moved += batch_moved
+        if max_batches is not None and batch_number >= max_batches:
+            break
+    return moved
+
+
+@shared_task
+def enforce_failed_task_retention(max_rows=None, max_seconds=None, batch_size=None):
+    """
+    Delete FailedTask and ArchivedFailedTask records that the configured retention policies no longer keep.
+
+    Meant to be run periodically by celery beat; see ``celery_utils.retention``
+    for the policy settings.  Each run deletes at most ``max_rows`` records
+    (default: the ``CELERY_UTILS_RETENTION_MAX_ROWS`` setting, or 10000), in
+    batches of ``batch_size`` (default: ``CELERY_UTILS_RETENTION_BATCH_SIZE``,
+    or 500), and starts no new batch after ``max_seconds`` (default:
+    ``CELERY_UTILS_RETENTION_MAX_SECONDS``, or 30).  Schedule it often enough
+    that this budget keeps up with the rate of new failures.
+
+    Returns the number of records deleted.
+    """
+    from .retention import enforce_retention  # pylint: disable=import-outside-toplevel
+    if max_rows is None:
+        max_rows = getattr(settings, 'CELERY_UTILS_RETENTION_MAX_ROWS', 10000)
+    if max_seconds is None:
+        max_seconds = getattr(settings, 'CELERY_UTILS_RETENTION_MAX_SECONDS', 30)
+    if batch_size is None:
+        batch_size = getattr(settings, 'CELERY_UTILS_RETENTION_BATCH_SIZE', 500)
+    return enforce_retention(max_rows, max_seconds, batch_size)
+
+
+@shared_task
+def sweep_claim_checks(max_age=None):
+    """
+    Delete claim check blobs that no unresolved failure record refers to any more.
+
+    Meant to be run periodically by celery beat, e.g. daily; see
+    ``celery_utils.claim_check.sweep_orphans``.  ``max_age`` is in seconds,
+    defaulting to the ``CELERY_UTILS_CLAIM_CHECK_MAX_AGE`` setting.
+
+    Returns the number of blobs deleted.
+    """
+    from .claim_check import sweep_orphans  # pylint: disable=import-outside-toplevel
+    return sweep_orphans(None if max_age is None else timedelta(seconds=max_age))
+
+
+@shared_task
+def reconcile_failure_backlog():
+    """
+    Recount the unresolved FailedTask records per task name, and publish the counts.
+
+    Meant to be run periodically by celery beat alongside the
+    ``CELERY_UTILS_BACKLOG_COUNTERS`` setting; see ``celery_utils.backlog``.
+
+    Returns a dict mapping each task name with unresolved failures to its count.
+    """
+    from .backlog import reconcile  # pylint: disable=import-outside-toplevel
+    return reconcile()
+
+
+@shared_task
+def run_bulk_action(job_id, batch_size=None):
+    """
+    Carry out the bulk admin action recorded as the ``BulkActionJob`` ``job_id``.
+
+    Records are handled ``batch_size`` at a time (default: the
+    ``CELERY_UTILS_BULK_ACTION_BATCH_SIZE`` setting, or 500).
+    """
+    from .bulk_actions import run_job  # pylint: disable=import-outside-toplevel
+    from .models import BulkActionJob  # pylint: disable=import-outside-toplevel
+    if batch_size is None:
+        batch_size = getattr(settings, 'CELERY_UTILS_BULK_ACTION_BATCH_SIZE', 500)
+    run_job(BulkActionJob.objects.get(pk=job_id), batch_size)
@@ -0,0 +1,188 @@
+"""
+Propagating a trace context through task submission, execution, failure and reapply.
+
+With the ``CELERY_UTILS_TRACING`` setting enabled, every ``LoggedTask``
+submission carries a trace context in its ``celery_utils_trace`` message
+header: a dict with
+
+* ``trace_id``, shared by every task descended from the same origin,
+* ``span_id``, identifying the submitted run,
+* ``parent_span_id``, the span that submitted it (None at the origin), and
+* ``submitted_at``, the submission time as a Unix timestamp.
+
+Tasks submitted while another traced task runs become its children, as do
+tasks submitted within ``trace(...)``, which a web request can use to link
+the tasks it enqueues to itself::
+
+    with tracing.trace(trace_id=request.META.get('HTTP_X_REQUEST_ID')):
+        send_email.delay(user_id)
+
+A traced run that fails keeps its context in ``FailedTask.trace``, and
+``FailedTask.reapply`` submits the new run as a child of the failed one, in
+the same trace, so a trace covers the whole path through failure and
+recovery.
+
+Each traced run is reported as a span (a dict with the context above plus
+``name``, ``task_id``, ``started_at``, ``finished_at`` and ``status``) to the
+callable named by the ``CELERY_UTILS_TRACE_EXPORTER`` setting, by dotted
+path.  ``export_to_file`` appends them as JSON lines to
+``CELERY_UTILS_TRACE_FILE``.  When the setting is unset, spans are discarded.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from celery.exceptions import Retry
+
+log = logging.getLogger(__name__)
+
+#: Message header carrying the trace context.
+HEADER = 'celery_utils_trace'
+
+# The context of the span currently running, which new submissions descend from.
+_current = ContextVar('celery_utils_trace', default=None)
+_file_lock = threading.Lock()
+
+
+def is_enabled():
+    """
+    Whether trace contexts are propagated, per the ``CELERY_UTILS_TRACING`` setting.
+    """
+    return getattr(settings, 'CELERY_UTILS_TRACING', False)
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+def new_context(parent=None):
+    """
+    Make the context for a new submission, as a child of ``parent`` (a context) if given.
+    """
+    return {
+        'trace_id': parent['trace_id'] if parent else _new_id(),
+        'span_id': _new_id(),
+        'parent_span_id': parent['span_id'] if parent else None,
+        'submitted_at': time.time(),
+    }
+
+
+def current_context():
+    """
+    Get the context of the running span, or None.
+    """
+    return _current.get()
+
+
+@contextmanager
+def trace(trace_id=None, span_id=None):
+    """
+    Make tasks submitted in the enclosed block part of the trace ``trace_id``, as children of ``span_id``.
+
+    A new trace is started if ``trace_id`` is not given.
+    """
+    token = _current.set({
+        'trace_id': trace_id or _new_id(),
+        'span_id': span_id or _new_id(),
+        'parent_span_id': None,
+        'submitted_at': time.time(),
+    })
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def inject(headers):
+    """
+    Get message ``headers`` with a trace context for a new submission added, unless they have one.
+    """
+    headers = dict(headers or {})
+    headers.setdefault(HEADER, new_context(current_context()))
+    return headers
+
+
+def context_of(request):
+    """
+    Get the trace context of the run described by the task ``request``, or None.
+    """
+    context = getattr(request, HEADER, None)
+    if context is None:
+        context = (getattr(request, 'headers', None) or {}).get(HEADER)
+    return context
+
+
+@contextmanager
+def span(task):
+    """
+    Run the enclosed code as the span of the current run of ``task``, and export it afterwards.
+    """
+    context = context_of(task.request)
+    if context is None:
+        # Submitted without a context, e.g. by code that doesn't use LoggedTask.
+        context = new_context()
+        context['submitted_at'] = None
+    # Keep it with the request, for on_failure.
+    setattr(task.request, HEADER, context)
+    started_at = time.time()
+    status = 'success'
+    token = _current.set(context)
+    try:
+        yield context
+    except Retry:
+        status = 'retry'
+        raise
+    except BaseException:
+        status = 'failure'
+        raise
+    finally:
+        _current.reset(token)
+        export(dict(
+            context, name=task.name, task_id=task.request.id, started_at=started_at, finished_at=time.time(),
+            status=status,
+        ))
+
+
+def export(record):
+    """
+    Send a span record to the configured exporter, if any.
+
+    Errors raised by the exporter are logged rather than propagated.
+    """
+    path = getattr(settings, 'CELERY_UTILS_TRACE_EXPORTER', None)
+    if not path:
+        return
+    try:
+        _load_exporter(path)(record)
+    except Exception:  # pylint: disable=broad-except
+        log.exception(f'Trace exporter {path} failed to export {record}')
+
+
+@lru_cache(maxsize=None)
+def _load_exporter(path):
+    return import_string(path)
+
+
+def export_to_file(record):
+    """
+    Append a span record as a JSON line to the ``CELERY_UTILS_TRACE_FILE`` file.
+
+    The file defaults to ``celery_utils_traces.ndjson`` in the system temporary directory.
+    """
+    path = getattr(
+        settings, 'CELERY_UTILS_TRACE_FILE', os.path.join(tempfile.gettempdir(), 'celery_utils_traces.ndjson'),
+    )
+    line = json.dumps(record, sort_keys=True) + '\n'
+    with _file_lock, open(path, 'a', encoding='utf-8') as trace_file:
+        trace_file.write(line)
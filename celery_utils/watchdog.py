@@ -0,0 +1,160 @@
+"""
+Watchdog logging where slow tasks are stuck.
+
+Set ``watchdog_threshold`` on a ``LoggedTask`` subclass, or give the task's
+name a threshold in the ``CELERY_UTILS_WATCHDOG_THRESHOLDS`` setting (a dict,
+which takes precedence), to have runs of the task watched.  A run still going
+after its threshold has its thread's current stack logged, once, by a monitor
+thread, which checks every ``CELERY_UTILS_WATCHDOG_INTERVAL`` seconds
+(default 1)::
+
+    class ReportTask(LoggedTask):
+        abstract = True
+        watchdog_threshold = 30
+
+A threshold is a number of seconds, or ``LEARNED`` to use a multiple
+(``CELERY_UTILS_WATCHDOG_P99_MULTIPLIER``, default 2) of the 99th
+percentile of the task's last ``RUNTIME_WINDOW`` runs in this process.  Until
+``MIN_SAMPLES`` runs have been seen, learned thresholds are
+``CELERY_UTILS_WATCHDOG_DEFAULT_THRESHOLD`` seconds (default 60).
+
+Dumps are published through the ``CELERY_UTILS_METRICS_HOOK`` callable as
+``celery_utils.watchdog.slow_task``, tagged with the task name.
+"""
+
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from django.conf import settings
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+#: Threshold value asking for a threshold learned from recent runtimes.
+LEARNED = 'learned'
+
+#: Number of recent runtimes kept per task name for learned thresholds.
+RUNTIME_WINDOW = 200
+
+#: Number of runtimes needed before a learned threshold is used.
+MIN_SAMPLES = 20
+
+# Runs being watched, by the id of the thread running them: a stack, as a
+# watched task may call or eagerly apply another in the same thread.
+_watches = defaultdict(list)
+_lock = threading.Lock()
+_runtimes = defaultdict(lambda: deque(maxlen=RUNTIME_WINDOW))
+# The process the monitor thread was started in, as it doesn't survive a fork.
+_monitor_pid = None
+
+
+class _Watch:
+    """
+    One run of a task being watched.
+    """
+
+    def __init__(self, task, deadline):
+        """
+        Watch the current run of ``task`` until ``deadline``, a ``time.monotonic`` time.
+        """
+        self.task_name = task.name
+        self.task_id = task.request.id
+        self.started = time.monotonic()
+        self.deadline = deadline
+        self.dumped = False
+
+
+def threshold_for(task):
+    """
+    Get the threshold, in seconds, for the current run of ``task``, or None if it isn't watched.
+    """
+    threshold = getattr(settings, 'CELERY_UTILS_WATCHDOG_THRESHOLDS', {}).get(task.name, task.watchdog_threshold)
+    if threshold != LEARNED:
+        return threshold
+    with _lock:
+        runtimes = sorted(_runtimes[task.name])
+    if len(runtimes) < MIN_SAMPLES:
+        return getattr(settings, 'CELERY_UTILS_WATCHDOG_DEFAULT_THRESHOLD', 60)
+    p99 = runtimes[min(len(runtimes) - 1, int(0.99 * len(runtimes)))]
+    return p99 * getattr(settings, 'CELERY_UTILS_WATCHDOG_P99_MULTIPLIER', 2)
+
+
+@contextmanager
+def watching(task, threshold):
+    """
+    Watch the enclosed run of ``task``, dumping its stack if it lasts longer than ``threshold`` seconds.
+    """
+    _ensure_monitor()
+    watch = _Watch(task, time.monotonic() + threshold)
+    thread_id = threading.get_ident()
+    with _lock:
+        _watches[thread_id].append(watch)
+    try:
+        yield
+    finally:
+        runtime = time.monotonic() - watch.started
+        with _lock:
+            stack = _watches[thread_id]
+            stack.remove(watch)
+            if not stack:
+                del _watches[thread_id]
+            _runtimes[task.name].append(runtime)
+        if watch.dumped:
+            log.warning(f'{watch.task_name}[{watch.task_id}] finished after {runtime:.1f}s')
+
+
+def check():
+    """
+    Log the stack of every watched run past its deadline that hasn't been logged yet.
+    """
+    current = time.monotonic()
+    with _lock:
+        overdue = [
+            (thread_id, watch) for thread_id, stack in _watches.items() for watch in stack
+            if not watch.dumped and watch.deadline <= current
+        ]
+        for _, watch in overdue:
+            watch.dumped = True
+    if not overdue:
+        return
+    frames = sys._current_frames()  # pylint: disable=protected-access
+    for thread_id, watch in overdue:
+        frame = frames.get(thread_id)
+        stack = ''.join(traceback.format_stack(frame)) if frame is not None else '(stack unavailable)\n'
+        log.warning(
+            f'{watch.task_name}[{watch.task_id}] has been running for {current - watch.started:.1f}s; '
+            f'current stack:\n{stack}'
+        )
+        metrics.emit('celery_utils.watchdog.slow_task', 1, task_name=watch.task_name)
+
+
+def _monitor():
+    """
+    Check for overdue runs until the process exits.
+    """
+    while True:
+        time.sleep(getattr(settings, 'CELERY_UTILS_WATCHDOG_INTERVAL', 1))
+        try:
+            check()
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Watchdog check failed')
+
+
+def _ensure_monitor():
+    """
+    Start the monitor thread, unless it is already running in this process.
+    """
+    global _monitor_pid  # pylint: disable=global-statement
+    if _monitor_pid == os.getpid():
+        return
+    with _lock:
+        if _monitor_pid != os.getpid():
+            threading.Thread(target=_monitor, name='celery-utils-watchdog', daemon=True).start()
+            _monitor_pid = os.getpid()
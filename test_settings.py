@@ -24,7 +24,17 @@ DATABASES = {
         'PASSWORD': '',
         'HOST': '',
         'PORT': '',
-    }
+        # A file, rather than SQLite's default in-memory test database, so
+        # that concurrent writers from several threads wait for each other.
+        'TEST': {
+            'NAME': root('test_default.db'),
+        },
+    },
+    # Stands in for a read replica in tests of celery_utils.routers.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'replica.db',
+    },
 }
 
 DEBUG = True
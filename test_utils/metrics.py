@@ -0,0 +1,20 @@
+"""
+Metrics hook used in tests.
+"""
+
+#: Every (name, value, tags) tuple passed to ``record``.
+recorded = []
+
+
+def record(name, value, tags):
+    """
+    Keep the metric for inspection by tests.
+    """
+    recorded.append((name, value, tags))
+
+
+def broken(name, value, tags):
+    """
+    A hook that always fails.
+    """
+    raise RuntimeError(f'Cannot record {name}={value} {tags}')
@@ -2,7 +2,7 @@
 Tasks used in tests
 """
 
-from celery_utils import logged_task, persist_on_failure
+from celery_utils import batched, chunked, claim_check, concurrency, logged_task, persist_on_failure, retry_policy
 
 from .celery import app
 
@@ -38,3 +38,188 @@ def failed_logged_task():
     Simple task to let us test logging on failure.
     """
     raise ValueError()
+
+
+class ClaimCheckedTask(claim_check.ClaimCheckTask, persist_on_failure.LoggedPersistOnFailureTask):
+    """
+    Base class offloading any arguments over 1KB.
+    """
+
+    abstract = True
+    claim_check_threshold = 1024
+
+
+@app.task(base=ClaimCheckedTask)
+def claim_checked_task(items, message=None):
+    """
+    Task that may receive large arguments.  Fails if passed a failure `message` argument.
+    """
+    if message:
+        raise ValueError(message)
+    return len(items)
+
+
+#: The number of items passed to each run of ``retrying_claim_checked_task``.
+claim_checked_runs = []
+
+
+@app.task(base=ClaimCheckedTask, bind=True, max_retries=1, default_retry_delay=0)
+def retrying_claim_checked_task(self, items, replace=False):
+    """
+    Task that may receive large arguments, retrying once; with ``replace``, the retry gets only the first item.
+    """
+    claim_checked_runs.append(len(items))
+    if not self.request.retries:
+        if replace:
+            raise self.retry(args=[items[:1]])
+        raise self.retry()
+    return len(items)
+
+
+@app.task(base=claim_check.ClaimCheckTask, claim_check_threshold=1024)
+def unpersisted_claim_checked_task(items, message=None):
+    """
+    Like ``claim_checked_task``, but failures aren't persisted.
+    """
+    if message:
+        raise ValueError(message)
+    return len(items)
+
+
+class BatchedPersistOnFailureTask(batched.BatchedTask, persist_on_failure.LoggedPersistOnFailureTask):
+    """
+    Base class running batches of up to three items.
+    """
+
+    abstract = True
+    flush_every = 3
+    flush_interval = 0.05
+
+
+#: The list of items passed to each run of ``batched_task``.
+batches = []
+
+
+@app.task(base=BatchedPersistOnFailureTask)
+def batched_task(items):
+    """
+    Batched task that fails if any item is passed a failure `message` argument.
+    """
+    batches.append(items)
+    for item in items:
+        if item.kwargs.get('message'):
+            raise ValueError(item.kwargs['message'])
+
+
+class ChunkedPersistOnFailureTask(chunked.ChunkedTask, persist_on_failure.LoggedPersistOnFailureTask):
+    """
+    Base class splitting ``user_ids`` into chunks of two.
+    """
+
+    abstract = True
+    chunk_argument = 'user_ids'
+    chunk_size = 2
+
+
+@app.task(base=ChunkedPersistOnFailureTask)
+def chunked_task(course_id, user_ids, message=None):
+    """
+    Chunked task that fails if any of `user_ids` is negative.
+    """
+    if any(user_id < 0 for user_id in user_ids):
+        raise ValueError(message)
+    return [f'{course_id}:{user_id}' for user_id in user_ids]
+
+
+#: The arguments of each run of ``recording_task``.
+recorded_calls = []
+
+
+@app.task
+def recording_task(*args):
+    """
+    Task recording its arguments, for use as a callback.
+    """
+    recorded_calls.append(args)
+
+
+#: The arguments of each run of ``deduplicated_task``.
+deduplicated_runs = []
+
+
+@app.task(base=logged_task.LoggedTask, dedup_window=30)
+def deduplicated_task(a, b=None):  # pylint: disable=invalid-name
+    """
+    Task whose identical submissions within 30 seconds are dropped.
+    """
+    deduplicated_runs.append((a, b))
+
+
+class LimitedPersistOnFailureTask(concurrency.ConcurrencyLimitedTask, persist_on_failure.LoggedPersistOnFailureTask):
+    """
+    Base class letting one instance run at a time.
+    """
+
+    abstract = True
+    concurrency_limit = 1
+    concurrency_retry_delay = 0
+    concurrency_max_waits = 2
+    # Waiting for a slot doesn't use up retries.
+    max_retries = 0
+
+
+@app.task(base=LimitedPersistOnFailureTask)
+def limited_task(value):
+    """
+    Task of which only one instance runs at once.
+    """
+    return value
+
+
+class BudgetedPersistOnFailureTask(retry_policy.RetryPolicyTask, persist_on_failure.LoggedPersistOnFailureTask):
+    """
+    Base class allowing two retries a minute, however many successes there are.
+    """
+
+    abstract = True
+    retry_budget_ratio = 0
+    retry_budget_minimum = 2
+    retry_backoff_base = 0
+    max_retries = 10
+
+
+@app.task(base=BudgetedPersistOnFailureTask, bind=True)
+def budgeted_task(self, message=None):
+    """
+    Task retrying while ``message`` is given.
+    """
+    if message:
+        raise self.retry(exc=ValueError(message))
+
+
+#: Memory held on to by ``leaky_task``.
+leaked = []
+
+
+@app.task(base=logged_task.LoggedTask, track_resources=True)
+def leaky_task(size):
+    """
+    Task keeping ``size`` bytes of memory allocated after it returns.
+    """
+    leaked.append(bytearray(b'x' * size))
+
+
+@app.task(base=logged_task.LoggedTask, watchdog_threshold=0)
+def stuck_task(released):
+    """
+    Task waiting until the ``released`` event is set.
+    """
+    released.wait(10)
+
+
+@app.task(base=logged_task.LoggedTask)
+def parent_task():
+    """
+    Task submitting ``simple_logged_task``.
+    """
+    simple_logged_task.delay(1, 2, 3)
@@ -0,0 +1,166 @@
+"""
+Testing the bulk FailedTask admin actions.
+"""
+
+import pytest
+
+from django.urls import reverse
+
+from celery_utils import bulk_actions
+from celery_utils import tasks as utils_tasks
+from celery_utils.models import ArchivedFailedTask, BulkActionJob, FailedTask
+from test_utils import tasks
+
+CHANGELIST = 'admin:celery_utils_failedtask_changelist'
+
+
+@pytest.fixture
+def failed_tasks():
+    return [
+        FailedTask.objects.create(task_name=tasks.passing_task.name, task_id=f'task-{index}', args=[], kwargs={})
+        for index in range(5)
+    ]
+
+
+@pytest.fixture
+def run_action(admin_client, django_capture_on_commit_callbacks):
+    def run(action, selected, select_across=False, query=''):
+        with django_capture_on_commit_callbacks(execute=True):
+            return admin_client.post(
+                reverse(CHANGELIST) + query,
+                {
+                    'action': action,
+                    '_selected_action': [task.pk for task in selected],
+                    'select_across': '1' if select_across else '0',
+                    'index': 0,
+                },
+                follow=True,
+            )
+    return run
+
+
+@pytest.mark.django_db
+def test_resolve_selected(run_action, failed_tasks):
+    response = run_action('resolve_selected', failed_tasks[:2])
+    assert 'Started to mark resolved 2 failed tasks' in response.content.decode()
+    assert set(FailedTask.objects.exclude(datetime_resolved=None).values_list('task_id', flat=True)) == {
+        'task-0', 'task-1',
+    }
+    job = BulkActionJob.objects.get()
+    assert (job.status, job.processed, job.total, job.requested_by) == (BulkActionJob.COMPLETED, 2, 2, 'admin')
+
+
+@pytest.mark.django_db
+def test_reapply_all_matching_filter(run_action, failed_tasks):
+    FailedTask.objects.filter(pk=failed_tasks[0].pk).update(task_name='other')
+    run_action(
+        'reapply_selected', failed_tasks[1:2], select_across=True,
+        query=f'?task_name={tasks.passing_task.name}',
+    )
+    assert set(FailedTask.objects.exclude(datetime_resolved=None).values_list('task_id', flat=True)) == {
+        'task-1', 'task-2', 'task-3', 'task-4',
+    }
+    assert BulkActionJob.objects.get().total == 4
+
+
+@pytest.mark.django_db
+def test_delete_selected_in_background(admin_client, run_action, failed_tasks):
+    response = admin_client.get(reverse(CHANGELIST))
+    assert 'delete_selected_in_background' in response.content.decode()
+    assert '"delete_selected"' not in response.content.decode()
+    run_action('delete_selected_in_background', failed_tasks, select_across=True)
+    assert not FailedTask.objects.exists()
+
+
+@pytest.mark.django_db
+def test_dispatched_on_commit(admin_client, failed_tasks, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        admin_client.post(reverse(CHANGELIST), {
+            'action': 'resolve_selected', '_selected_action': [failed_tasks[0].pk], 'index': 0,
+        })
+        assert BulkActionJob.objects.get().status == BulkActionJob.PENDING
+    assert len(callbacks) == 1
+    callbacks[0]()
+    assert BulkActionJob.objects.get().status == BulkActionJob.COMPLETED
+
+
+@pytest.mark.django_db
+def test_selection_is_fixed(failed_tasks):
+    job = BulkActionJob.for_queryset(BulkActionJob.RESOLVE, FailedTask.objects.filter(task_id__in=['task-1', 'task-3']))
+    assert job.selected_pks == [failed_tasks[1].pk, failed_tasks[3].pk]
+    FailedTask.objects.create(task_name=tasks.passing_task.name, task_id='task-1', args=[], kwargs={})
+    FailedTask.objects.filter(pk=failed_tasks[3].pk).delete()
+    utils_tasks.run_bulk_action(job.pk)
+    job.refresh_from_db()
+    assert (job.status, job.processed) == (BulkActionJob.COMPLETED, 2)
+    assert FailedTask.objects.filter(datetime_resolved=None).count() == 3
+
+
+@pytest.mark.django_db
+def test_resolve_archives(settings, run_action, failed_tasks):
+    settings.CELERY_UTILS_ARCHIVE_ON_RESOLVE = True
+    run_action('resolve_selected', failed_tasks[:2])
+    assert set(ArchivedFailedTask.objects.values_list('task_id', flat=True)) == {'task-0', 'task-1'}
+    assert FailedTask.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_job_resumes_after_failure(failed_tasks, monkeypatch):
+    job = BulkActionJob.for_queryset(BulkActionJob.DELETE, FailedTask.objects.all())
+    handlers = bulk_actions._HANDLERS  # pylint: disable=protected-access
+    monkeypatch.setitem(handlers, BulkActionJob.DELETE, _fail_after(1))
+    with pytest.raises(RuntimeError):
+        utils_tasks.run_bulk_action(job.pk, batch_size=2)
+    job.refresh_from_db()
+    assert (job.status, job.processed, job.last_pk) == (BulkActionJob.FAILED, 2, failed_tasks[1].pk)
+    assert job.error == "RuntimeError('Interrupted')"
+    monkeypatch.undo()
+    utils_tasks.run_bulk_action(job.pk, batch_size=2)
+    job.refresh_from_db()
+    assert (job.status, job.processed) == (BulkActionJob.COMPLETED, 5)
+    assert not FailedTask.objects.exists()
+
+
+def _fail_after(batches):
+    """
+    Make a batch handler that deletes ``batches`` batches, then fails.
+    """
+    delete = bulk_actions._HANDLERS[BulkActionJob.DELETE]  # pylint: disable=protected-access
+    calls = []
+
+    def handle_batch(batch, seen_task_ids):
+        calls.append(batch)
+        if len(calls) > batches:
+            raise RuntimeError('Interrupted')
+        delete(batch, seen_task_ids)
+    return handle_batch
+
+
+@pytest.mark.django_db
+def test_resume_failed_job(admin_client, failed_tasks, monkeypatch, django_capture_on_commit_callbacks):
+    job = BulkActionJob.for_queryset(BulkActionJob.DELETE, FailedTask.objects.all())
+    handlers = bulk_actions._HANDLERS  # pylint: disable=protected-access
+    monkeypatch.setitem(handlers, BulkActionJob.DELETE, _fail_after(1))
+    with pytest.raises(RuntimeError):
+        utils_tasks.run_bulk_action(job.pk, batch_size=2)
+    monkeypatch.undo()
+    completed = BulkActionJob.for_queryset(BulkActionJob.RESOLVE, FailedTask.objects.none())
+    completed.finish(BulkActionJob.COMPLETED)
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        response = admin_client.post(reverse('admin:celery_utils_bulkactionjob_changelist'), {
+            'action': 'resume_failed', '_selected_action': [job.pk, completed.pk], 'index': 0,
+        }, follow=True)
+    assert 'Resumed 1 failed jobs.' in response.content.decode()
+    assert len(callbacks) == 1
+    job.refresh_from_db()
+    assert (job.status, job.processed, job.error) == (BulkActionJob.COMPLETED, 5, '')
+    assert not FailedTask.objects.exists()
+
+
+@pytest.mark.django_db
+def test_job_admin(admin_client, failed_tasks):
+    job = BulkActionJob.for_queryset(BulkActionJob.RESOLVE, FailedTask.objects.all())
+    response = admin_client.get(reverse('admin:celery_utils_bulkactionjob_changelist'))
+    assert '0 / 5' in response.content.decode()
+    response = admin_client.get(reverse('admin:celery_utils_bulkactionjob_change', args=[job.pk]))
+    assert response.status_code == 200
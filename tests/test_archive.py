@@ -0,0 +1,89 @@
+"""
+Testing archiving of resolved FailedTask records.
+"""
+
+import datetime
+
+import pytest
+
+from django.utils.timezone import now
+
+from celery_utils import tasks as utils_tasks
+from celery_utils.archive import archive_resolved_tasks
+from celery_utils.models import ArchivedFailedTask, FailedTask
+from test_utils import tasks
+
+
+def create_failed_task(task_id, **fields):
+    fields.setdefault('datetime_resolved', now())
+    return FailedTask.objects.create(
+        task_name=tasks.fallible_task.name,
+        task_id=task_id,
+        args=[],
+        kwargs={'when': datetime.date(2024, 3, 31)},
+        exc='ValueError()',
+        **fields
+    )
+
+
+@pytest.mark.django_db
+def test_archive_moves_resolved_rows():
+    resolved = create_failed_task(
+        'resolved', attempts=2, fingerprint='f' * 40, repeat_failures=1, datetime_quarantined=now(),
+        trace={'trace_id': 'trace'},
+    )
+    create_failed_task('unresolved', datetime_resolved=None)
+    assert list(archive_resolved_tasks(batch_size=1)) == [(resolved.pk, 1)]
+    assert list(FailedTask.objects.values_list('task_id', flat=True)) == ['unresolved']
+    archived = ArchivedFailedTask.objects.get()
+    assert archived.failed_task_id == resolved.pk
+    assert archived.task_id == 'resolved'
+    assert archived.args == []
+    assert archived.kwargs == {'when': datetime.date(2024, 3, 31)}
+    assert archived.attempts == 2
+    assert (archived.fingerprint, archived.repeat_failures) == ('f' * 40, 1)
+    assert archived.datetime_quarantined == resolved.datetime_quarantined
+    assert archived.trace == {'trace_id': 'trace'}
+    assert archived.created == resolved.created
+    assert archived.datetime_resolved == resolved.datetime_resolved
+    assert archived.datetime_archived >= resolved.datetime_resolved
+
+
+@pytest.mark.django_db
+def test_archive_tolerates_reused_ids():
+    resolved = create_failed_task('first')
+    list(archive_resolved_tasks())
+    # As MySQL may do after a restart, once the highest ids have been deleted.
+    create_failed_task('second', id=resolved.pk)
+    list(archive_resolved_tasks())
+    assert list(ArchivedFailedTask.objects.order_by('pk').values_list('failed_task_id', 'task_id')) == [
+        (resolved.pk, 'first'), (resolved.pk, 'second'),
+    ]
+
+
+@pytest.mark.django_db
+def test_archive_filters():
+    create_failed_task('old', datetime_resolved=now() - datetime.timedelta(days=10))
+    create_failed_task('new')
+    other = create_failed_task('other', datetime_resolved=now() - datetime.timedelta(days=10))
+    FailedTask.objects.filter(pk=other.pk).update(task_name='other')
+    list(archive_resolved_tasks(resolved_before=now() - datetime.timedelta(days=5), task_name=tasks.fallible_task.name))
+    assert list(ArchivedFailedTask.objects.values_list('task_id', flat=True)) == ['old']
+
+
+@pytest.mark.django_db
+def test_archive_on_resolve(settings):
+    settings.CELERY_UTILS_ARCHIVE_ON_RESOLVE = True
+    FailedTask.objects.create(task_name=tasks.passing_task.name, task_id='will_succeed', args=[], kwargs={}).reapply()
+    assert not FailedTask.objects.exists()
+    assert ArchivedFailedTask.objects.get().task_id == 'will_succeed'
+
+
+@pytest.mark.django_db
+def test_periodic_task_is_bounded():
+    for index in range(5):
+        create_failed_task(f'resolved-{index}')
+    assert utils_tasks.archive_resolved_tasks.delay(batch_size=2, max_batches=2).get() == 4
+    assert FailedTask.objects.count() == 1
+    assert utils_tasks.archive_resolved_tasks(batch_size=2) == 1
+    assert ArchivedFailedTask.objects.count() == 5
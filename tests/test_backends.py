@@ -0,0 +1,100 @@
+"""
+Testing the database result backend.
+"""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from django.utils.timezone import now
+
+from celery import states
+from celery.canvas import Signature
+
+from celery_utils.backends import DatabaseBackend
+from celery_utils.models import ChordCounter, ResultEntry
+from test_utils import tasks
+from test_utils.celery import app
+
+
+@pytest.fixture
+def backend():
+    backend = DatabaseBackend(app=app)
+    with mock.patch.object(type(app), 'backend', property(lambda self: backend)):
+        yield backend
+
+
+@pytest.mark.django_db
+def test_store_and_get_results(backend):
+    backend.store_result('one', {'answer': 42}, states.SUCCESS)
+    backend.store_result('two', None, states.STARTED)
+    assert backend.get_result('one') == {'answer': 42}
+    assert backend.get_state('two') == states.STARTED
+    assert backend.get_state('missing') == states.PENDING
+    assert ResultEntry.objects.get(key__endswith='one').expires_at > now()
+
+
+@pytest.mark.django_db
+def test_success_is_not_overwritten(backend):
+    backend.store_result('one', 1, states.SUCCESS)
+    backend.store_result('one', None, states.STARTED)
+    assert backend.get_state('one') == states.SUCCESS
+    backend.store_result('two', None, states.STARTED)
+    backend.store_result('two', 2, states.SUCCESS)
+    assert backend.get_result('two') == 2
+
+
+@pytest.mark.django_db
+def test_set_replaces_value(backend):
+    backend.set('key', b'first')
+    backend.set('key', b'second')
+    assert backend.get('key') == b'second'
+    assert ResultEntry.objects.filter(key='key').count() == 1
+
+
+@pytest.mark.django_db
+def test_mget_is_chunked(backend):
+    for index in range(5):
+        backend.store_result(f'task-{index}', index, states.SUCCESS)
+    keys = [backend.get_key_for_task(f'task-{index}') for index in (4, 0, 9)]
+    with mock.patch('celery_utils.backends.MGET_CHUNK_SIZE', 2):
+        values = backend.mget(keys)
+    assert [None if value is None else backend.decode_result(value)['result'] for value in values] == [4, 0, None]
+
+
+@pytest.mark.django_db
+def test_chord(backend):
+    group_id = 'group'
+    results = [app.AsyncResult(f'task-{index}') for index in range(3)]
+    backend.apply_chord((group_id, results), tasks.passing_task.s())
+    assert ChordCounter.objects.get().count == 0
+    request = SimpleNamespace(group=group_id, chord=dict(tasks.passing_task.s(), chord_size=3))
+    with mock.patch.object(Signature, 'delay') as delay:
+        for index, result in enumerate(results):
+            backend.store_result(result.id, index, states.SUCCESS)
+            backend.on_chord_part_return(request, states.SUCCESS, index)
+            assert delay.call_count == (1 if index == 2 else 0)
+    delay.assert_called_once_with([0, 1, 2])
+    assert not ChordCounter.objects.exists()
+    assert backend.restore_group(group_id) is None
+
+
+@pytest.mark.django_db
+def test_incr_creates_missing_counter(backend):
+    key = backend.get_key_for_chord('group')
+    assert backend.incr(key) == 1
+    assert backend.incr(key) == 2
+
+
+@pytest.mark.django_db
+def test_cleanup(backend):
+    backend.store_result('old', 1, states.SUCCESS)
+    backend.store_result('new', 2, states.SUCCESS)
+    backend.incr(backend.get_key_for_chord('old'))
+    ResultEntry.objects.filter(key__endswith='old').update(expires_at=now() - timedelta(seconds=1))
+    ChordCounter.objects.update(expires_at=now() - timedelta(seconds=1))
+    backend.cleanup()
+    assert [entry.key for entry in ResultEntry.objects.all()] == [backend.get_key_for_task('new').decode()]
+    assert not ChordCounter.objects.exists()
@@ -0,0 +1,94 @@
+"""
+Testing the unresolved failure backlog counters.
+"""
+
+from unittest import mock
+
+import pytest
+
+from django.db import connection
+from django.db.models import QuerySet
+
+from celery_utils import backlog
+from celery_utils import tasks as utils_tasks
+from celery_utils.models import FailedTask, FailureBacklog
+from test_utils import metrics, tasks
+
+
+@pytest.fixture
+def counters(settings):
+    settings.CELERY_UTILS_BACKLOG_COUNTERS = True
+
+
+def fail(message='Nope'):
+    result = tasks.fallible_task.delay(message=message)
+    with pytest.raises(ValueError):
+        result.wait()
+    return result
+
+
+@pytest.mark.django_db
+def test_disabled_by_default():
+    fail()
+    assert not FailureBacklog.objects.exists()
+    assert backlog.get_backlog(tasks.fallible_task.name) == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('counters')
+def test_counts_failures_and_resolutions():
+    first = fail()
+    fail()
+    assert backlog.get_backlog(tasks.fallible_task.name) == 2
+    FailedTask.objects.filter(task_id=first.id).update(kwargs={})
+    FailedTask.objects.get(task_id=first.id).reapply()
+    assert backlog.get_backlog() == {tasks.fallible_task.name: 1}
+    utils_tasks.mark_resolved(first.id)
+    assert backlog.get_backlog(tasks.fallible_task.name) == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('counters')
+def test_failed_reapply_is_not_counted_again():
+    result = fail()
+    FailedTask.objects.get(task_id=result.id).reapply()
+    assert FailedTask.objects.count() == 1
+    assert backlog.get_backlog(tasks.fallible_task.name) == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('counters')
+def test_decrement_stops_at_zero():
+    backlog.increment('task')
+    backlog.decrement('task', 5)
+    assert backlog.get_backlog('task') == 0
+
+
+@pytest.mark.django_db
+def test_reconcile(settings):
+    settings.CELERY_UTILS_METRICS_HOOK = 'test_utils.metrics.record'
+    metrics.recorded.clear()
+    FailureBacklog.objects.create(task_name='gone', unresolved=3)
+    FailureBacklog.objects.create(task_name='task', unresolved=7)
+    FailedTask.objects.create(task_name='task', task_id='one')
+    FailedTask.objects.create(task_name='task', task_id='two')
+    FailedTask.objects.create(task_name='other', task_id='three')
+    assert utils_tasks.reconcile_failure_backlog.delay().get() == {'task': 2, 'other': 1}
+    assert backlog.get_backlog() == {'gone': 0, 'task': 2, 'other': 1}
+    assert not FailureBacklog.objects.filter(datetime_reconciled=None).exists()
+    assert sorted(metrics.recorded) == [
+        ('celery_utils.failed_tasks.unresolved', 0, {'task_name': 'gone'}),
+        ('celery_utils.failed_tasks.unresolved', 1, {'task_name': 'other'}),
+        ('celery_utils.failed_tasks.unresolved', 2, {'task_name': 'task'}),
+    ]
+
+
+@pytest.mark.django_db
+def test_reconcile_without_conflict_target():
+    FailedTask.objects.create(task_name='task', task_id='one')
+    # As on MySQL, which upserts on any unique key and rejects unique_fields.
+    with mock.patch.object(QuerySet, 'bulk_create') as bulk_create, \
+            mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+        backlog.reconcile()
+    assert 'unique_fields' not in bulk_create.call_args[1]
+    assert bulk_create.call_args[1]['update_conflicts'] is True
@@ -0,0 +1,120 @@
+"""
+Testing the batching task base class.
+"""
+
+import time
+from unittest import mock
+
+import pytest
+
+from celery_utils.batched import REAPPLIED_HEADER, BatchItem, flush_all
+from celery_utils.models import FailedTask
+from test_utils import metrics, tasks
+
+
+@pytest.fixture(autouse=True)
+def batches():
+    tasks.batches.clear()
+    yield tasks.batches
+    tasks.batched_task.flush()
+
+
+def submit(task_id, *args, headers=None, **kwargs):
+    """
+    Deliver an invocation of ``batched_task`` as a worker would.
+    """
+    tasks.batched_task.push_request(id=task_id, is_eager=False, **(headers or {}))
+    try:
+        return tasks.batched_task(*args, **kwargs)
+    finally:
+        tasks.batched_task.pop_request()
+
+
+def test_flushes_when_full(batches):
+    submit('one', 1)
+    submit('two', 2)
+    assert not batches
+    submit('three', key='value')
+    assert batches == [[
+        BatchItem('one', [1], {}),
+        BatchItem('two', [2], {}),
+        BatchItem('three', [], {'key': 'value'}),
+    ]]
+
+
+def test_flushes_after_interval(batches):
+    submit('one', 1)
+    deadline = time.monotonic() + 5
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batches == [[BatchItem('one', [1], {})]]
+
+
+def test_flushes_at_shutdown(batches):
+    with mock.patch.object(tasks.BatchedPersistOnFailureTask, 'flush_interval', 60):
+        submit('one', 1)
+        flush_all()
+    assert batches == [[BatchItem('one', [1], {})]]
+
+
+@pytest.mark.django_db
+def test_failures_are_persisted_per_item(batches):
+    submit('one', 1)
+    submit('bad', message='Nope')
+    submit('three', 3)
+    assert len(batches) == 4
+    failure = FailedTask.objects.get()
+    assert (failure.task_id, failure.args, failure.kwargs) == ('bad', [], {'message': 'Nope'})
+    assert failure.exc == "ValueError('Nope')"
+
+
+@pytest.mark.django_db
+def test_eager_items_run_immediately_and_reapply(batches):
+    result = tasks.batched_task.delay(message='Nope')
+    assert batches == [[BatchItem(result.id, [], {'message': 'Nope'})]]
+    failure = FailedTask.objects.get()
+    failure.kwargs = {}
+    failure.save()
+    failure.reapply()
+    assert batches[-1] == [BatchItem(result.id, [], {}, reapplied=True)]
+    failure.refresh_from_db()
+    assert failure.datetime_resolved is not None
+
+
+@pytest.mark.django_db
+def test_failed_reapply_stays_unresolved(batches):
+    result = tasks.batched_task.delay(message='Nope')
+    failure = FailedTask.objects.get()
+    assert failure.reapply()
+    assert batches[-1] == [BatchItem(result.id, [], {'message': 'Nope'}, reapplied=True)]
+    failure.refresh_from_db()
+    assert failure.datetime_resolved is None
+
+
+@pytest.mark.django_db
+def test_reapplied_item_resolved_once_run(batches):
+    failure = FailedTask.objects.create(task_name=tasks.batched_task.name, task_id='one', args=[1], kwargs={})
+    submit('one', 1, headers={REAPPLIED_HEADER: True})
+    failure.refresh_from_db()
+    assert failure.datetime_resolved is None
+    submit('two', 2)
+    submit('three', 3)
+    assert batches == [[BatchItem('one', [1], {}, True), BatchItem('two', [2], {}), BatchItem('three', [3], {})]]
+    failure.refresh_from_db()
+    assert failure.datetime_resolved is not None
+
+
+def test_batches_run_through_logged_task(settings):
+    settings.CELERY_UTILS_METRICS_HOOK = 'test_utils.metrics.record'
+    metrics.recorded.clear()
+    with mock.patch.object(tasks.BatchedPersistOnFailureTask, 'track_resources', True):
+        tasks.batched_task.bind(tasks.app)
+        submit('one', 1)
+        submit('two', 2)
+        assert not metrics.recorded
+        submit('three', 3)
+    tasks.batched_task.bind(tasks.app)
+    assert [tags for name, _, tags in metrics.recorded if name == 'celery_utils.task.wall_time'] == [
+        {'task_name': tasks.batched_task.name},
+    ]
+    metrics.recorded.clear()
@@ -0,0 +1,86 @@
+"""
+Testing the chunk-splitting task base class.
+"""
+
+import pytest
+
+from celery.result import GroupResult
+
+from celery_utils.models import FailedTask
+from test_utils import tasks
+
+
+def test_short_arguments_are_not_split():
+    result = tasks.chunked_task.delay('course', [1, 2])
+    assert not isinstance(result, GroupResult)
+    assert result.get() == ['course:1', 'course:2']
+
+
+@pytest.mark.parametrize('args, kwargs', [
+    (('course', [1, 2, 3, 4, 5]), {}),
+    (('course',), {'user_ids': [1, 2, 3, 4, 5]}),
+])
+def test_long_arguments_are_split(args, kwargs):
+    result = tasks.chunked_task.apply_async(args, kwargs, task_id='split')
+    assert isinstance(result, GroupResult)
+    assert [child.id for child in result.results] == ['split-0', 'split-1', 'split-2']
+    assert result.get() == [['course:1', 'course:2'], ['course:3', 'course:4'], ['course:5']]
+
+
+def test_split_when_instrumented(monkeypatch):
+    monkeypatch.setattr(tasks.ChunkedPersistOnFailureTask, 'track_resources', True)
+    tasks.chunked_task.bind(tasks.app)
+    try:
+        result = tasks.chunked_task.apply_async(('course', [1, 2, 3, 4, 5]))
+    finally:
+        monkeypatch.undo()
+        tasks.chunked_task.bind(tasks.app)
+    assert isinstance(result, GroupResult)
+    assert result.get() == [['course:1', 'course:2'], ['course:3', 'course:4'], ['course:5']]
+
+
+@pytest.fixture
+def recorded_calls():
+    tasks.recorded_calls.clear()
+    yield tasks.recorded_calls
+    tasks.recorded_calls.clear()
+
+
+def test_link_runs_once_with_every_chunk(recorded_calls):
+    result = tasks.chunked_task.apply_async(
+        ('course', [1, 2, 3, 4, 5]), task_id='split', link=tasks.recording_task.s(),
+    )
+    assert [child.id for child in result.results] == ['split-0', 'split-1', 'split-2']
+    assert recorded_calls == [([['course:1', 'course:2'], ['course:3', 'course:4'], ['course:5']],)]
+
+
+@pytest.mark.django_db
+def test_link_error_runs_per_failed_chunk(recorded_calls):
+    result = tasks.chunked_task.apply_async(
+        ('course', [1, 2, -3, 4, 5]), task_id='split', link_error=tasks.recording_task.si('failed'),
+    )
+    assert result.id == 'split'
+    assert [child.state for child in result.results] == ['SUCCESS', 'FAILURE', 'SUCCESS']
+    assert recorded_calls == [('failed',)]
+
+
+def test_chunk_argument_required(monkeypatch):
+    monkeypatch.setattr(tasks.ChunkedPersistOnFailureTask, 'chunk_argument', None)
+    assert tasks.chunked_task.delay('course', [1, 2, 3]).get() == ['course:1', 'course:2', 'course:3']
+    monkeypatch.setattr(tasks.ChunkedPersistOnFailureTask, 'chunk_argument', 'course_ids')
+    with pytest.raises(TypeError):
+        tasks.chunked_task.delay('course', [1, 2, 3])
+
+
+@pytest.mark.django_db
+def test_failures_are_persisted_per_chunk():
+    result = tasks.chunked_task.delay('course', [1, 2, -3, 4, 5], message='Negative')
+    assert [child.successful() for child in result.results] == [True, False, True]
+    failure = FailedTask.objects.get()
+    assert failure.task_id == result.results[1].id
+    assert (failure.args, failure.kwargs) == (['course', [-3, 4]], {'message': 'Negative'})
+    failure.args = ['course', [3, 4]]
+    failure.save()
+    failure.reapply()
+    failure.refresh_from_db()
+    assert failure.datetime_resolved is not None
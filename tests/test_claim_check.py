@@ -0,0 +1,135 @@
+"""
+Testing claim-check offloading of large task arguments.
+
+Tasks built with the ClaimCheckTask base class are imported from test_utils.tasks.
+  * claim_checked_task - Offloads arguments over 1KB.  Fails if passed a
+    failure `message` argument.
+  * retrying_claim_checked_task - Like claim_checked_task, but retries once.
+  * unpersisted_claim_checked_task - Like claim_checked_task, without persisting failures.
+"""
+
+import datetime
+import os
+import time
+from unittest import mock
+
+import pytest
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.deletion import Collector
+
+from celery_utils import tasks as utils_tasks
+from celery_utils.claim_check import CLAIM_CHECK_KWARG, FileSystemBlobStore, get_blob_store, sweep_orphans
+from celery_utils.models import FailedTask
+from test_utils import tasks
+
+LARGE = list(range(1000))
+
+
+@pytest.fixture(autouse=True)
+def blob_dir(settings, tmp_path):
+    settings.CELERY_UTILS_CLAIM_CHECK_DIR = str(tmp_path)
+    return tmp_path
+
+
+def test_small_arguments_are_sent_inline(blob_dir):
+    with mock.patch('celery_utils.logged_task.log') as mocklog:
+        assert tasks.claim_checked_task.delay([1, 2, 3]).get() == 3
+    assert '[1, 2, 3]' in mocklog.info.call_args[0][0]
+    assert not os.listdir(blob_dir)
+
+
+def test_large_arguments_are_offloaded(blob_dir):
+    with mock.patch('celery_utils.logged_task.log') as mocklog:
+        assert tasks.claim_checked_task.delay(LARGE).get() == len(LARGE)
+    assert CLAIM_CHECK_KWARG in mocklog.info.call_args[0][0]
+    # The blob is removed once the task has succeeded.
+    assert not os.listdir(blob_dir)
+
+
+@pytest.mark.django_db
+def test_failure_records_only_the_reference(blob_dir):
+    when = datetime.datetime(2024, 3, 31, 12, 0)
+    result = tasks.claim_checked_task.delay(LARGE, message=f'Failed at {when}')
+    with pytest.raises(ValueError):
+        result.wait()
+    failed_task = FailedTask.objects.get()
+    assert failed_task.args == []
+    assert list(failed_task.kwargs) == [CLAIM_CHECK_KWARG]
+    assert os.listdir(blob_dir) == [failed_task.kwargs[CLAIM_CHECK_KWARG]]
+
+    with mock.patch.object(tasks.claim_checked_task, 'run', return_value=0) as mock_run:
+        failed_task.reapply()
+    mock_run.assert_called_once_with(LARGE, message=f'Failed at {when}')
+    assert FailedTask.objects.get().datetime_resolved is not None
+    assert not os.listdir(blob_dir)
+
+
+@pytest.mark.django_db
+def test_blob_swept_after_failed_task_deleted(blob_dir):
+    with pytest.raises(ValueError):
+        tasks.claim_checked_task.delay(LARGE, message='Nope').wait()
+    assert os.listdir(blob_dir)
+    queryset = FailedTask.objects.all()
+    assert Collector(queryset.db).can_fast_delete(queryset)
+    queryset.delete()
+    assert sweep_orphans(datetime.timedelta(0)) == 1
+    assert not os.listdir(blob_dir)
+
+
+def test_unpersisted_failure_deletes_blob(blob_dir):
+    with pytest.raises(ValueError):
+        tasks.unpersisted_claim_checked_task.delay(LARGE, message='Nope').wait()
+    assert not os.listdir(blob_dir)
+
+
+@pytest.mark.parametrize('replace, runs', [(False, [len(LARGE), len(LARGE)]), (True, [len(LARGE), 1])])
+def test_retry(blob_dir, replace, runs):
+    tasks.claim_checked_runs.clear()
+    with mock.patch.object(get_blob_store(), 'put', wraps=get_blob_store().put) as put:
+        assert tasks.retrying_claim_checked_task.delay(LARGE, replace=replace).get() == runs[-1]
+    # The retry re-sends the reference, or its new, small arguments.
+    put.assert_called_once()
+    assert tasks.claim_checked_runs == runs
+    assert not os.listdir(blob_dir)
+
+
+@pytest.mark.django_db
+def test_sweep_orphans(blob_dir):
+    with pytest.raises(ValueError):
+        tasks.claim_checked_task.delay(LARGE, message='Nope').wait()
+    [referenced] = os.listdir(blob_dir)
+    store = get_blob_store()
+    orphan = store.put(b'orphan')
+    recent = store.put(b'recent')
+    old = time.time() - 8 * 24 * 60 * 60
+    for key in (referenced, orphan):
+        os.utime(blob_dir / key, (old, old))
+    assert utils_tasks.sweep_claim_checks() == 1
+    assert sorted(os.listdir(blob_dir)) == sorted([referenced, recent])
+    assert sweep_orphans(datetime.timedelta(0)) == 1
+    assert os.listdir(blob_dir) == [referenced]
+
+
+def test_blob_dir_required(settings):
+    del settings.CELERY_UTILS_CLAIM_CHECK_DIR
+    with pytest.raises(ImproperlyConfigured):
+        FileSystemBlobStore().put(b'payload')
+
+
+def test_filesystem_blob_store(blob_dir):
+    store = FileSystemBlobStore()
+    key = store.put(b'payload')
+    assert os.listdir(blob_dir) == [key]
+    assert store.get(key) == b'payload'
+    store.delete(key)
+    store.delete(key)
+    with pytest.raises(KeyError):
+        store.get(key)
+    with pytest.raises(ValueError):
+        store.get('../etc/passwd')
+
+
+def test_configured_blob_store(settings):
+    settings.CELERY_UTILS_CLAIM_CHECK_STORE = 'celery_utils.claim_check.FileSystemBlobStore'
+    assert isinstance(get_blob_store(), FileSystemBlobStore)
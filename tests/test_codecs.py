@@ -0,0 +1,95 @@
+"""
+Testing the JSON codecs used to store task arguments.
+"""
+
+import datetime
+import decimal
+from unittest import mock
+import uuid
+
+import pytest
+
+from jsonfield.json import JSONString
+
+from celery_utils import codecs
+from celery_utils.models import FailedTask
+from test_utils import tasks
+
+RICH_VALUES = [
+    datetime.datetime(2024, 3, 31, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+    datetime.datetime(2024, 3, 31, 12, 30),
+    datetime.date(2024, 3, 31),
+    datetime.time(23, 59, 1),
+    datetime.timedelta(days=-1, seconds=5, microseconds=7),
+    decimal.Decimal('3.14159265358979323846264338327950288'),
+    uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    b'\x00\xffnot utf-8',
+]
+
+CODECS = [codecs.StdlibJSONCodec(), codecs.OrjsonCodec()]
+
+
+@pytest.mark.parametrize('codec', CODECS, ids=lambda codec: type(codec).__name__)
+@pytest.mark.parametrize('value', RICH_VALUES, ids=repr)
+def test_round_trip(codec, value):
+    payload = {'value': value, 'nested': [value, {'deeper': value}], 'plain': 'text'}
+    decoded = codec.loads(codec.dumps(payload))
+    assert decoded == payload
+    assert type(decoded['nested'][1]['deeper']) is type(value)  # pylint: disable=unidiomatic-typecheck
+
+
+@pytest.mark.parametrize('codec', CODECS, ids=lambda codec: type(codec).__name__)
+@pytest.mark.parametrize(('value', 'expected'), [
+    ({1: 'integer key'}, {'1': 'integer key'}),
+    (2 ** 70, 2 ** 70),
+    ('12345678-1234-5678-1234-567812345678', '12345678-1234-5678-1234-567812345678'),
+    ([], []),
+    (None, None),
+])
+def test_values_orjson_cannot_handle_alone(codec, value, expected):
+    assert codec.loads(codec.dumps(value)) == expected
+
+
+@pytest.mark.parametrize('codec', CODECS, ids=lambda codec: type(codec).__name__)
+def test_unencodable_value_is_stored_as_repr(codec):
+    assert codec.loads(codec.dumps([object])) == [repr(object)]
+
+
+def test_codecs_are_interchangeable():
+    payload = {'when': RICH_VALUES[0], 'ids': [RICH_VALUES[6]], 'count': 3}
+    stdlib, fast = CODECS
+    assert stdlib.loads(fast.dumps(payload)) == payload
+    assert fast.loads(stdlib.dumps(payload)) == payload
+
+
+def test_codec_setting(settings):
+    settings.CELERY_UTILS_JSON_CODEC = 'celery_utils.codecs.StdlibJSONCodec'
+    assert isinstance(codecs.get_codec(), codecs.StdlibJSONCodec)
+    assert not isinstance(codecs.get_codec(), codecs.OrjsonCodec)
+
+
+@pytest.mark.django_db
+def test_failed_task_round_trips_rich_arguments():
+    args = RICH_VALUES[:4]
+    kwargs = {'message': 'Rich failure', 'amount': RICH_VALUES[5], 'user': RICH_VALUES[6], 'blob': RICH_VALUES[7]}
+    result = tasks.fallible_task.apply_async(args=args, kwargs=kwargs)
+    with pytest.raises(TypeError):
+        result.wait()
+    failed_task = FailedTask.objects.get()
+    assert failed_task.args == args
+    assert failed_task.kwargs == kwargs
+    with mock.patch.object(tasks.fallible_task, 'apply_async') as mock_apply:
+        failed_task.reapply()
+    assert mock_apply.call_args[0] == (args, kwargs)
+
+
+@pytest.mark.django_db
+def test_undecodable_text_is_preserved():
+    failed_task = FailedTask.objects.create(task_name='task', task_id='legacy', args=[], kwargs={})
+    FailedTask.objects.filter(pk=failed_task.pk).update(kwargs=JSONString('{not json'))
+    with pytest.warns(RuntimeWarning):
+        failed_task = FailedTask.objects.get()
+    assert failed_task.kwargs == '{not json'
+    failed_task.save()
+    with pytest.warns(RuntimeWarning):
+        assert FailedTask.objects.get().kwargs == '{not json'
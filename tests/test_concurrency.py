@@ -0,0 +1,66 @@
+"""
+Testing the distributed concurrency limit.
+"""
+
+from unittest import mock
+
+import pytest
+
+from django.core.cache import cache
+
+from celery_utils.concurrency import CacheSemaphore, ConcurrencyLimitExceeded
+from celery_utils.models import FailedTask
+from test_utils import tasks
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_semaphore():
+    semaphore = CacheSemaphore('name', limit=2, lease=60)
+    first = semaphore.acquire()
+    second = semaphore.acquire()
+    assert first and second and first[0] != second[0]
+    assert semaphore.acquire() is None
+    semaphore.release(first)
+    assert semaphore.acquire() is not None
+
+
+def test_release_after_lease_passed_on():
+    semaphore = CacheSemaphore('name', limit=1, lease=60)
+    held = semaphore.acquire()
+    cache.set(held[0], 'someone else')
+    semaphore.release(held)
+    assert cache.get(held[0]) == 'someone else'
+
+
+def test_runs_and_releases_slot():
+    assert tasks.limited_task.delay(1).get() == 1
+    assert tasks.limited_task.delay(2).get() == 2
+
+
+def test_no_limit(monkeypatch):
+    monkeypatch.setattr(tasks.limited_task, 'concurrency_limit', None)
+    with mock.patch.object(CacheSemaphore, 'acquire') as acquire:
+        assert tasks.limited_task.delay(1).get() == 1
+    acquire.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_waits_then_persists_failure():
+    held = tasks.limited_task.semaphore.acquire()
+    with mock.patch('celery_utils.logged_task.log') as mocklog:
+        result = tasks.limited_task.delay(3)
+    with pytest.raises(ConcurrencyLimitExceeded):
+        result.get()
+    assert mocklog.warning.call_count == 2
+    failure = FailedTask.objects.get()
+    assert (failure.task_id, failure.args) == (result.id, [3])
+    tasks.limited_task.semaphore.release(held)
+    failure.reapply()
+    failure.refresh_from_db()
+    assert failure.datetime_resolved is not None
@@ -0,0 +1,74 @@
+"""
+Testing query instrumentation of celery_utils operations.
+"""
+
+import pytest
+
+from django.db import connection
+
+from celery_utils import instrumentation
+from celery_utils.models import FailedTask
+from test_utils import metrics, tasks
+
+
+@pytest.fixture(autouse=True)
+def enable_instrumentation(settings):
+    settings.CELERY_UTILS_INSTRUMENTATION = True
+    settings.CELERY_UTILS_METRICS_HOOK = 'test_utils.metrics.record'
+    metrics.recorded.clear()
+    instrumentation.reset_stats()
+
+
+@pytest.mark.django_db
+def test_on_failure_is_instrumented():
+    result = tasks.fallible_task.delay(message='Instrument me')
+    with pytest.raises(ValueError):
+        result.wait()
+    stats = instrumentation.get_stats()
+    assert stats['on_failure']['calls'] == 1
+    assert stats['on_failure']['queries'] == 2
+    assert stats['mark_resolved']['calls'] == 0
+    assert ('celery_utils.db.queries', 2, {'operation': 'on_failure'}) in metrics.recorded
+
+
+@pytest.mark.django_db
+def test_nested_operations_attribute_queries_to_innermost():
+    failed_task = FailedTask.objects.create(task_name=tasks.fallible_task.name, task_id='nested', args=[], kwargs={})
+    failed_task.reapply()
+    stats = instrumentation.get_stats()
+    assert stats['reapply']['calls'] == 1
+    assert stats['mark_resolved']['calls'] == 1
+    assert stats['mark_resolved']['queries'] == 1
+    assert stats['reapply']['queries'] == 1  # The claim
+    assert stats['reapply']['wall_time_us'] >= stats['mark_resolved']['wall_time_us']
+
+
+@pytest.mark.django_db
+def test_queries_are_tagged():
+    seen = []
+
+    def capture(execute, sql, params, many, context):
+        seen.append(sql)
+        return execute(sql, params, many, context)
+
+    with instrumentation.instrumented('mark_resolved'):
+        with connection.execute_wrapper(capture):
+            FailedTask.objects.exists()
+    assert seen[0].startswith('/* celery_utils:mark_resolved */ SELECT')
+
+
+@pytest.mark.django_db
+def test_disabled(settings):
+    settings.CELERY_UTILS_INSTRUMENTATION = False
+    with instrumentation.instrumented('on_failure'):
+        FailedTask.objects.exists()
+    assert instrumentation.get_stats()['on_failure']['calls'] == 0
+    assert not metrics.recorded
+
+
+@pytest.mark.django_db
+def test_failing_metrics_hook_is_ignored(settings):
+    settings.CELERY_UTILS_METRICS_HOOK = 'test_utils.metrics.broken'
+    with instrumentation.instrumented('on_failure'):
+        FailedTask.objects.exists()
+    assert instrumentation.get_stats()['on_failure']['queries'] == 1
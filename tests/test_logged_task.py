@@ -14,8 +14,11 @@ from unittest import mock
 from billiard.einfo import ExceptionInfo
 import pytest
 
+from django.core.cache import cache
+
+from celery_utils import dedup
 from celery_utils.logged_task import LoggedTask
-from test_utils import tasks
+from test_utils import metrics, tasks
 
 
 def test_no_failure():
@@ -57,3 +60,83 @@ def test_retry():
             logmessage = mocklog.warning.call_args[0][0]
             assert f'[{task_id}]' in logmessage
             assert einfo.traceback in logmessage
+
+
+@pytest.fixture
+def dedup_state():
+    cache.clear()
+    dedup.clear()
+    tasks.deduplicated_runs.clear()
+    yield
+    cache.clear()
+    dedup.clear()
+
+
+@pytest.mark.usefixtures('dedup_state')
+def test_dedup_window():
+    first = tasks.deduplicated_task.delay(1, b=2)
+    second = tasks.deduplicated_task.delay(1, b=2)
+    other = tasks.deduplicated_task.delay(1, b=3)
+    assert second.id == first.id
+    assert other.id != first.id
+    assert tasks.deduplicated_runs == [(1, 2), (1, 3)]
+
+
+@pytest.mark.usefixtures('dedup_state')
+def test_dedup_shared_through_cache():
+    first = tasks.deduplicated_task.delay(1)
+    dedup.clear()  # As if submitted again from another process
+    assert tasks.deduplicated_task.delay(1).id == first.id
+    cache.clear()  # As if the window had passed
+    dedup.clear()
+    assert tasks.deduplicated_task.delay(1).id != first.id
+    assert tasks.deduplicated_runs == [(1, None), (1, None)]
+
+
+@pytest.mark.usefixtures('dedup_state')
+def test_dedup_skips_explicit_task_ids():
+    tasks.deduplicated_task.delay(1)
+    tasks.deduplicated_task.apply_async((1,), task_id='reapplied')
+    assert tasks.deduplicated_runs == [(1, None), (1, None)]
+
+
+@pytest.mark.usefixtures('dedup_state')
+def test_dedup_logs_in_aggregate(settings):
+    settings.CELERY_UTILS_METRICS_HOOK = 'test_utils.metrics.record'
+    metrics.recorded.clear()
+    tasks.deduplicated_task.delay(1)
+    with mock.patch('celery_utils.dedup.log') as mocklog:
+        for _ in range(3):
+            tasks.deduplicated_task.delay(1)
+    mocklog.info.assert_called_once_with(f'Suppressed 1 duplicate submissions of {tasks.deduplicated_task.name}')
+    assert metrics.recorded == [
+        ('celery_utils.dedup.suppressed', 1, {'task_name': tasks.deduplicated_task.name}),
+    ]
+
+
+@pytest.mark.usefixtures('dedup_state')
+def test_dedup_logs_trailing_count():
+    tasks.deduplicated_task.delay(1)
+    with mock.patch('celery_utils.dedup.log') as mocklog:
+        tasks.deduplicated_task.delay(1)
+        tasks.deduplicated_task.delay(1)
+        dedup.flush_suppressed()
+    assert [call[0][0] for call in mocklog.info.call_args_list] == [
+        f'Suppressed 1 duplicate submissions of {tasks.deduplicated_task.name}',
+        f'Suppressed 1 duplicate submissions of {tasks.deduplicated_task.name}',
+    ]
+
+
+@pytest.mark.usefixtures('dedup_state')
+def test_dedup_claim_released_when_publish_fails():
+    with mock.patch('celery.app.task.Task.apply_async', side_effect=ConnectionError):
+        with pytest.raises(ConnectionError):
+            tasks.deduplicated_task.delay(1)
+    first = tasks.deduplicated_task.delay(1)
+    assert tasks.deduplicated_runs == [(1, None)]
+    assert tasks.deduplicated_task.delay(1).id == first.id
+
+
+def test_submission_key_ignores_kwarg_order():
+    assert dedup.submission_key('task', [1], {'a': 1, 'b': 2}) == dedup.submission_key('task', [1], {'b': 2, 'a': 1})
+    assert dedup.submission_key('task', [1], {}) != dedup.submission_key('other', [1], {})
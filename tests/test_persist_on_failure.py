@@ -6,8 +6,13 @@ Tasks built with the FailedTask base class are imported from test_utils.tasks.
   * passing_task - Always passes when run.
 """
 
+from datetime import timedelta
+from unittest import mock
+
 import pytest
 
+from django.utils.timezone import now
+
 from celery_utils.models import FailedTask
 from test_utils import tasks
 
@@ -76,3 +81,97 @@ def test_cannot_reapply_resolved_task():
     assert failed_task.datetime_resolved is not None
     with pytest.raises(TypeError):
         failed_task.reapply()
+
+
+@pytest.mark.django_db
+def test_unregistered_task_is_not_claimed():
+    failed_task = FailedTask.objects.create(task_name='no.such.task', task_id='unregistered', args=[], kwargs={})
+    with pytest.raises(KeyError):
+        failed_task.reapply()
+    failed_task = FailedTask.objects.get(pk=failed_task.pk)
+    assert (failed_task.reapplied_at, failed_task.attempts) == (None, 0)
+
+
+@pytest.mark.django_db
+def test_claimed_task_is_not_reapplied_twice():
+    failed_task = FailedTask.objects.create(
+        task_name=tasks.fallible_task.name,
+        task_id='claimed_elsewhere',
+        args=[],
+        kwargs={},
+    )
+    assert FailedTask.objects.get(pk=failed_task.pk).claim()
+    with mock.patch.object(tasks.fallible_task, 'apply_async') as mock_apply:
+        assert failed_task.reapply() is False
+    assert not mock_apply.called
+    assert FailedTask.objects.get(pk=failed_task.pk).datetime_resolved is None
+
+
+@pytest.mark.django_db
+def test_expired_claim_is_taken_over():
+    failed_task = FailedTask.objects.create(
+        task_name=tasks.fallible_task.name,
+        task_id='crashed_run',
+        args=[],
+        kwargs={},
+        reapplied_at=now() - timedelta(hours=2),
+    )
+    assert failed_task.reapply() is True
+    assert FailedTask.objects.get(pk=failed_task.pk).datetime_resolved is not None
+
+
+@pytest.mark.django_db
+def test_claim_released_when_publish_fails():
+    failed_task = FailedTask.objects.create(
+        task_name=tasks.fallible_task.name,
+        task_id='broker_down',
+        args=[],
+        kwargs={},
+    )
+    with mock.patch.object(tasks.fallible_task, 'apply_async', side_effect=ConnectionError):
+        with pytest.raises(ConnectionError):
+            failed_task.reapply()
+    assert FailedTask.objects.get(pk=failed_task.pk).reapplied_at is None
+
+
+@pytest.mark.django_db
+def test_repeated_failure_releases_claim():
+    failed_task = FailedTask.objects.create(
+        task_name=tasks.fallible_task.name,
+        task_id='fails_again',
+        args=[],
+        kwargs={'message': 'Still broken'},
+    )
+    assert failed_task.reapply() is True
+    failed_task = FailedTask.objects.get()
+    assert failed_task.datetime_resolved is None
+    assert failed_task.reapplied_at is None
+
+
+@pytest.mark.django_db
+def test_identical_failures_quarantine_task(settings):
+    settings.CELERY_UTILS_QUARANTINE_THRESHOLD = 2
+    with pytest.raises(ValueError):
+        tasks.fallible_task.apply(kwargs={'message': 'Still broken'}, task_id='poison').get()
+    for repeats in (1, 2):
+        assert FailedTask.objects.get().reapply() is True
+        assert FailedTask.objects.get().repeat_failures == repeats
+    with mock.patch.object(tasks.fallible_task, 'apply_async') as mock_apply:
+        assert FailedTask.objects.get().reapply() is False
+        failed_task = FailedTask.objects.get()
+        assert failed_task.datetime_quarantined is not None
+        assert failed_task.reapply() is False
+    assert not mock_apply.called
+    failed_task.release_quarantine()
+    assert failed_task.reapply() is True
+    assert FailedTask.objects.get().repeat_failures == 1
+
+
+@pytest.mark.django_db
+def test_different_failure_resets_repeat_count():
+    with pytest.raises(ValueError):
+        tasks.fallible_task.apply(kwargs={'message': 'Broken'}, task_id='flaky').get()
+    FailedTask.objects.update(repeat_failures=2)
+    FailedTask.objects.update(kwargs={'message': 'Broken differently'})
+    FailedTask.objects.get().reapply()
+    assert FailedTask.objects.get().repeat_failures == 0
@@ -0,0 +1,84 @@
+"""
+Testing per-task resource tracking.
+"""
+
+from threading import Event
+from unittest import mock
+
+import pytest
+
+from celery.app.trace import task_has_custom
+
+from celery_utils import resources
+from celery_utils.resources import MEBIBYTE, ResourceUsage
+from test_utils import metrics, tasks
+
+
+@pytest.fixture(autouse=True)
+def record_metrics(settings):
+    settings.CELERY_UTILS_METRICS_HOOK = 'test_utils.metrics.record'
+    metrics.recorded.clear()
+    yield
+    metrics.recorded.clear()
+    tasks.leaked.clear()
+
+
+def recorded_values():
+    return {name: value for name, value, _ in metrics.recorded}
+
+
+def test_tracked_task_reports_usage(settings):
+    settings.CELERY_UTILS_TRACEMALLOC_SAMPLE_RATE = 1
+    tasks.leaky_task.apply(args=(20 * MEBIBYTE,))
+    values = recorded_values()
+    assert values['celery_utils.task.rss_delta'] >= 10 * MEBIBYTE
+    assert values['celery_utils.task.peak_memory'] >= 20 * MEBIBYTE
+    assert values['celery_utils.task.cpu_time'] >= 0
+    assert values['celery_utils.task.wall_time'] >= 0
+    assert {tags['task_name'] for _, _, tags in metrics.recorded} == {tasks.leaky_task.name}
+
+
+def test_unsampled_run_skips_tracing(settings):
+    settings.CELERY_UTILS_TRACEMALLOC_SAMPLE_RATE = 0
+    tasks.leaky_task.apply(args=(1024,))
+    assert 'celery_utils.task.peak_memory' not in recorded_values()
+    assert 'celery_utils.task.rss_delta' in recorded_values()
+
+
+def test_untracked_task_not_measured():
+    tasks.simple_logged_task.apply(args=(1, 2))
+    assert not metrics.recorded
+
+
+def test_excessive_usage_logged(settings):
+    settings.CELERY_UTILS_CPU_TIME_THRESHOLD = None
+    with mock.patch('celery_utils.resources.log') as mocklog:
+        resources.report(tasks.leaky_task, ResourceUsage(60 * MEBIBYTE, 300 * MEBIBYTE, 120, 130))
+    message = mocklog.warning.call_args[0][0]
+    assert 'RSS grew by 60.0 MiB, peak traced memory 300.0 MiB' in message
+    assert 'CPU' not in message
+
+
+def test_recycle_hook_called_past_threshold(settings):
+    settings.CELERY_UTILS_RECYCLE_RSS_THRESHOLD = 100 * MEBIBYTE
+    with mock.patch('celery_utils.resources.request_recycle') as request_recycle:
+        resources.report(tasks.leaky_task, ResourceUsage(99 * MEBIBYTE, None, 0, 0))
+        assert not request_recycle.called
+        usage = ResourceUsage(100 * MEBIBYTE, None, 0, 0)
+        resources.report(tasks.leaky_task, usage)
+        request_recycle.assert_called_once_with(tasks.leaky_task, usage)
+
+
+def test_request_recycle():
+    usage = ResourceUsage(100 * MEBIBYTE, None, 0, 0)
+    assert resources.request_recycle(tasks.leaky_task, usage) is False
+    pool_worker = mock.Mock(_shutdown=Event())
+    with mock.patch('celery_utils.resources.current_process', return_value=mock.Mock(_target=pool_worker)):
+        assert resources.request_recycle(tasks.leaky_task, usage) is True
+    assert pool_worker._shutdown.is_set()  # pylint: disable=protected-access
+
+
+def test_only_tracked_tasks_wrapped():
+    assert not task_has_custom(tasks.simple_logged_task, '__call__')
+    assert not hasattr(tasks.simple_logged_task.__class__.run, 'uninstrumented')
+    assert hasattr(tasks.leaky_task.__class__.run, 'uninstrumented')
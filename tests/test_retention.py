@@ -0,0 +1,105 @@
+"""
+Testing the FailedTask retention policies.
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+
+from django.utils.timezone import now
+
+from celery_utils import tasks
+from celery_utils.models import ArchivedFailedTask, CommandCheckpoint, FailedTask
+from celery_utils.retention import enforce_retention
+
+DAY = timedelta(days=1)
+
+
+def create_failed_task(task_id, task_name='task', resolved_days_ago=None, created_days_ago=0):
+    task = FailedTask.objects.create(
+        task_name=task_name,
+        task_id=task_id,
+        datetime_resolved=None if resolved_days_ago is None else now() - resolved_days_ago * DAY,
+    )
+    FailedTask.objects.filter(pk=task.pk).update(created=now() - created_days_ago * DAY)
+    return task
+
+
+def remaining_task_ids():
+    return set(FailedTask.objects.values_list('task_id', flat=True))
+
+
+@pytest.mark.django_db
+def test_resolved_max_age(settings):
+    settings.CELERY_UTILS_RETENTION_RESOLVED_DAYS_BY_TASK = {'short': 2, 'forever': None}
+    create_failed_task('old', resolved_days_ago=31)
+    create_failed_task('recent', resolved_days_ago=29)
+    create_failed_task('short-old', task_name='short', resolved_days_ago=3)
+    create_failed_task('short-recent', task_name='short', resolved_days_ago=1)
+    create_failed_task('forever', task_name='forever', resolved_days_ago=365)
+    create_failed_task('unresolved', created_days_ago=365)
+    assert tasks.enforce_failed_task_retention.delay().get() == 2
+    assert remaining_task_ids() == {'recent', 'short-recent', 'forever', 'unresolved'}
+
+
+@pytest.mark.django_db
+def test_unresolved_policies(settings):
+    settings.CELERY_UTILS_RETENTION_UNRESOLVED_DAYS = 10
+    settings.CELERY_UTILS_RETENTION_UNRESOLVED_MAX_COUNT = 2
+    create_failed_task('expired', created_days_ago=11)
+    for index in range(4):
+        create_failed_task(f'unresolved-{index}')
+    create_failed_task('resolved', resolved_days_ago=1)
+    assert enforce_retention(max_rows=100, max_seconds=60, batch_size=1) == 3
+    assert remaining_task_ids() == {'unresolved-2', 'unresolved-3', 'resolved'}
+
+
+@pytest.mark.django_db
+def test_archived_max_age(settings):
+    for task_id, archived_days_ago in (('old', 91), ('recent', 89)):
+        ArchivedFailedTask.objects.create(
+            failed_task_id=1, task_name='task', task_id=task_id, args=[], kwargs={}, created=now(), modified=now(),
+            datetime_resolved=now(), datetime_archived=now() - archived_days_ago * DAY,
+        )
+    assert enforce_retention(max_rows=100, max_seconds=60, batch_size=10) == 0
+    settings.CELERY_UTILS_RETENTION_ARCHIVED_DAYS = 90
+    assert enforce_retention(max_rows=100, max_seconds=60, batch_size=10) == 1
+    assert list(ArchivedFailedTask.objects.values_list('task_id', flat=True)) == ['recent']
+
+
+@pytest.mark.django_db
+def test_row_budget():
+    for index in range(5):
+        create_failed_task(f'old-{index}', resolved_days_ago=31)
+    assert enforce_retention(max_rows=3, max_seconds=60, batch_size=2) == 3
+    assert remaining_task_ids() == {'old-3', 'old-4'}
+    assert enforce_retention(max_rows=3, max_seconds=60, batch_size=2) == 2
+    assert not remaining_task_ids()
+
+
+@pytest.mark.django_db
+def test_time_budget():
+    for index in range(3):
+        create_failed_task(f'old-{index}', resolved_days_ago=31)
+    with mock.patch('celery_utils.retention.time.monotonic', side_effect=[0, 0, 0, 61, 61]):
+        assert enforce_retention(max_rows=100, max_seconds=60, batch_size=1) == 2
+    assert remaining_task_ids() == {'old-2'}
+
+
+@pytest.mark.django_db
+def test_stops_when_batch_deletes_nothing():
+    for index in range(3):
+        create_failed_task(f'old-{index}', resolved_days_ago=31)
+    with mock.patch('django.db.models.query.QuerySet.delete', return_value=(0, {})) as delete:
+        assert enforce_retention(max_rows=100, max_seconds=60, batch_size=1) == 0
+    assert delete.call_count == 1
+
+
+@pytest.mark.django_db
+def test_completed_checkpoints_deleted():
+    CommandCheckpoint.objects.create(command='command', datetime_completed=now() - 8 * DAY)
+    recent = CommandCheckpoint.objects.create(command='command', datetime_completed=now() - DAY)
+    unfinished = CommandCheckpoint.objects.create(command='command')
+    assert enforce_retention(max_rows=100, max_seconds=60, batch_size=10) == 1
+    assert set(CommandCheckpoint.objects.all()) == {recent, unfinished}
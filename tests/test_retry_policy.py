@@ -0,0 +1,77 @@
+"""
+Testing retry backoff and budgets.
+"""
+
+from unittest import mock
+
+import pytest
+
+from django.core.cache import cache
+
+from celery_utils.models import FailedTask
+from celery_utils.retry_policy import RetryBudget, bounded_exponential_jitter
+from test_utils import tasks
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_bounded_exponential_jitter_bounds():
+    with mock.patch('random.uniform', side_effect=lambda low, high: (low, high)):
+        assert bounded_exponential_jitter(0, 2, 600) == (2, 2)
+        assert bounded_exponential_jitter(2, 2, 600) == (2, 18)
+        assert bounded_exponential_jitter(10, 2, 600) == (2, 600)
+        assert bounded_exponential_jitter(3, 1000, 600) == (600, 600)
+
+
+def test_budget_scales_with_successes():
+    budget = RetryBudget('name', ratio=0.5, minimum=1, window=60)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    for _ in range(4):
+        budget.record_success()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+
+@pytest.mark.django_db
+def test_exhausted_budget_persists_failure():
+    with mock.patch.object(tasks.budgeted_task.__class__, 'on_retry') as on_retry:
+        tasks.budgeted_task.apply(kwargs={'message': 'down'})
+    assert on_retry.call_count == 2
+    failure = FailedTask.objects.get(task_name=tasks.budgeted_task.name)
+    assert failure.exc == "ValueError('down')"
+    # The budget is shared: the next failure is persisted without retrying.
+    with mock.patch.object(tasks.budgeted_task.__class__, 'on_retry') as on_retry:
+        tasks.budgeted_task.apply(kwargs={'message': 'still down'})
+    assert on_retry.call_count == 0
+    assert FailedTask.objects.filter(task_name=tasks.budgeted_task.name).count() == 2
+
+
+@pytest.mark.django_db
+def test_success_recorded():
+    tasks.budgeted_task.apply()
+    assert tasks.budgeted_task.retry_budget._recent('successes') == 1  # pylint: disable=protected-access
+
+
+@pytest.mark.django_db
+def test_max_retries_checked_before_budget(monkeypatch):
+    monkeypatch.setattr(tasks.budgeted_task, 'max_retries', 1)
+    tasks.budgeted_task.apply(kwargs={'message': 'down'})
+    assert tasks.budgeted_task.retry_budget._recent('retries') == 1  # pylint: disable=protected-access
+
+
+def test_exhausted_budget_without_throw():
+    budget = tasks.budgeted_task.retry_budget
+    while budget.try_spend():
+        pass
+    exc = ValueError('down')
+    tasks.budgeted_task.push_request(id='task-id', retries=0)
+    try:
+        assert tasks.budgeted_task.retry(exc=exc, throw=False) is exc
+    finally:
+        tasks.budgeted_task.pop_request()
@@ -0,0 +1,104 @@
+"""
+Testing the read-replica database router.
+"""
+
+from io import StringIO
+
+import pytest
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+
+from celery_utils import backlog, retention
+from celery_utils import tasks as utils_tasks
+from celery_utils.export import export_failed_tasks, import_failed_tasks
+from celery_utils.models import CommandCheckpoint, FailedTask
+from celery_utils.routers import read_from
+
+DATABASES = ['default', 'replica']
+
+
+@pytest.fixture
+def routed(settings):
+    settings.DATABASE_ROUTERS = ['celery_utils.routers.CeleryUtilsRouter']
+
+
+@pytest.mark.django_db(databases=DATABASES)
+@pytest.mark.usefixtures('routed')
+def test_reads_go_to_replica(settings):
+    settings.CELERY_UTILS_READ_DATABASE = 'replica'
+    FailedTask.objects.create(task_name='task', task_id='one')
+    CommandCheckpoint.objects.create(command='command')
+    assert FailedTask.objects.using('default').count() == 1
+    assert not FailedTask.objects.exists()
+    assert CommandCheckpoint.objects.exists()
+
+
+@pytest.mark.django_db(databases=DATABASES)
+@pytest.mark.usefixtures('routed')
+def test_resolve_reads_from_primary(settings):
+    settings.CELERY_UTILS_READ_DATABASE = 'replica'
+    settings.CELERY_UTILS_ARCHIVE_ON_RESOLVE = True
+    FailedTask.objects.create(task_name='task', task_id='one')
+    utils_tasks.mark_resolved('one')
+    assert not FailedTask.objects.using('default').exists()
+
+
+@pytest.mark.django_db(databases=DATABASES)
+@pytest.mark.usefixtures('routed')
+def test_retention_selects_from_primary(settings):
+    settings.CELERY_UTILS_READ_DATABASE = 'replica'
+    settings.CELERY_UTILS_RETENTION_UNRESOLVED_DAYS = 0
+    FailedTask.objects.create(task_name='task', task_id='one')
+    assert retention.enforce_retention(max_rows=100, max_seconds=60, batch_size=10) == 1
+    assert not FailedTask.objects.using('default').exists()
+
+
+@pytest.mark.django_db(databases=DATABASES)
+@pytest.mark.usefixtures('routed')
+def test_backlog_reconciled_from_primary(settings):
+    settings.CELERY_UTILS_READ_DATABASE = 'replica'
+    FailedTask.objects.create(task_name='task', task_id='one')
+    assert backlog.reconcile() == {'task': 1}
+
+
+@pytest.mark.django_db(databases=DATABASES)
+@pytest.mark.usefixtures('routed')
+def test_import_checks_duplicates_on_primary(settings):
+    settings.CELERY_UTILS_READ_DATABASE = 'replica'
+    FailedTask.objects.create(task_name='task', task_id='one')
+    stream = StringIO()
+    export_failed_tasks(FailedTask.objects.using('default'), stream)
+    stream.seek(0)
+    assert import_failed_tasks(stream) == 0
+    assert FailedTask.objects.using('default').count() == 1
+
+
+@pytest.mark.django_db(databases=DATABASES)
+@pytest.mark.usefixtures('routed')
+def test_read_from():
+    FailedTask.objects.create(task_name='task', task_id='one')
+    with read_from('replica'):
+        assert not FailedTask.objects.exists()
+        FailedTask.objects.create(task_name='task', task_id='two')
+    assert FailedTask.objects.count() == 2
+
+
+@pytest.mark.django_db(databases=DATABASES)
+@pytest.mark.usefixtures('routed')
+def test_command_database_option():
+    FailedTask.objects.create(task_name='task', task_id='one')
+    stdout = StringIO()
+    call_command('export_failed_tasks', '-', '--database=replica', stdout=stdout)
+    assert stdout.getvalue() == ''
+    call_command('export_failed_tasks', '-', stdout=stdout)
+    assert '"one"' in stdout.getvalue()
+
+
+@pytest.mark.django_db
+def test_read_from_requires_router():
+    with read_from(None):
+        pass
+    with pytest.raises(ImproperlyConfigured):
+        with read_from('replica'):
+            pass
@@ -0,0 +1,109 @@
+"""
+Testing the failure store backends.
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from celery_utils.models import CommandCheckpoint, FailedTask
+from celery_utils.storage import DjangoFailureStore, SQLiteFailureStore, get_failure_store
+from test_utils import tasks
+
+
+@pytest.fixture
+def sqlite_store(settings, tmp_path):
+    settings.CELERY_UTILS_FAILURE_STORE = 'celery_utils.storage.SQLiteFailureStore'
+    settings.CELERY_UTILS_FAILURE_STORE_PATH = str(tmp_path / 'failures.sqlite3')
+    return get_failure_store()
+
+
+def unresolved(store):
+    return [task for batch in store.iter_unresolved() for task in batch]
+
+
+def test_default_store():
+    assert isinstance(get_failure_store(), DjangoFailureStore)
+
+
+def test_sqlite_store_path_required(sqlite_store, settings):
+    del settings.CELERY_UTILS_FAILURE_STORE_PATH
+    with pytest.raises(ImproperlyConfigured):
+        sqlite_store.record(tasks.fallible_task.name, 'task-id', [], {}, ValueError())
+
+
+@pytest.mark.django_db
+def test_sqlite_store_records_failures(sqlite_store):
+    assert isinstance(sqlite_store, SQLiteFailureStore)
+    result = tasks.fallible_task.delay(message='Stored locally')
+    with pytest.raises(ValueError):
+        result.wait()
+    assert not FailedTask.objects.exists()
+    [failure] = unresolved(sqlite_store)
+    assert failure.task_name == tasks.fallible_task.name
+    assert failure.task_id == result.id
+    assert failure.args == []
+    assert failure.kwargs == {'message': 'Stored locally'}
+    assert failure.exc == "ValueError('Stored locally')"
+    # A second failure of the same task is not recorded twice.
+    sqlite_store.record(failure.task_name, failure.task_id, [], {}, ValueError())
+    assert sqlite_store.count_unresolved() == 1
+
+
+def test_sqlite_store_resolve(sqlite_store):
+    sqlite_store.record('task', 'first', [], {}, ValueError())
+    sqlite_store.record('task', 'second', [], {}, ValueError())
+    sqlite_store.record('other', 'third', [], {}, ValueError())
+    sqlite_store.resolve('first')
+    assert [failure.task_id for failure in unresolved(sqlite_store)] == ['second', 'third']
+    assert sqlite_store.count_unresolved(task_name='task') == 1
+    assert sqlite_store.count_resolved(now() + timedelta(seconds=1)) == 1
+    assert sqlite_store.count_resolved(now() - timedelta(seconds=60)) == 0
+
+
+def test_sqlite_store_reapply(sqlite_store):
+    sqlite_store.record(tasks.fallible_task.name, 'will_succeed', [], {}, ValueError())
+    sqlite_store.record(tasks.fallible_task.name, 'broker_down', [], {}, ValueError())
+    first, second = unresolved(sqlite_store)
+    assert first.reapply() is True
+    assert first.reapply() is False
+    with mock.patch.object(tasks.fallible_task, 'apply_async', side_effect=ConnectionError):
+        with pytest.raises(ConnectionError):
+            second.reapply()
+    assert [failure.task_id for failure in unresolved(sqlite_store)] == ['broker_down']
+
+
+@pytest.mark.django_db
+def test_management_commands_use_sqlite_store(sqlite_store):
+    sqlite_store.record(tasks.fallible_task.name, 'will_succeed', [], {}, ValueError())
+    sqlite_store.record(tasks.fallible_task.name, 'fail_again', [], {'message': 'Still failing'}, ValueError())
+    sqlite_store.record(tasks.passing_task.name, 'other_task', [], {}, ValueError())
+    call_command('reapply_tasks', f'--task-name={tasks.fallible_task.name}', '--batch-size=1')
+    # The task that failed again was recorded afresh.
+    assert [failure.task_id for failure in unresolved(sqlite_store)] == ['other_task', 'fail_again']
+
+    call_command('cleanup_resolved_tasks', '--age=0', '--dry-run')
+    assert sqlite_store.count_resolved(now() + timedelta(seconds=1)) == 2
+    call_command('cleanup_resolved_tasks', '--age=0', '--batch-size=1')
+    assert sqlite_store.count_resolved(now() + timedelta(seconds=1)) == 0
+    assert sqlite_store.count_unresolved() == 2
+
+
+@pytest.mark.django_db
+def test_resume_ignores_other_hosts_sqlite_store(sqlite_store):
+    sqlite_store.record(tasks.passing_task.name, 'first', [], {}, ValueError())
+    sqlite_store.record(tasks.passing_task.name, 'second', [], {}, ValueError())
+    CommandCheckpoint.objects.create(
+        command='reapply_tasks',
+        parameters={
+            'task_name': None, 'quarantined': False, 'store': dict(sqlite_store.identity, hostname='elsewhere'),
+        },
+        last_pk=unresolved(sqlite_store)[-1].pk,
+    )
+    call_command('reapply_tasks', '--resume')
+    assert sqlite_store.count_unresolved() == 0
@@ -0,0 +1,65 @@
+"""
+Testing the celery tasks that support the utils in celery_utils.
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from django.utils.timezone import now
+
+from celery_utils import tasks as utils_tasks
+from celery_utils.models import FailedTask, reapply_backoff
+from test_utils import tasks
+
+
+@pytest.mark.django_db
+def test_failure_is_scheduled_for_reapply():
+    result = tasks.fallible_task.delay(message='Transient outage')
+    with pytest.raises(ValueError):
+        result.wait()
+    failed_task = FailedTask.objects.get()
+    assert failed_task.attempts == 0
+    assert failed_task.next_attempt_at > now()
+
+
+@pytest.mark.django_db
+def test_reapply_failed_tasks_only_reapplies_due_tasks():
+    FailedTask.objects.create(
+        task_name=tasks.fallible_task.name, task_id='due', args=[], kwargs={},
+        next_attempt_at=now() - timedelta(seconds=1),
+    )
+    FailedTask.objects.create(
+        task_name=tasks.fallible_task.name, task_id='backing_off', args=[], kwargs={},
+        next_attempt_at=now() + timedelta(minutes=5),
+    )
+    FailedTask.objects.create(
+        task_name=tasks.fallible_task.name, task_id='gave_up', args=[], kwargs={}, attempts=5,
+    )
+    assert utils_tasks.reapply_failed_tasks.delay().get() == 1
+    assert set(FailedTask.objects.filter(datetime_resolved=None).values_list('task_id', flat=True)) == {
+        'backing_off', 'gave_up',
+    }
+
+
+@pytest.mark.django_db
+def test_repeated_failures_back_off_exponentially():
+    FailedTask.objects.create(
+        task_name=tasks.fallible_task.name, task_id='persistent', args=[], kwargs={'message': 'Still down'},
+    )
+    utils_tasks.reapply_failed_tasks(max_attempts=2)
+    failed_task = FailedTask.objects.get()
+    assert failed_task.attempts == 1
+    assert failed_task.next_attempt_at > now() + reapply_backoff(0)
+    FailedTask.objects.update(next_attempt_at=None)
+    utils_tasks.reapply_failed_tasks(max_attempts=2)
+    FailedTask.objects.update(next_attempt_at=None)
+    assert utils_tasks.reapply_failed_tasks(max_attempts=2) == 0
+    assert FailedTask.objects.get().attempts == 2
+
+
+def test_reapply_backoff(settings):
+    settings.CELERY_UTILS_REAPPLY_BACKOFF = 10
+    settings.CELERY_UTILS_REAPPLY_MAX_BACKOFF = 100
+    assert [reapply_backoff(attempts).total_seconds() for attempts in range(5)] == [10, 20, 40, 80, 100]
+    assert reapply_backoff(1000) == timedelta(seconds=100)
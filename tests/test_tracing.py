@@ -0,0 +1,84 @@
+"""
+Testing trace context propagation.
+"""
+
+import json
+
+import pytest
+
+from celery_utils import tracing
+from celery_utils.models import FailedTask
+from test_utils import tasks
+from test_utils.celery import app
+
+
+@pytest.fixture
+def spans(settings, tmp_path):
+    """
+    Enable tracing, and get a function returning the spans exported so far.
+    """
+    settings.CELERY_UTILS_TRACING = True
+    settings.CELERY_UTILS_TRACE_EXPORTER = 'celery_utils.tracing.export_to_file'
+    settings.CELERY_UTILS_TRACE_FILE = str(tmp_path / 'traces.ndjson')
+
+    rebind_tasks()
+
+    def exported():
+        with open(settings.CELERY_UTILS_TRACE_FILE, encoding='utf-8') as trace_file:
+            return [json.loads(line) for line in trace_file]
+
+    yield exported
+    del settings.CELERY_UTILS_TRACING
+    rebind_tasks()
+
+
+def rebind_tasks():
+    """
+    Bind every task again, so that tracing is enabled or disabled per the settings.
+    """
+    for task in app.tasks.values():
+        task.bind(app)
+
+
+def test_task_span_in_trace(spans):
+    with tracing.trace(trace_id='request-1', span_id='view'):
+        tasks.simple_logged_task.delay(1, 2, 3)
+    [span] = spans()
+    assert span['name'] == tasks.simple_logged_task.name
+    assert span['trace_id'] == 'request-1'
+    assert span['parent_span_id'] == 'view'
+    assert span['status'] == 'success'
+    assert span['submitted_at'] <= span['started_at'] <= span['finished_at']
+
+
+def test_nested_submission_is_child(spans):
+    tasks.parent_task.delay()
+    child, parent = spans()
+    assert child['name'] == tasks.simple_logged_task.name
+    assert child['trace_id'] == parent['trace_id']
+    assert child['parent_span_id'] == parent['span_id']
+    assert parent['parent_span_id'] is None
+
+
+@pytest.mark.django_db
+def test_trace_carried_through_failure_and_reapply(spans):
+    with pytest.raises(ValueError):
+        tasks.fallible_task.delay(message='Broken').get()
+    [failure_span] = spans()
+    assert failure_span['status'] == 'failure'
+    failed_task = FailedTask.objects.get()
+    assert failed_task.trace['span_id'] == failure_span['span_id']
+    failed_task.kwargs = {}
+    failed_task.reapply()
+    reapply_span = spans()[1]
+    assert reapply_span['name'] == tasks.fallible_task.name
+    assert reapply_span['status'] == 'success'
+    assert reapply_span['trace_id'] == failure_span['trace_id']
+    assert reapply_span['parent_span_id'] == failure_span['span_id']
+
+
+@pytest.mark.django_db
+def test_disabled_by_default():
+    with pytest.raises(ValueError):
+        tasks.fallible_task.delay(message='Broken').get()
+    assert FailedTask.objects.get().trace is None
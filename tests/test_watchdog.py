@@ -0,0 +1,78 @@
+"""
+Testing the slow task watchdog.
+"""
+
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from celery_utils import watchdog
+from test_utils import tasks
+
+
+@pytest.fixture(autouse=True)
+def clear_runtimes():
+    watchdog._runtimes.clear()  # pylint: disable=protected-access
+    yield
+    watchdog._runtimes.clear()  # pylint: disable=protected-access
+
+
+def test_stack_of_stuck_task_logged_once(settings):
+    settings.CELERY_UTILS_WATCHDOG_INTERVAL = 0.01
+    released = threading.Event()
+    with mock.patch('celery_utils.watchdog.log') as mocklog:
+        runner = threading.Thread(target=tasks.stuck_task.apply, args=((released,),))
+        runner.start()
+        deadline = time.monotonic() + 5
+        while not mocklog.warning.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        released.set()
+        runner.join()
+    messages = [call[0][0] for call in mocklog.warning.call_args_list]
+    assert len(messages) == 2
+    assert f'{tasks.stuck_task.name}[' in messages[0]
+    assert 'current stack:' in messages[0]
+    assert 'released.wait(10)' in messages[0]
+    assert 'finished after' in messages[1]
+
+
+def test_unwatched_task():
+    assert watchdog.threshold_for(tasks.simple_logged_task) is None
+
+
+def test_threshold_from_settings(settings):
+    settings.CELERY_UTILS_WATCHDOG_THRESHOLDS = {tasks.simple_logged_task.name: 5, tasks.stuck_task.name: None}
+    assert watchdog.threshold_for(tasks.simple_logged_task) == 5
+    assert watchdog.threshold_for(tasks.stuck_task) is None
+
+
+def test_learned_threshold(settings):
+    settings.CELERY_UTILS_WATCHDOG_THRESHOLDS = {tasks.simple_logged_task.name: watchdog.LEARNED}
+    settings.CELERY_UTILS_WATCHDOG_DEFAULT_THRESHOLD = 30
+    runtimes = watchdog._runtimes[tasks.simple_logged_task.name]  # pylint: disable=protected-access
+    runtimes.extend([1.0] * (watchdog.MIN_SAMPLES - 1))
+    assert watchdog.threshold_for(tasks.simple_logged_task) == 30
+    runtimes.extend([1.0] * 98 + [4.0, 4.0])
+    assert watchdog.threshold_for(tasks.simple_logged_task) == 8.0
+
+
+def test_nested_watched_tasks(settings):
+    settings.CELERY_UTILS_WATCHDOG_THRESHOLDS = {
+        tasks.parent_task.name: 60, tasks.simple_logged_task.name: 60,
+    }
+    # The thresholds setting is read when tasks are bound.
+    bind_tasks(tasks.parent_task, tasks.simple_logged_task)
+    tasks.parent_task.apply()
+    assert not watchdog._watches  # pylint: disable=protected-access
+    assert len(watchdog._runtimes[tasks.parent_task.name]) == 1  # pylint: disable=protected-access
+    assert len(watchdog._runtimes[tasks.simple_logged_task.name]) == 1  # pylint: disable=protected-access
+    del settings.CELERY_UTILS_WATCHDOG_THRESHOLDS
+    bind_tasks(tasks.parent_task, tasks.simple_logged_task)
+
+
+def bind_tasks(*bound):
+    for task in bound:
+        task.bind(tasks.app)